@@ -1,11 +1,11 @@
 import requests
 import json
-import pandas as pd
-from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
 from web3 import Web3
 import time
+from ncr_price_history import sync_price_history
+from ncr_rpc import POLYGON_RPC_URLS, RpcPool, RpcPoolProvider
 
 # NCR Token Information
 # Based on research, NCR (Neos Credits) was on Polygon/Matic network
@@ -38,46 +38,18 @@ def search_ncr_info():
     
     return NCR_CONTRACT
 
-def get_historical_price_data():
-    """Fetch historical price data for NCR"""
+def get_historical_price_data(save=True):
+    """Fetch historical price data for NCR
+    
+    Hourly price, market cap and volume from ncr_price_history, fetched in
+    concurrent windows with gaps forward-filled and flagged. With save=False
+    nothing is read from or written to disk (no CSV, no watermark); the full
+    range is fetched and only returned.
+    """
     print("\nFetching historical price data...")
     
-    # Try CoinGecko historical data
     try:
-        # First, let's try to find the coin ID
-        coin_id = "neos-credits"  # Based on typical naming convention
-        
-        # Get market chart data
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart/range"
-        
-        # Define date range: Oct 2021 - Oct 2022
-        start_date = int(datetime(2021, 10, 1).timestamp())
-        end_date = int(datetime(2022, 10, 31).timestamp())
-        
-        params = {
-            "vs_currency": "usd",
-            "from": start_date,
-            "to": end_date
-        }
-        
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            prices = data.get('prices', [])
-            
-            if prices:
-                df = pd.DataFrame(prices, columns=['timestamp', 'price'])
-                df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-                df.to_csv('ncr_price_history.csv', index=False)
-                print(f"Saved {len(df)} price records to ncr_price_history.csv")
-                return df
-            else:
-                print("No price data found in response")
-        else:
-            print(f"API error: {response.status_code}")
-            print(f"Response: {response.text[:200]}")
-    
+        return sync_price_history(save=save)
     except Exception as e:
         print(f"Error fetching price data: {e}")
     
@@ -88,11 +60,14 @@ def analyze_blockchain_data():
     print("\nAnalyzing blockchain data...")
     
     try:
-        # Connect to Polygon
-        w3 = Web3(Web3.HTTPProvider(POLYGON_RPC))
+        # Connect to Polygon through a pool of public endpoints so one slow node doesn't stall the run
+        pool = RpcPool(POLYGON_RPC_URLS)
+        health = pool.health_check()
+        w3 = Web3(RpcPoolProvider(pool))
         
         if w3.is_connected():
-            print("Connected to Polygon network")
+            live = sum(1 for h in health.values() if h['head'] is not None)
+            print(f"Connected to Polygon network ({live}/{len(health)} endpoints live, using {pool.best_endpoint().url})")
             
             # Basic ERC20 ABI for token info
             erc20_abi = [
@@ -121,11 +96,20 @@ def analyze_blockchain_data():
             except Exception as e:
                 print(f"Error getting token info: {e}")
         else:
-            print("Failed to connect to Polygon network")
+            print("Failed to connect to Polygon network: no endpoint in the pool responded")
     
     except Exception as e:
         print(f"Blockchain analysis error: {e}")
 
+def polygonscan_urls(token=NCR_CONTRACT):
+    """PolygonScan pages to check manually for a token"""
+    return {
+        "token_page": f"https://polygonscan.com/token/{token}",
+        "holders": f"https://polygonscan.com/token/tokenholderchart/{token}",
+        "transfers": f"https://polygonscan.com/token/{token}#transfers",
+        "analytics": f"https://polygonscan.com/token/{token}#tokenAnalytics"
+    }
+
 def fetch_polygonscan_data():
     """Fetch transaction data from PolygonScan API"""
     print("\nFetching PolygonScan data...")
@@ -133,12 +117,7 @@ def fetch_polygonscan_data():
     # Note: This would require a PolygonScan API key
     # For now, we'll document the URLs to check manually
     
-    urls = {
-        "token_page": f"https://polygonscan.com/token/{NCR_CONTRACT}",
-        "holders": f"https://polygonscan.com/token/tokenholderchart/{NCR_CONTRACT}",
-        "transfers": f"https://polygonscan.com/token/{NCR_CONTRACT}#transfers",
-        "analytics": f"https://polygonscan.com/token/{NCR_CONTRACT}#tokenAnalytics"
-    }
+    urls = polygonscan_urls()
     
     print("\nKey URLs to investigate:")
     for name, url in urls.items():
@@ -0,0 +1,425 @@
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_analysis import get_historical_price_data, polygonscan_urls
+from ncr_audit_service import holder_metrics
+from ncr_blockchain_scanner import RED_FLAGS, analyze_dexscreener_pairs, build_bitquery_queries
+from ncr_bytecode import BytecodeAnalyzer
+from ncr_concentration import balance_updates, concentration_series
+from ncr_interning import AddressInterner
+from ncr_lp_ledger import load_clusters, replay_pair
+from ncr_realized_cap import REALIZED_CAP_CSV, RealizedCapEngine, realized_cap_series
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, READ_CHUNK, price_series_from_reserves, read_transfers
+from ncr_wash_trading import WASH_SHARE_FLAG, detect_cycles
+from ncr_watch import CONCENTRATION_LIMIT, CONCENTRATION_TOP, LIQUIDITY_PULL_SHARE
+
+FAKE_HOLDER_SHARE = 0.5     # same cut-off as the audit service
+REPORT_FILE = 'ncr_audit_report.json'
+PRICE_EXTRAS = {"market_cap": np.float64, "volume": np.float64, "filled": bool}
+
+def _frame(columns):
+    # DataFrame views over the arrays; pandas only copies when a column is written to
+    return pd.DataFrame(columns, copy=False)
+
+@dataclass
+class PairSet:
+    """Trading pairs as columns, in the layout of ncr_trading_pairs.csv"""
+    pair_address: np.ndarray
+    dex: np.ndarray
+    chain: np.ndarray
+    base_token: np.ndarray
+    quote_token: np.ndarray
+    price_usd: np.ndarray
+    liquidity_usd: np.ndarray
+    volume_24h: np.ndarray
+    price_change_24h: np.ndarray
+    txns_24h: np.ndarray
+    created_at: np.ndarray
+    
+    NUMERIC = ("price_usd", "liquidity_usd", "volume_24h", "price_change_24h", "txns_24h", "created_at")
+    
+    @classmethod
+    def from_records(cls, records):
+        """Build from analyze_dexscreener_pairs() dicts"""
+        columns = {}
+        for column in fields(cls):
+            values = [record.get(column.name) for record in records]
+            if column.name == "txns_24h":
+                columns[column.name] = np.array([int(v or 0) for v in values], dtype=np.int64)
+            elif column.name in cls.NUMERIC:
+                columns[column.name] = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+            elif column.name == "pair_address":
+                columns[column.name] = np.array([v.lower() if v else v for v in values], dtype=object)
+            else:
+                columns[column.name] = np.array(values, dtype=object)
+        return cls(**columns)
+    
+    @classmethod
+    def from_addresses(cls, addresses, chain="polygon"):
+        """Pairs known only by address (no DexScreener metadata)"""
+        return cls.from_records([{"pair_address": address, "chain": chain} for address in addresses])
+    
+    def __len__(self):
+        return len(self.pair_address)
+    
+    def on_chain(self, chain):
+        """Pair addresses on one chain"""
+        return [address for address, pair_chain in zip(self.pair_address, self.chain) if address and pair_chain == chain]
+    
+    def to_frame(self):
+        return _frame({column.name: getattr(self, column.name) for column in fields(self)})
+
+@dataclass
+class PriceSeries:
+    """USD prices: timestamp (unix seconds, int64) and price (float64)
+    
+    CoinGecko series also carry market_cap, volume and filled (rows
+    forward-filled onto the grid); other sources leave them None.
+    """
+    timestamp: np.ndarray
+    price: np.ndarray
+    source: str
+    market_cap: np.ndarray = None
+    volume: np.ndarray = None
+    filled: np.ndarray = None
+    
+    @classmethod
+    def from_frame(cls, df, source, unit="s"):
+        """Take the timestamp, price and any PRICE_EXTRAS columns of a frame; unit="ms" for CoinGecko milliseconds"""
+        timestamp = df['timestamp'].to_numpy(dtype=np.int64)
+        order = np.argsort(timestamp, kind='stable')
+        extras = {name: df[name].to_numpy(dtype=dtype)[order] for name, dtype in PRICE_EXTRAS.items() if name in df.columns}
+        return cls((timestamp // 1000 if unit == "ms" else timestamp)[order], df['price'].to_numpy(dtype=np.float64)[order],
+                   source, **extras)
+    
+    def __len__(self):
+        return len(self.timestamp)
+    
+    def to_frame(self):
+        """(timestamp, price) frame in the shape load_price_history() returns, plus whichever extras are set"""
+        extras = {name: getattr(self, name) for name in PRICE_EXTRAS if getattr(self, name) is not None}
+        return _frame({'timestamp': self.timestamp, 'price': self.price, **extras})
+
+@dataclass
+class TransferColumns:
+    """Token transfers in block order, held once and handed to every stage"""
+    block_number: np.ndarray
+    log_index: np.ndarray
+    tx_hash: np.ndarray
+    timestamp: np.ndarray
+    from_address: np.ndarray
+    to_address: np.ndarray
+    value: np.ndarray           # raw integer amounts as strings, as stored
+    
+    @classmethod
+    def from_store(cls, conn, token=NCR_CONTRACT, chain="polygon"):
+        chunks = list(read_transfers(conn, token, chain))
+        if not chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(empty, empty, *(np.zeros(0, dtype=object) for _ in range(5)))
+        df = pd.concat(chunks, ignore_index=True)
+        return cls(df['block_number'].to_numpy(dtype=np.int64), df['log_index'].to_numpy(dtype=np.int64),
+                   df['tx_hash'].to_numpy(dtype=object), df['timestamp'].to_numpy(dtype=np.int64),
+                   df['from_address'].to_numpy(dtype=object), df['to_address'].to_numpy(dtype=object),
+                   df['value'].to_numpy(dtype=object))
+    
+    def __len__(self):
+        return len(self.block_number)
+    
+    def chunks(self, size=READ_CHUNK):
+        """Slices in the read_transfers() chunk format; each is a view, not a copy"""
+        for start in range(0, len(self), size):
+            yield _frame({column.name: getattr(self, column.name)[start:start + size] for column in fields(self)})
+
+@dataclass
+class HolderTable:
+    """Balances at the end of the transfer history, largest first"""
+    address: np.ndarray
+    balance: np.ndarray
+    
+    def __len__(self):
+        return len(self.address)
+    
+    def metrics(self):
+        return holder_metrics(self.balance)
+    
+    def to_frame(self):
+        return _frame({'address': self.address, 'balance': self.balance})
+
+@dataclass
+class WashResult:
+    cycles: pd.DataFrame
+    dex_volume: float
+    wash_volume: float
+    
+    @property
+    def share(self):
+        return self.wash_volume / self.dex_volume if self.dex_volume else 0.0
+
+@dataclass
+class LiquidityResult:
+    """LP burns and liquidity drops across all pairs (see ncr_lp_ledger)"""
+    drops: pd.DataFrame
+    burns: pd.DataFrame
+    holders: pd.DataFrame
+
+@dataclass
+class AuditReport:
+    token: str
+    chain: str
+    generated_at: str
+    pairs: PairSet
+    prices: PriceSeries
+    transfers: TransferColumns
+    holders: HolderTable
+    concentration: pd.DataFrame
+    realized_cap: pd.DataFrame
+    wash: WashResult
+    liquidity: LiquidityResult
+    contract: dict
+    red_flags: dict
+    queries: dict
+    urls: dict
+    timings: dict = field(default_factory=dict)
+    
+    def summary(self):
+        """JSON-ready digest: metrics, flags, queries and links, no per-row data"""
+        return {
+            "token": self.token, "chain": self.chain, "generated_at": self.generated_at,
+            "pairs": len(self.pairs), "price_source": self.prices.source, "prices": len(self.prices),
+            "transfers": len(self.transfers), "holder_metrics": self.holders.metrics(),
+            "wash": {"cycles": len(self.wash.cycles), "dex_volume": self.wash.dex_volume,
+                     "wash_volume": self.wash.wash_volume, "share": self.wash.share},
+            "liquidity_drops": len(self.liquidity.drops), "contract_risk": self.contract.get("risk"),
+            "red_flags": self.red_flags, "queries": self.queries, "urls": self.urls, "timings": self.timings
+        }
+
+class CsvSink:
+    """Write an AuditReport under the file names the standalone scripts use"""
+    
+    def __init__(self, directory="."):
+        self.directory = directory
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def write(self, report):
+        os.makedirs(self.directory, exist_ok=True)
+        written = []
+        if len(report.pairs):
+            report.pairs.to_frame().to_csv(self._path('ncr_trading_pairs.csv'), index=False)
+            written.append('ncr_trading_pairs.csv')
+        if report.prices.source == "coingecko" and len(report.prices):
+            # ncr_price_history.csv keeps CoinGecko's millisecond timestamps
+            prices = report.prices.to_frame()
+            prices['timestamp'] = prices['timestamp'] * 1000
+            prices['date'] = pd.to_datetime(prices['timestamp'], unit='ms')
+            prices.to_csv(self._path('ncr_price_history.csv'), index=False)
+            written.append('ncr_price_history.csv')
+        if not report.concentration.empty:
+            report.concentration.to_csv(self._path('ncr_concentration_day.csv'))
+            written.append('ncr_concentration_day.csv')
+        if not report.realized_cap.empty:
+            report.realized_cap.to_csv(self._path(REALIZED_CAP_CSV))
+            written.append(REALIZED_CAP_CSV)
+        cycles = report.wash.cycles.assign(date=pd.to_datetime(report.wash.cycles['start_time'], unit='s'))
+        cycles.to_csv(self._path('ncr_wash_cycles.csv'), index=False)
+        written.append('ncr_wash_cycles.csv')
+        if not report.liquidity.drops.empty:
+            report.liquidity.drops.to_csv(self._path('ncr_lp_drops.csv'), index=False)
+            report.liquidity.burns.to_csv(self._path('ncr_lp_burns.csv'), index=False)
+            written += ['ncr_lp_drops.csv', 'ncr_lp_burns.csv']
+        with open(self._path(REPORT_FILE), 'w') as f:
+            json.dump(report.summary(), f, indent=2, default=str)
+        written.append(REPORT_FILE)
+        return written
+
+class Audit:
+    """In-process audit session: each stage runs once and hands its arrays to the next
+    
+    Stages are methods whose results are cached on the session, so calling
+    audit.wash() after audit.concentration() reuses the transfers, pairs and
+    address IDs already in memory. Nothing touches disk unless a sink is
+    given to run(); pairs and prices can be passed in to skip the HTTP calls.
+    """
+    
+    def __init__(self, token=NCR_CONTRACT, chain="polygon", conn=None, pairs=None, prices=None, coingecko=True,
+                 decimals=NCR_DECIMALS, analyze_contract=True):
+        self.token = token.lower()
+        self.chain = chain
+        self.conn = conn or store.connect()
+        self.decimals = decimals
+        self.coingecko = coingecko
+        self.analyze_contract = analyze_contract
+        self.interner = AddressInterner()
+        self.timings = {}
+        self._results = {}
+        if pairs is not None:
+            self._results["pairs"] = pairs if isinstance(pairs, PairSet) else PairSet.from_addresses(pairs, chain)
+        if prices is not None:
+            self._results["prices"] = prices if isinstance(prices, PriceSeries) else PriceSeries.from_frame(prices, "given")
+    
+    def _stage(self, name, compute):
+        if name not in self._results:
+            start = time.time()
+            self._results[name] = compute()
+            self.timings[name] = round(time.time() - start, 3)
+        return self._results[name]
+    
+    def pairs(self):
+        return self._stage("pairs", lambda: PairSet.from_records(analyze_dexscreener_pairs(self.token, save=False) or []))
+    
+    def _prices(self):
+        if self.coingecko:
+            df = get_historical_price_data(save=False)
+            if df is not None and len(df):
+                return PriceSeries.from_frame(df, "coingecko", unit="ms")
+        # No market data: use the spot price of the pair with the most Sync events
+        best = None
+        for pair in self.pairs().on_chain(self.chain):
+            df = price_series_from_reserves(self.conn, pair, token_decimals=self.decimals, chain=self.chain).dropna()
+            if best is None or len(df) > len(best[1]):
+                best = (pair, df)
+        if best is None or best[1].empty:
+            return PriceSeries(np.zeros(0, dtype=np.int64), np.zeros(0), "none")
+        return PriceSeries.from_frame(best[1], f"reserves:{best[0]}")
+    
+    def prices(self):
+        return self._stage("prices", self._prices)
+    
+    def transfers(self):
+        return self._stage("transfers", lambda: TransferColumns.from_store(self.conn, self.token, self.chain))
+    
+    def _concentration(self):
+        ids, balances, blocks, times = balance_updates(self.transfers().chunks(), self.interner, decimals=self.decimals)
+        series = concentration_series(ids, balances, blocks, times, every="day")
+        # The last update per address is its final balance
+        _, last = np.unique(ids[::-1], return_index=True)
+        final_ids, final = ids[::-1][last], balances[::-1][last]
+        order = np.argsort(-final, kind='stable')
+        order = order[final[order] > 0]
+        holders = HolderTable(self.interner.lookup(final_ids[order]), final[order])
+        return series, holders
+    
+    def concentration(self):
+        """Daily holder metrics series"""
+        return self._stage("concentration", self._concentration)[0]
+    
+    def holders(self):
+        return self._stage("concentration", self._concentration)[1]
+    
+    def realized_cap(self):
+        prices = self.prices()
+        if not len(prices):
+            return pd.DataFrame()
+        return self._stage("realized_cap", lambda: realized_cap_series(
+            self.conn, prices.to_frame(), self.token, self.chain, self.decimals, RealizedCapEngine(),
+            chunks=self.transfers().chunks()))
+    
+    def wash(self):
+        def compute():
+            pair_ids = self.interner.intern_many(self.pairs().on_chain(self.chain))
+            return WashResult(*detect_cycles(self.transfers().chunks(), self.interner, pair_ids, decimals=self.decimals))
+        return self._stage("wash", compute)
+    
+    def liquidity(self, drop_share=LIQUIDITY_PULL_SHARE):
+        def compute():
+            clusters = load_clusters()
+            drops, burns, holders = [], [], []
+            for pair in self.pairs().on_chain(self.chain):
+                ledger = replay_pair(self.conn, pair, clusters, self.chain, drop_share=drop_share)
+                drops.append(pd.DataFrame(ledger.drops))
+                burns.append(pd.DataFrame(ledger.burns))
+                holders.append(ledger.holders())
+            join = lambda frames: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            return LiquidityResult(join(drops), join(burns), join(holders))
+        return self._stage("liquidity", compute)
+    
+    def contract(self):
+        def compute():
+            if not self.analyze_contract:
+                return {}
+            try:
+                return BytecodeAnalyzer(self.conn, chain=self.chain).inspect(self.token)
+            except Exception as e:
+                print(f"Contract analysis failed: {e}")
+                return {"error": str(e)}
+        return self._stage("contract", compute)
+    
+    def red_flags(self):
+        """RED_FLAGS evaluated against the results; None where the data cannot decide"""
+        metrics = self.holders().metrics()
+        contract = self.contract()
+        raised = {
+            "concentration": metrics.get(f"top{CONCENTRATION_TOP}_share", 0.0) > CONCENTRATION_LIMIT,
+            "fake_holders": metrics.get("dust_holder_share", 0.0) > FAKE_HOLDER_SHARE,
+            "wash_trading": self.wash().share > WASH_SHARE_FLAG,
+            "liquidity_pull": not self.liquidity().drops.empty,
+            "contract_risk": contract.get("risk") == "high" if "risk" in contract else None
+        }
+        descriptions = {**RED_FLAGS, "liquidity_pull": f"LP supply dropping {LIQUIDITY_PULL_SHARE:.0%} or more",
+                        "contract_risk": "High-risk admin functions in the contract bytecode"}
+        return {flag: {"description": description, "raised": raised.get(flag)} for flag, description in descriptions.items()}
+    
+    def queries(self):
+        return build_bitquery_queries()
+    
+    def urls(self):
+        return polygonscan_urls(self.token)
+    
+    def run(self, sink=None):
+        """Run every stage and return an AuditReport; sink.write(report) persists it"""
+        report = AuditReport(
+            token=self.token, chain=self.chain, generated_at=datetime.now().isoformat(timespec='seconds'),
+            pairs=self.pairs(), prices=self.prices(), transfers=self.transfers(), holders=self.holders(),
+            concentration=self.concentration(), realized_cap=self.realized_cap(), wash=self.wash(),
+            liquidity=self.liquidity(), contract=self.contract(), red_flags=self.red_flags(), queries=self.queries(),
+            urls=self.urls(), timings=self.timings)
+        if sink is not None:
+            sink.write(report)
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the whole NCR audit in one process")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--chain", default="polygon")
+    parser.add_argument("--db", help="event store path (default: the shared store)")
+    parser.add_argument("--pair", action="append", help="pair address (repeatable; default: DexScreener)")
+    parser.add_argument("--no-coingecko", action="store_true", help="price from pair reserves instead of CoinGecko")
+    parser.add_argument("--no-contract", action="store_true", help="skip the bytecode analysis")
+    parser.add_argument("--out", default=".", help="directory for the CSV and JSON outputs")
+    parser.add_argument("--no-save", action="store_true", help="print the summary only")
+    args = parser.parse_args()
+    
+    print("=== NCR Audit ===")
+    conn = store.connect(args.db) if args.db else store.connect()
+    audit = Audit(args.token, args.chain, conn, pairs=args.pair, coingecko=not args.no_coingecko,
+                  analyze_contract=not args.no_contract)
+    report = audit.run()
+    
+    metrics = report.holders.metrics()
+    print(f"\n{len(report.transfers):,} transfers, {len(report.pairs)} pairs, {len(report.prices):,} prices "
+          f"({report.prices.source})")
+    if "gini" in metrics:
+        print(f"Holders: {metrics['holders']:,}, top {CONCENTRATION_TOP} hold {metrics[f'top{CONCENTRATION_TOP}_share']:.1%}, "
+              f"Gini {metrics['gini']:.3f}, Nakamoto {metrics['nakamoto']}")
+    print(f"Wash cycles: {len(report.wash.cycles):,} ({report.wash.share:.2%} of DEX volume)")
+    print(f"Liquidity drops: {len(report.liquidity.drops)}")
+    print("\nRed flags:")
+    for flag, result in report.red_flags.items():
+        state = {True: "RAISED", False: "clear", None: "not checked"}[result["raised"]]
+        print(f"- {flag}: {state} - {result['description']}")
+    print("\nStage timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report.timings.items()))
+    if not args.no_save:
+        written = CsvSink(args.out).write(report)
+        print(f"\nSaved {', '.join(written)} to {args.out}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
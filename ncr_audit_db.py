@@ -0,0 +1,460 @@
+import argparse
+import json
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_labels import LabelStore
+from ncr_ledger import load_ledger
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, PRICE_HISTORY, LARGE_TRANSFER_USD, fill_timestamps, \
+    load_price_history, read_transfers, token_amounts, value_transfers
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# DuckDB when installed (columnar, vectorized, native Arrow); SQLite otherwise
+AUDIT_DB = "ncr_audit.duckdb" if duckdb else "ncr_audit.db"
+PAIRS_FILE = 'ncr_trading_pairs.csv'
+CLUSTERS_FILE = 'ncr_wallet_clusters.csv'
+ALERTS_FILE = 'ncr_alerts.jsonl'
+TEMPLATE_OUTPUT = 'NCR_Data_Collection_Filled.md'
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# Balance columns in the Wallet Analysis template: end of Oct 2021 and end of Oct 2022
+BALANCE_CUTOFFS = {"balance_oct_2021": "2021-11-01", "balance_oct_2022": "2022-11-01"}
+TOP_HOLDERS = 10
+WATCHED_CATEGORIES = ("team", "marketing", "development", "top_holder")
+INFRASTRUCTURE_CATEGORIES = ("burn", "dex_router", "cex", "bridge")
+DUST = 1e-9                      # token balances below this count as empty
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS transfers_time ON transfers (timestamp)",
+    "CREATE INDEX IF NOT EXISTS transfers_from ON transfers (from_address, timestamp)",
+    "CREATE INDEX IF NOT EXISTS transfers_to ON transfers (to_address, timestamp)",
+    "CREATE INDEX IF NOT EXISTS transfers_tx ON transfers (tx_hash)",
+    "CREATE INDEX IF NOT EXISTS flows_address ON flows (address, timestamp)",
+    "CREATE INDEX IF NOT EXISTS balances_address ON balances (address)",
+    "CREATE INDEX IF NOT EXISTS prices_time ON prices (timestamp)",
+    "CREATE INDEX IF NOT EXISTS labels_address ON labels (address)",
+    "CREATE INDEX IF NOT EXISTS clusters_address ON clusters (address)"
+]
+
+# One row per balance change: inflows positive, outflows negative, mint/burn address excluded
+FLOWS_SQL = f"""
+    SELECT to_address AS address, from_address AS counterparty, block_number, timestamp, day, month,
+           amount AS delta, usd_value, tx_hash
+    FROM transfers WHERE to_address <> '{ZERO_ADDRESS}'
+    UNION ALL
+    SELECT from_address, to_address, block_number, timestamp, day, month, -amount, usd_value, tx_hash
+    FROM transfers WHERE from_address <> '{ZERO_ADDRESS}'
+"""
+
+def _in_list(values):
+    return ", ".join(f"'{v}'" for v in values)
+
+# Materialized versions of the tables in NCR_Data_Collection_Template.md
+TEMPLATE_VIEWS = {
+    "wallet_analysis": f"""
+        WITH labeled AS (
+            SELECT address, label, category FROM labels WHERE category IN ({_in_list(WATCHED_CATEGORIES)})
+        ), ranked AS (
+            SELECT address, ROW_NUMBER() OVER (ORDER BY balance DESC) AS rank FROM balances
+            WHERE address NOT IN (SELECT pair_address FROM pairs)
+              AND address NOT IN (SELECT address FROM labels WHERE category IN ({_in_list(INFRASTRUCTURE_CATEGORIES)}))
+              AND address NOT IN (SELECT address FROM labeled)
+        ), watched AS (
+            SELECT address, label, category FROM labeled
+            UNION ALL
+            SELECT address, 'Top Holder ' || CAST(rank AS VARCHAR), 'top_holder' FROM ranked WHERE rank <= {TOP_HOLDERS}
+        )
+        SELECT w.address, w.label, w.category,
+               COALESCE(SUM(CASE WHEN f.timestamp < {{balance_oct_2021}} THEN f.delta END), 0) AS balance_oct_2021,
+               COALESCE(SUM(CASE WHEN f.timestamp < {{balance_oct_2022}} THEN f.delta END), 0) AS balance_oct_2022,
+               COUNT(CASE WHEN f.usd_value >= {LARGE_TRANSFER_USD} THEN 1 END) AS major_transfers,
+               c.cluster AS cluster
+        FROM watched w
+        LEFT JOIN flows f ON f.address = w.address
+        LEFT JOIN clusters c ON c.address = w.address
+        GROUP BY w.address, w.label, w.category, c.cluster
+        ORDER BY balance_oct_2022 DESC
+    """,
+    # A constant-product pool holds equal value on both sides, so LP size is twice the NCR side
+    "liquidity_analysis": """
+        WITH monthly AS (
+            SELECT f.address AS pair, f.month, SUM(f.delta) AS net
+            FROM flows f JOIN pairs p ON p.pair_address = f.address
+            GROUP BY f.address, f.month
+        ), running AS (
+            SELECT pair, month, SUM(net) OVER (PARTITION BY pair ORDER BY month) AS lp_ncr FROM monthly
+        )
+        SELECT r.month, r.pair, p.dex, r.lp_ncr,
+               2 * r.lp_ncr * (SELECT pr.price FROM prices pr WHERE pr.timestamp < m.month_end
+                               ORDER BY pr.timestamp DESC LIMIT 1) AS lp_usd,
+               r.lp_ncr / NULLIF(LAG(r.lp_ncr) OVER (PARTITION BY r.pair ORDER BY r.month), 0) - 1 AS change,
+               (SELECT group_concat(fl.type, ', ') FROM flags fl WHERE fl.pair = r.pair AND fl.month = r.month) AS events
+        FROM running r
+        JOIN months m ON m.month = r.month
+        JOIN pairs p ON p.pair_address = r.pair
+        ORDER BY r.pair, r.month
+    """,
+    # Daily deltas are accumulated over the full day spine; prices carry forward across days without quotes
+    "price_volume": f"""
+        WITH daily_price AS (
+            SELECT day, price FROM (
+                SELECT day, price, ROW_NUMBER() OVER (PARTITION BY day ORDER BY timestamp DESC) AS rn FROM prices
+            ) latest WHERE rn = 1
+        ), volume AS (
+            SELECT day, SUM(base_amount) AS volume_ncr FROM dex_trades GROUP BY day
+        ), minted AS (
+            SELECT day, SUM(CASE WHEN from_address = '{ZERO_ADDRESS}' THEN amount
+                                 WHEN to_address = '{ZERO_ADDRESS}' THEN -amount ELSE 0 END) AS net FROM transfers GROUP BY day
+        ), running AS (
+            SELECT address, day, SUM(SUM(delta)) OVER (PARTITION BY address ORDER BY day) AS balance
+            FROM flows GROUP BY address, day
+        ), transitions AS (
+            SELECT day, SUM(CASE WHEN balance > {DUST} THEN 1 ELSE 0 END
+                            - CASE WHEN COALESCE(prev, 0) > {DUST} THEN 1 ELSE 0 END) AS net
+            FROM (SELECT day, balance, LAG(balance) OVER (PARTITION BY address ORDER BY day) AS prev FROM running) changes
+            GROUP BY day
+        ), spine AS (
+            SELECT d.day, p.price, v.volume_ncr,
+                   COUNT(p.price) OVER (ORDER BY d.day) AS price_group,
+                   SUM(COALESCE(m.net, 0)) OVER (ORDER BY d.day) AS supply,
+                   SUM(COALESCE(t.net, 0)) OVER (ORDER BY d.day) AS holders
+            FROM days d
+            LEFT JOIN daily_price p ON p.day = d.day
+            LEFT JOIN volume v ON v.day = d.day
+            LEFT JOIN minted m ON m.day = d.day
+            LEFT JOIN transitions t ON t.day = d.day
+        ), filled AS (
+            SELECT day, volume_ncr, supply, holders, MAX(price) OVER (PARTITION BY price_group) AS price FROM spine
+        )
+        SELECT f.day, f.price, f.volume_ncr * f.price AS volume_24h, f.supply * f.price AS market_cap, f.holders,
+               (SELECT group_concat(fl.type, ', ') FROM flags fl WHERE fl.day = f.day) AS major_event
+        FROM filled f
+        ORDER BY f.day
+    """,
+    "red_flag_timeline": """
+        SELECT day AS date, type AS event_type, message AS description, evidence, impact
+        FROM flags ORDER BY timestamp, block
+    """
+}
+
+# Named prepared queries; parameters use :name placeholders
+QUERIES = {
+    "top_holders": """
+        SELECT b.address, b.balance, l.label, l.category, c.cluster
+        FROM balances b LEFT JOIN labels l ON l.address = b.address LEFT JOIN clusters c ON c.address = b.address
+        ORDER BY b.balance DESC LIMIT :limit
+    """,
+    "wallet_flows": """
+        SELECT day, tx_hash, counterparty, delta, usd_value FROM flows
+        WHERE address = :address AND timestamp BETWEEN :start AND :end ORDER BY timestamp
+    """,
+    "counterparties": """
+        SELECT counterparty, COUNT(*) AS transfers, SUM(CASE WHEN delta > 0 THEN delta ELSE 0 END) AS received,
+               SUM(CASE WHEN delta < 0 THEN -delta ELSE 0 END) AS sent, SUM(usd_value) AS usd_value
+        FROM flows WHERE address = :address GROUP BY counterparty ORDER BY usd_value DESC LIMIT :limit
+    """,
+    "large_transfers": """
+        SELECT day, tx_hash, from_address, to_address, amount, usd_value FROM transfers
+        WHERE timestamp BETWEEN :start AND :end AND usd_value >= :min_usd ORDER BY usd_value DESC
+    """,
+    "cluster_members": """
+        SELECT c.address, b.balance, l.label FROM clusters c
+        LEFT JOIN balances b ON b.address = c.address LEFT JOIN labels l ON l.address = c.address
+        WHERE c.cluster = :cluster ORDER BY b.balance DESC
+    """,
+    "flows_by_category": """
+        SELECT t.month, l.category, SUM(t.amount) AS amount, SUM(t.usd_value) AS usd_value
+        FROM transfers t JOIN labels l ON l.address = t.to_address
+        GROUP BY t.month, l.category ORDER BY t.month, l.category
+    """
+}
+
+QUERY_DEFAULTS = {"limit": 20, "start": 0, "end": 2 ** 62, "min_usd": LARGE_TRANSFER_USD}
+
+def _days(timestamps):
+    # Timestamps can be NaN when the store knows no block time at all
+    return pd.to_datetime(np.asarray(timestamps, dtype=float), unit='s').strftime('%Y-%m-%d')
+
+class AuditDB:
+    """Embedded analytical database over the audit data
+    
+    refresh() loads transfers, balances, pairs, prices, labels, clusters and
+    alerts into indexed tables and materializes the data collection template
+    tables; queries then run against the database without reloading CSVs.
+    """
+    
+    def __init__(self, path=AUDIT_DB, backend=None):
+        self.backend = backend or ("duckdb" if duckdb else "sqlite")
+        if self.backend == "duckdb":
+            if duckdb is None:
+                raise ImportError("duckdb is not installed; pip install duckdb or use the sqlite backend")
+            self.conn = duckdb.connect(path)
+        else:
+            import sqlite3
+            self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+    
+    def _sql(self, sql):
+        # DuckDB spells named parameters $name
+        return re.sub(r"(?<![:\w]):(\w+)", r"$\1", sql) if self.backend == "duckdb" else sql
+    
+    def execute(self, sql, params=None):
+        return self.conn.execute(self._sql(sql), params or {})
+    
+    def write_table(self, name, df):
+        """Replace a table with the contents of a DataFrame"""
+        if self.backend == "duckdb":
+            self.conn.register("_frame", df)
+            self.conn.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM _frame")
+            self.conn.unregister("_frame")
+        else:
+            df.to_sql(name, self.conn, index=False, if_exists='replace', chunksize=100_000)
+    
+    def tables(self):
+        if self.backend == "duckdb":
+            return [row[0] for row in self.conn.execute("SHOW TABLES").fetchall()]
+        return [row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+    
+    def refresh(self, events=None, token=NCR_CONTRACT, chain="polygon", decimals=NCR_DECIMALS):
+        """Reload every source table from the event store and output files, then rebuild indexes and views"""
+        started = time.time()
+        events = events or store.connect()
+        token = token.lower()
+        
+        prices = load_price_history() if os.path.exists(PRICE_HISTORY) else pd.DataFrame(
+            {"timestamp": pd.Series(dtype=np.int64), "price": pd.Series(dtype=float)})
+        prices['day'] = _days(prices['timestamp'])
+        self.write_table("prices", prices)
+        
+        chunks = []
+        for chunk in read_transfers(events, token, chain):
+            if len(prices):
+                value_transfers(chunk, prices, decimals)
+            else:
+                chunk['amount'] = token_amounts(chunk['value'].to_numpy(), decimals)
+                chunk['price_usd'] = np.nan
+                chunk['usd_value'] = np.nan
+            chunks.append(chunk)
+        transfers = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame({
+            "block_number": pd.Series(dtype=np.int64), "log_index": pd.Series(dtype=np.int64),
+            "tx_hash": pd.Series(dtype=str), "timestamp": pd.Series(dtype=np.int64),
+            "from_address": pd.Series(dtype=str), "to_address": pd.Series(dtype=str), "value": pd.Series(dtype=str),
+            "amount": pd.Series(dtype=float), "price_usd": pd.Series(dtype=float), "usd_value": pd.Series(dtype=float)})
+        transfers['day'] = _days(transfers['timestamp'])
+        transfers['month'] = transfers['day'].str[:7]
+        self.write_table("transfers", transfers)
+        
+        ledger, _ = load_ledger(events, token, chain)
+        holders = [(address, balance) for address, balance in ledger.balances.items() if balance > 0]
+        raw = np.array([str(b) for _, b in holders], dtype=str)
+        self.write_table("balances", pd.DataFrame({
+            "address": [a for a, _ in holders],
+            "balance_raw": raw,
+            "balance": token_amounts(raw, decimals)
+        }))
+        
+        pairs = pd.read_csv(PAIRS_FILE) if os.path.exists(PAIRS_FILE) else pd.DataFrame(
+            {"pair_address": pd.Series(dtype=str), "dex": pd.Series(dtype=str), "chain": pd.Series(dtype=str)})
+        pairs['pair_address'] = pairs['pair_address'].str.lower()
+        self.write_table("pairs", pairs)
+        
+        self.write_table("dex_trades", self._dex_trades(events, token, chain))
+        self.write_table("labels", LabelStore(events).load().labels[["address", "label", "category", "source"]])
+        clusters = pd.read_csv(CLUSTERS_FILE) if os.path.exists(CLUSTERS_FILE) else pd.DataFrame(
+            {"address": pd.Series(dtype=str), "cluster": pd.Series(dtype=np.int64)})
+        self.write_table("clusters", clusters)
+        self.write_table("flags", self._flags(events, chain))
+        
+        days = pd.concat([transfers['day'], prices['day']]).dropna()
+        if len(days):
+            spine = pd.date_range(days.min(), days.max(), freq='D')
+        else:
+            spine = pd.DatetimeIndex([])
+        self.write_table("days", pd.DataFrame({"day": spine.strftime('%Y-%m-%d')}))
+        months = spine.to_period('M').unique()
+        self.write_table("months", pd.DataFrame({
+            "month": months.strftime('%Y-%m'),
+            "month_end": (months.end_time.ceil('D').astype('int64') // 10 ** 9).astype(np.int64)
+        }))
+        
+        if self.backend == "duckdb":
+            self.conn.execute(f"CREATE OR REPLACE TABLE flows AS {FLOWS_SQL}")
+        else:
+            self.conn.execute("DROP TABLE IF EXISTS flows")
+            self.conn.execute(f"CREATE TABLE flows AS {FLOWS_SQL}")
+        for statement in INDEXES:
+            self.conn.execute(statement)
+        self.materialize()
+        if self.backend == "sqlite":
+            self.conn.commit()
+            self.conn.execute("ANALYZE")
+        print(f"Audit database refreshed in {time.time() - started:.1f}s: {len(transfers):,} transfers, "
+              f"{len(holders):,} holders, {len(prices):,} prices")
+        return self
+    
+    def _dex_trades(self, events, token, chain):
+        trades = pd.read_sql_query("""
+            SELECT pair, block_number, tx_hash, timestamp, exchange, base_amount, quote_amount, price
+            FROM dex_trades WHERE chain = ? AND token = ? ORDER BY block_number
+        """, events, params=(chain, token))
+        trades['timestamp'] = fill_timestamps(events, trades['block_number'].to_numpy(),
+                                              trades['timestamp'].to_numpy(dtype=float), chain) if len(trades) else []
+        trades['day'] = _days(trades['timestamp'])
+        return trades
+    
+    def _flags(self, events, chain):
+        records = []
+        if os.path.exists(ALERTS_FILE):
+            with open(ALERTS_FILE) as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        flags = pd.DataFrame({
+            "block": [int(r.get('block') or 0) for r in records],
+            "type": [r.get('type') for r in records],
+            "message": [r.get('message') for r in records],
+            "pair": [r.get('pair') for r in records],
+            "evidence": [r.get('tx_hash') or r.get('address') or r.get('recipient') for r in records],
+            "impact": [f"{r['share']:.1%}" if r.get('share') is not None else r.get('value') for r in records]
+        })
+        # Alerts carry wall-clock time; place them on the chain timeline by block
+        flags['timestamp'] = pd.Series(dtype=np.int64)
+        if len(flags):
+            timestamps = fill_timestamps(events, flags['block'].to_numpy(), None, chain)
+            if np.isnan(timestamps.astype(float)).any():
+                timestamps = [int(pd.Timestamp(r['time']).timestamp()) for r in records]
+            flags['timestamp'] = timestamps
+        flags['day'] = _days(flags['timestamp'])
+        flags['month'] = flags['day'].str[:7]
+        return flags
+    
+    def materialize(self):
+        """Rebuild the template tables from the current source tables"""
+        cutoffs = {name: int(pd.Timestamp(day).timestamp()) for name, day in BALANCE_CUTOFFS.items()}
+        for name, sql in TEMPLATE_VIEWS.items():
+            sql = sql.format(**cutoffs) if name == "wallet_analysis" else sql
+            if self.backend == "duckdb":
+                self.conn.execute(f"CREATE OR REPLACE TABLE {name} AS {sql}")
+            else:
+                self.conn.execute(f"DROP TABLE IF EXISTS {name}")
+                self.conn.execute(f"CREATE TABLE {name} AS {sql}")
+    
+    def query(self, name, **params):
+        """Run a named prepared query from QUERIES and return a DataFrame"""
+        sql = QUERIES[name]
+        needed = set(re.findall(r"(?<![:\w]):(\w+)", sql))
+        values = {key: params.get(key, QUERY_DEFAULTS.get(key)) for key in needed}
+        missing = [key for key, value in values.items() if value is None]
+        if missing:
+            raise ValueError(f"query '{name}' needs parameters: {', '.join(missing)}")
+        if 'address' in values:
+            values['address'] = values['address'].lower()
+        return self.sql(sql, values)
+    
+    def sql(self, sql, params=None):
+        """Run ad-hoc SQL and return a DataFrame"""
+        cursor = self.execute(sql, params)
+        if self.backend == "duckdb":
+            return cursor.df()
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+    
+    def arrow(self, table_or_sql, params=None):
+        """Result as a pyarrow Table; zero-copy on DuckDB, converted from pandas on SQLite"""
+        if pa is None:
+            raise ImportError("pyarrow is not installed; pip install pyarrow")
+        sql = table_or_sql if " " in table_or_sql.strip() else f"SELECT * FROM {table_or_sql}"
+        if self.backend == "duckdb":
+            return self.execute(sql, params).fetch_arrow_table()
+        return pa.Table.from_pandas(self.sql(sql, params), preserve_index=False)
+    
+    def export(self, table_or_sql, path):
+        """Write a table or query result to .parquet, .feather/.arrow or .csv"""
+        if path.endswith(".csv"):
+            self.sql(table_or_sql if " " in table_or_sql.strip() else f"SELECT * FROM {table_or_sql}").to_csv(path, index=False)
+            return
+        if pa is None:
+            raise ImportError("pyarrow is not installed; pip install pyarrow or export to .csv")
+        if path.endswith(".parquet"):
+            pq.write_table(self.arrow(table_or_sql), path)
+        else:
+            feather.write_feather(self.arrow(table_or_sql), path)
+    
+    def template_markdown(self):
+        """The data collection template with its tables filled from the materialized views"""
+        sections = [
+            ("Wallet Analysis", "SELECT address, label, balance_oct_2021, balance_oct_2022, major_transfers, "
+                                "category || COALESCE(', cluster ' || CAST(cluster AS VARCHAR), '') AS notes FROM wallet_analysis"),
+            ("Liquidity Analysis", "SELECT month AS date, lp_usd, lp_ncr, change, events, pair AS notes FROM liquidity_analysis"),
+            ("Price & Volume Data", "SELECT day AS date, price, volume_24h, market_cap, holders, major_event FROM price_volume"),
+            ("Red Flag Timeline", "SELECT * FROM red_flag_timeline")
+        ]
+        lines = ["# NCR Investigation Data Collection", ""]
+        for title, sql in sections:
+            lines += [f"## {title}", _markdown_table(self.sql(sql)), ""]
+        return "\n".join(lines)
+
+def _markdown_table(df):
+    def cell(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return ""
+        return f"{value:,.4f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+    
+    header = "| " + " | ".join(df.columns) + " |"
+    rule = "|" + "|".join("---" for _ in df.columns) + "|"
+    rows = ["| " + " | ".join(cell(v) for v in row) + " |" for row in df.itertuples(index=False)]
+    return "\n".join([header, rule, *rows])
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the NCR audit data through an embedded analytical database")
+    parser.add_argument("command", choices=["refresh", "query", "sql", "export", "template"])
+    parser.add_argument("target", nargs="?", help="query name, SQL text or table to export")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE", help="query parameter (repeatable)")
+    parser.add_argument("--out", help="export path (.parquet, .feather, .arrow or .csv)")
+    parser.add_argument("--db", default=AUDIT_DB)
+    parser.add_argument("--backend", choices=["duckdb", "sqlite"])
+    args = parser.parse_args()
+    
+    db = AuditDB(args.db, args.backend)
+    if args.command == "refresh" or "transfers" not in db.tables():
+        print(f"=== NCR Audit Database ({db.backend}) ===")
+        db.refresh()
+    
+    if args.command == "query":
+        if args.target not in QUERIES:
+            parser.error(f"unknown query '{args.target}' (known: {', '.join(QUERIES)})")
+        params = {}
+        for spec in args.param:
+            key, value = spec.split("=", 1)
+            params[key] = int(value) if value.lstrip("-").isdigit() else value
+        started = time.perf_counter()
+        result = db.query(args.target, **params)
+        print(result.to_string(index=False))
+        print(f"\n{len(result):,} rows in {(time.perf_counter() - started) * 1000:.1f} ms")
+    elif args.command == "sql":
+        started = time.perf_counter()
+        result = db.sql(args.target)
+        print(result.to_string(index=False))
+        print(f"\n{len(result):,} rows in {(time.perf_counter() - started) * 1000:.1f} ms")
+    elif args.command == "export":
+        db.export(args.target, args.out)
+        print(f"Exported {args.target} to {args.out}")
+    elif args.command == "template":
+        with open(TEMPLATE_OUTPUT, 'w') as f:
+            f.write(db.template_markdown())
+        print(f"Saved {TEMPLATE_OUTPUT}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,419 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import numpy as np
+
+import ncr_event_store as store
+from ncr_chains import CHAINS, ChainBackend, scan_chain
+from ncr_watch import CONCENTRATION_LIMIT, CONCENTRATION_TOP
+
+HOST = "127.0.0.1"
+PORT = 8765
+WORKERS = 4
+CHART_WORKERS = 2
+CHART_DIR = "audit_charts"
+CACHE_TOLERANCE_BLOCKS = 150     # a result this close to the current head is served from cache (~5 min on Polygon)
+HEAD_TTL = 10                    # seconds a chain head reading is reused
+JOB_RETENTION = 3600             # finished jobs are forgotten after this many seconds
+DUST_BALANCE = 1.0               # holders below one token count towards the fake-holder share
+DEXSCREENER_TOKEN_URL = "https://api.dexscreener.com/latest/dex/tokens/{token}"
+
+RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_results (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (chain, token, block_number)
+);
+"""
+
+def _chart_worker_init():
+    # Import pyplot once per worker process so each chart only pays for drawing
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+def render_holder_chart(path, title, balances, top=50):
+    """Bar chart of the largest holders' supply shares; runs in a chart worker process"""
+    import matplotlib.pyplot as plt
+    balances = np.asarray(balances, dtype=float)
+    shares = balances[:top] / balances.sum() * 100 if balances.sum() > 0 else balances[:top]
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(np.arange(1, len(shares) + 1), shares, color='#1f77b4')
+    ax.set_xlabel('Holder rank', fontsize=12)
+    ax.set_ylabel('Share of supply (%)', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+def holder_metrics(balances):
+    """Concentration metrics from a descending balance array"""
+    balances = np.asarray(balances, dtype=float)
+    total = balances.sum()
+    if not len(balances) or total <= 0:
+        return {"holders": int(len(balances)), "supply_held": float(total)}
+    ascending = balances[::-1]
+    n = len(ascending)
+    gini = 2.0 * np.sum(np.arange(1, n + 1) * ascending) / (n * total) - (n + 1.0) / n
+    top_share = float(balances[:CONCENTRATION_TOP].sum() / total)
+    return {
+        "holders": n,
+        "supply_held": float(total),
+        f"top{CONCENTRATION_TOP}_share": top_share,
+        "gini": float(gini),
+        "nakamoto": int(np.searchsorted(np.cumsum(balances), total / 2, side='right') + 1),
+        "dust_holder_share": float((balances < DUST_BALANCE).mean())
+    }
+
+class AuditJob:
+    """One submitted audit: parameters, progress events and the final result"""
+    
+    def __init__(self, chain, token, options):
+        self.id = uuid.uuid4().hex[:12]
+        self.chain = chain
+        self.token = token
+        self.options = options
+        self.status = "queued"
+        self.submitted = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.changed = threading.Condition()
+    
+    def emit(self, stage, **fields):
+        with self.changed:
+            self.events.append({"stage": stage, "time": round(time.time() - self.submitted, 3), **fields})
+            self.changed.notify_all()
+    
+    def finish(self, result=None, error=None):
+        with self.changed:
+            self.result = result
+            self.error = error
+            self.status = "failed" if error else "done"
+            self.finished = time.time()
+            self.events.append({"stage": self.status, "time": round(self.finished - self.submitted, 3)})
+            self.changed.notify_all()
+    
+    def to_dict(self):
+        return {"id": self.id, "chain": self.chain, "token": self.token, "status": self.status,
+                "submitted": datetime.fromtimestamp(self.submitted).isoformat(timespec='seconds'),
+                "result": self.result, "error": self.error}
+
+class AuditService:
+    """Long-lived audit runner behind the HTTP API
+    
+    Keeps one ChainBackend per chain (HTTP sessions, RPC and explorer rate
+    limiters) and a pool of chart worker processes warm across jobs. An
+    identical audit that is already queued or running is shared instead of
+    started twice, and results are cached in the event store by token and
+    block height.
+    """
+    
+    def __init__(self, workers=WORKERS, chart_workers=CHART_WORKERS, tolerance=CACHE_TOLERANCE_BLOCKS, db_path=store.EVENT_STORE):
+        self.tolerance = tolerance
+        self.db_path = db_path
+        self.conn = store.connect(db_path)
+        self.conn.executescript(RESULTS_SCHEMA)
+        self.write_lock = threading.Lock()
+        self.jobs = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.backends = {}
+        self._heads = {}
+        self.stats = {"submitted": 0, "cache_hits": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+        os.makedirs(CHART_DIR, exist_ok=True)
+        self.charts = ProcessPoolExecutor(max_workers=chart_workers, initializer=_chart_worker_init) if chart_workers else None
+        self.workers = [threading.Thread(target=self._work, name=f"audit-worker-{i}", daemon=True) for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+    
+    def backend(self, chain):
+        with self.lock:
+            if chain not in self.backends:
+                self.backends[chain] = ChainBackend(chain)
+            return self.backends[chain]
+    
+    def head(self, chain):
+        """Chain head, reused for HEAD_TTL seconds so bursts of submissions cost one call"""
+        cached = self._heads.get(chain)
+        if cached and time.time() - cached[1] < HEAD_TTL:
+            return cached[0]
+        block = self.backend(chain).block_number()
+        self._heads[chain] = (block, time.time())
+        return block
+    
+    def cached_result(self, chain, token, block=None):
+        """Newest stored result at the requested block, or within tolerance of the head"""
+        floor = self.head(chain) - self.tolerance if block is None else None
+        with self.write_lock:
+            if block is not None:
+                row = self.conn.execute("SELECT result FROM audit_results WHERE chain = ? AND token = ? AND block_number = ?",
+                                        (chain, token, block)).fetchone()
+            else:
+                row = self.conn.execute("""
+                    SELECT result FROM audit_results WHERE chain = ? AND token = ? AND block_number >= ?
+                    ORDER BY block_number DESC LIMIT 1
+                """, (chain, token, floor)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def submit(self, chain, token, block=None, chart=True, refresh=False, verify_top=0):
+        """Returns (job, cached result or None)"""
+        if chain not in CHAINS:
+            raise ValueError(f"unknown chain '{chain}' (known: {', '.join(CHAINS)})")
+        token = token.lower()
+        block = None if block is None else int(block)
+        with self.lock:
+            self.stats["submitted"] += 1
+        if not refresh:
+            cached = self.cached_result(chain, token, block)
+            if cached is not None:
+                with self.lock:
+                    self.stats["cache_hits"] += 1
+                return None, cached
+        key = (chain, token, block)
+        with self.lock:
+            existing = self.in_flight.get(key)
+            if existing is not None:
+                self.stats["deduplicated"] += 1
+                return existing, None
+            job = AuditJob(chain, token, {"block": block, "chart": chart, "verify_top": verify_top})
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+        job.emit("queued", position=self.queue.qsize())
+        self.queue.put(job)
+        return job, None
+    
+    def get(self, job_id):
+        self._expire()
+        return self.jobs.get(job_id)
+    
+    def _expire(self):
+        cutoff = time.time() - JOB_RETENTION
+        with self.lock:
+            for job_id in [j for j, job in self.jobs.items() if job.finished and job.finished < cutoff]:
+                del self.jobs[job_id]
+    
+    def _work(self):
+        conn = store.connect(self.db_path)
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            job.emit("running")
+            outcome = "failed"
+            try:
+                result = self.run_audit(job, conn)
+                job.finish(result)
+                outcome = "completed"
+            except Exception as e:
+                job.finish(error=str(e))
+            finally:
+                with self.lock:
+                    self.stats[outcome] += 1
+                    self.in_flight.pop((job.chain, job.token, job.options["block"]), None)
+    
+    def run_audit(self, job, conn):
+        backend = self.backend(job.chain)
+        started = time.time()
+        job.emit("sync")
+        holders = scan_chain(job.chain, job.token, conn, self.write_lock, verify_top=job.options["verify_top"],
+                             backend=backend, block=job.options["block"])
+        block = job.options["block"]
+        if block is None:
+            block = store.get_watermark(conn, "explorer", job.token, "tokentx", job.chain) or self.head(job.chain)
+        balances = holders["balance"].to_numpy()
+        job.emit("holders", holders=len(balances), block=block)
+        
+        metrics = holder_metrics(balances)
+        pairs = self._pairs(backend, job.chain, job.token)
+        job.emit("pairs", pairs=len(pairs))
+        
+        share = metrics.get(f"top{CONCENTRATION_TOP}_share", 0.0)
+        red_flags = {
+            "concentration": share > CONCENTRATION_LIMIT,
+            "fake_holders": metrics.get("dust_holder_share", 0.0) > 0.5,
+            "no_liquidity": bool(pairs) and sum(p["liquidity_usd"] for p in pairs) < 1000
+        }
+        result = {
+            "chain": job.chain, "token": job.token, "block": block,
+            "generated_at": datetime.now().isoformat(timespec='seconds'),
+            "metrics": metrics, "red_flags": red_flags, "pairs": pairs,
+            "top_holders": [{"address": a, "balance": float(b)} for a, b in
+                            zip(holders["address"][:CONCENTRATION_TOP], balances[:CONCENTRATION_TOP])]
+        }
+        if job.options["chart"] and self.charts is not None and len(balances):
+            path = os.path.join(CHART_DIR, f"{job.chain}_{job.token}_{block}.png")
+            title = f"Holder concentration: {job.token[:10]}... on {job.chain} at block {block:,}"
+            result["chart"] = self.charts.submit(render_holder_chart, path, title, balances[:50]).result()
+            job.emit("chart", path=result["chart"])
+        result["elapsed"] = round(time.time() - started, 2)
+        
+        with self.write_lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO audit_results VALUES (?, ?, ?, ?, ?)",
+                                  (job.chain, job.token, block, result["generated_at"], json.dumps(result)))
+        return result
+    
+    def _pairs(self, backend, chain, token):
+        """DexScreener pairs for the token on this chain, through the backend's warm session"""
+        try:
+            response = backend.session.get(DEXSCREENER_TOKEN_URL.format(token=token), timeout=30)
+            response.raise_for_status()
+            pairs = response.json().get('pairs') or []
+        except Exception as e:
+            print(f"[{chain}] DexScreener lookup failed: {e}")
+            return []
+        return [{
+            'pair_address': pair.get('pairAddress'),
+            'dex': pair.get('dexId'),
+            'quote_token': pair.get('quoteToken', {}).get('symbol'),
+            'price_usd': pair.get('priceUsd'),
+            'liquidity_usd': (pair.get('liquidity') or {}).get('usd', 0) or 0,
+            'volume_24h': (pair.get('volume') or {}).get('h24', 0) or 0
+        } for pair in pairs if pair.get('chainId') == chain]
+    
+    def health(self):
+        with self.lock:
+            stats = dict(self.stats)
+            in_flight, jobs = len(self.in_flight), len(self.jobs)
+        return {"queue": self.queue.qsize(), "in_flight": in_flight, "jobs": jobs,
+                "workers": len(self.workers), "chains": sorted(self.backends), **stats}
+    
+    def close(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        if self.charts is not None:
+            self.charts.shutdown()
+
+class AuditHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /audits, GET /audits/<id>, GET /audits/<id>/events (server-sent events), GET /health"""
+    
+    server_version = "NCRAudit/1.0"
+    
+    @property
+    def service(self):
+        return self.server.service
+    
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip("/") != "/audits":
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            params = json.loads(self.rfile.read(length) or b"{}")
+            job, cached = self.service.submit(params.get("chain", "polygon"), params["token"], params.get("block"),
+                                              params.get("chart", True), params.get("refresh", False),
+                                              params.get("verify_top", 0))
+        except (KeyError, ValueError) as e:
+            return self._send(400, {"error": f"bad request: {e}"})
+        except Exception as e:
+            return self._send(502, {"error": str(e)})
+        if cached is not None:
+            return self._send(200, {"status": "done", "cached": True, "result": cached})
+        self._send(202, {"id": job.id, "status": job.status, "poll": f"/audits/{job.id}",
+                         "events": f"/audits/{job.id}/events"})
+    
+    def do_GET(self):
+        parts = [p for p in urlsplit(self.path).path.split("/") if p]
+        if parts == ["health"]:
+            return self._send(200, self.service.health())
+        if len(parts) < 2 or parts[0] != "audits":
+            return self._send(404, {"error": "not found"})
+        job = self.service.get(parts[1])
+        if job is None:
+            return self._send(404, {"error": f"no job {parts[1]}"})
+        if len(parts) == 2:
+            return self._send(200, job.to_dict())
+        if parts[2:] == ["events"]:
+            return self._stream(job)
+        self._send(404, {"error": "not found"})
+    
+    def _stream(self, job):
+        """Replay the job's progress events and follow it until it finishes"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        sent = 0
+        while True:
+            with job.changed:
+                while sent == len(job.events) and job.finished is None:
+                    job.changed.wait(timeout=15)
+                    if sent == len(job.events) and job.finished is None:
+                        break
+                events = job.events[sent:]
+                done = job.finished is not None and sent + len(events) == len(job.events)
+            try:
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                for event in events:
+                    self.wfile.write(f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n".encode())
+                if done:
+                    self.wfile.write(f"event: result\ndata: {json.dumps(job.to_dict())}\n\n".encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            sent += len(events)
+            if done:
+                return
+    
+    def log_message(self, format, *args):
+        print(f"[{datetime.now():%H:%M:%S}] {self.address_string()} {format % args}")
+
+def serve(host=HOST, port=PORT, workers=WORKERS, chart_workers=CHART_WORKERS, tolerance=CACHE_TOLERANCE_BLOCKS):
+    service = AuditService(workers, chart_workers, tolerance)
+    server = ThreadingHTTPServer((host, port), AuditHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service that runs token audits on warm workers")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--chart-workers", type=int, default=CHART_WORKERS)
+    parser.add_argument("--tolerance", type=int, default=CACHE_TOLERANCE_BLOCKS,
+                        help="blocks behind the head a cached result may be and still be served")
+    args = parser.parse_args()
+    
+    server = serve(args.host, args.port, args.workers, args.chart_workers, args.tolerance)
+    base = f"http://{args.host}:{args.port}"
+    print("=== NCR Audit Service ===")
+    print(f"Listening on {base} with {args.workers} workers and {args.chart_workers} chart processes")
+    print(f"  curl -X POST {base}/audits -d '{{\"token\": \"0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b\"}}'")
+    print(f"  curl {base}/audits/<id>            # poll")
+    print(f"  curl -N {base}/audits/<id>/events  # stream progress")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+        server.service.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,237 @@
+import argparse
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+import requests
+
+import ncr_event_store as store
+from ncr_blockchain_scanner import NCR_CONTRACT, BITQUERY_SINCE, BITQUERY_TILL, build_bitquery_queries
+from ncr_rate_limiter import RateLimiter
+
+BITQUERY_URL = "https://graphql.bitquery.io"
+NCR_DECIMALS = 18
+
+# Execution settings
+SLICE_DAYS = 7
+PAGE_SIZE = 2500
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 1.0
+MAX_RETRIES = 5
+EPOCH = date(1970, 1, 1)
+
+# Query name -> (GraphQL field under "ethereum", event store table)
+QUERY_TARGETS = {
+    "top_traders": ("transfers", "indexer_transfers"),
+    "liquidity_events": ("dexTrades", "dex_trades")
+}
+
+def date_slices(since=BITQUERY_SINCE, till=BITQUERY_TILL, days=SLICE_DAYS):
+    """Split an inclusive date range into consecutive (since, till) slices"""
+    start = date.fromisoformat(since)
+    end = date.fromisoformat(till)
+    slices = []
+    while start <= end:
+        stop = min(start + timedelta(days=days - 1), end)
+        slices.append((start.isoformat(), stop.isoformat()))
+        start = stop + timedelta(days=1)
+    return slices
+
+def run_query(query, url=BITQUERY_URL, session=None, limiter=None, api_key=None):
+    """POST a GraphQL query, retrying on throttling and transient errors"""
+    headers = {"Content-Type": "application/json"}
+    api_key = api_key or os.environ.get("BITQUERY_API_KEY")
+    if api_key:
+        headers["X-API-KEY"] = api_key
+    
+    for attempt in range(MAX_RETRIES):
+        if limiter:
+            limiter.acquire()
+        try:
+            response = (session or requests).post(url, json={"query": query}, headers=headers, timeout=60)
+        except requests.RequestException as e:
+            print(f"Bitquery request failed ({e}), retrying...")
+            time.sleep(2 ** attempt)
+            continue
+        
+        if response.status_code == 429 or response.status_code >= 500:
+            backoff = float(response.headers.get("Retry-After", 2 ** attempt))
+            if limiter:
+                limiter.penalize(backoff)
+            time.sleep(backoff)
+            continue
+        response.raise_for_status()
+        
+        data = response.json()
+        if data.get('errors'):
+            raise RuntimeError(f"Bitquery error: {data['errors'][0].get('message', data['errors'])}")
+        return data.get('data') or {}
+    
+    raise RuntimeError(f"Bitquery request failed after {MAX_RETRIES} attempts")
+
+def normalize_transfer(row):
+    """Map a Bitquery transfers row onto the event store's indexer_transfers schema"""
+    block = row.get('block') or {}
+    # Bitquery reports decimal-scaled amounts; scale back to raw units for the store
+    value = int(Decimal(str(row['amount'])) * (10 ** NCR_DECIMALS))
+    return {
+        'chain': 'polygon',
+        'token': NCR_CONTRACT.lower(),
+        'block_number': block.get('height') or 0,
+        'occurrence': 0,  # Bitquery has no log index; execute_queries numbers repeats
+        'tx_hash': row['transaction']['hash'].lower(),
+        'timestamp': (block.get('timestamp') or {}).get('unixtime'),
+        'from_address': row['sender']['address'].lower(),
+        'to_address': row['receiver']['address'].lower(),
+        'value': str(value),
+        'source': 'bitquery'
+    }
+
+def normalize_dex_trade(row):
+    """Map a Bitquery dexTrades row onto the event store's dex_trades schema"""
+    block = row.get('block') or {}
+    contract = ((row.get('smartContract') or {}).get('address') or {}).get('address')
+    return {
+        'chain': 'polygon',
+        'token': NCR_CONTRACT.lower(),
+        'pair': contract.lower() if contract else None,
+        'block_number': block.get('height') or 0,
+        'tx_hash': row['transaction']['hash'].lower(),
+        'timestamp': (block.get('timestamp') or {}).get('unixtime'),
+        'exchange': (row.get('exchange') or {}).get('name'),
+        'base_amount': float(row['baseAmount']),
+        'quote_amount': float(row['quoteAmount']),
+        'price': float(row['price']) if row.get('price') is not None else None,
+        'source': 'bitquery'
+    }
+
+NORMALIZERS = {"indexer_transfers": normalize_transfer, "dex_trades": normalize_dex_trade}
+
+def page_slice(name, since, till, page_size, url, session, limiter, api_key=None):
+    """Yield pages of rows for one query and date slice until the slice is exhausted"""
+    field = QUERY_TARGETS[name][0]
+    offset = 0
+    while True:
+        query = build_bitquery_queries(since, till, limits={name: page_size}, offset=offset)[name]
+        data = run_query(query, url, session, limiter, api_key)
+        rows = ((data.get('ethereum') or {}).get(field)) or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+def _day_position(day):
+    """UTC midnight of an ISO date as a unix timestamp (watermark position)"""
+    return (date.fromisoformat(day) - EPOCH).days * 86400
+
+def execute_queries(names=tuple(QUERY_TARGETS), since=BITQUERY_SINCE, till=BITQUERY_TILL, conn=None,
+                    url=BITQUERY_URL, slice_days=SLICE_DAYS, page_size=PAGE_SIZE, max_workers=MAX_WORKERS,
+                    rate=REQUESTS_PER_SECOND, api_key=None, full=False):
+    """Run the generated queries over date slices concurrently and stream rows into the event store
+    
+    Workers page through their slice and hand each page (or its failure) to this
+    thread, which is the only one writing to SQLite or the failed-slice map. Each query resumes the day after its
+    watermark unless full=True. Transfers go to indexer_transfers, never the
+    log-indexed transfers table. Returns row counts per query.
+    """
+    conn = conn or store.connect()
+    moved = store.move_indexer_transfers(conn)
+    if moved:
+        print(f"Moved {moved:,} Bitquery transfers out of the transfers table")
+    limiter = RateLimiter(rate, burst=max_workers)
+    session = requests.Session()
+    pages = queue.Queue(maxsize=max_workers * 4)
+    done, error = object(), object()
+    
+    failed = {}
+    occurrences = {}
+    
+    def worker(name, since, till):
+        try:
+            for rows in page_slice(name, since, till, page_size, url, session, limiter, api_key):
+                pages.put((name, since, rows))
+        except Exception as e:
+            print(f"{name} {since}..{till} failed: {e}")
+            pages.put((name, since, error))
+        finally:
+            pages.put((name, since, done))
+    
+    jobs = []
+    for name in names:
+        start = since
+        mark = None if full else store.get_watermark(conn, "bitquery", name, "query", "polygon")
+        if mark is not None:
+            start = max(since, (EPOCH + timedelta(days=mark // 86400 + 1)).isoformat())
+            print(f"{name}: synced through {EPOCH + timedelta(days=mark // 86400)}, fetching from {start}")
+        jobs += [(name, s, t) for s, t in date_slices(start, till, slice_days)]
+    counts = {name: 0 for name in names}
+    print(f"Running {len(jobs)} Bitquery slice jobs with {max_workers} workers at {rate} req/s")
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for job in jobs:
+            pool.submit(worker, *job)
+        
+        remaining = len(jobs)
+        while remaining:
+            name, since_day, rows = pages.get()
+            if rows is done:
+                occurrences.pop((name, since_day), None)
+                remaining -= 1
+                continue
+            if rows is error:
+                failed[name] = min(failed.get(name, since_day), since_day)
+                continue
+            table = QUERY_TARGETS[name][1]
+            normalized = [NORMALIZERS[table](row) for row in rows]
+            with conn:
+                if table == "indexer_transfers":
+                    # A transaction's rows all come from one slice, whose pages arrive in order
+                    seen = occurrences.setdefault((name, since_day), {})
+                    for row in normalized:
+                        key = (row['tx_hash'], row['from_address'], row['to_address'], row['value'])
+                        row['occurrence'] = seen.get(key, 0)
+                        seen[key] = row['occurrence'] + 1
+                    store.insert_indexer_transfers(conn, normalized)
+                else:
+                    store.insert_dex_trades(conn, normalized)
+            counts[name] += len(normalized)
+    
+    # Only whole days before the first failed slice (and before today) count as synced
+    complete = min(date.fromisoformat(till), date.today() - timedelta(days=1))
+    for name in names:
+        through = complete
+        if name in failed:
+            through = min(through, date.fromisoformat(failed[name]) - timedelta(days=1))
+        if through >= date.fromisoformat(since):
+            store.set_watermark(conn, "bitquery", name, "query", _day_position(through.isoformat()), "polygon", "timestamp")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Execute the NCR Bitquery queries into the local event store")
+    parser.add_argument("--url", default=BITQUERY_URL, help="GraphQL endpoint (point at a mock server for offline runs)")
+    parser.add_argument("--since", default=BITQUERY_SINCE)
+    parser.add_argument("--till", default=BITQUERY_TILL)
+    parser.add_argument("--slice-days", type=int, default=SLICE_DAYS)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="requests per second")
+    parser.add_argument("--query", action="append", choices=list(QUERY_TARGETS), help="run only these queries")
+    parser.add_argument("--full", action="store_true", help="ignore stored watermarks and rerun every slice")
+    args = parser.parse_args()
+    
+    print("=== NCR Bitquery Executor ===")
+    conn = store.connect()
+    start = time.time()
+    counts = execute_queries(tuple(args.query or QUERY_TARGETS), args.since, args.till, conn, args.url,
+                             args.slice_days, args.page_size, args.workers, args.rate, full=args.full)
+    
+    print(f"\nFinished in {time.time() - start:.1f}s")
+    for name, count in counts.items():
+        print(f"- {name}: {count:,} rows")
+    store.describe(conn)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -6,17 +6,35 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from web3 import Web3
 import time
+import os
 from collections import defaultdict
 
 # NCR Token Contract (checksum)
 NCR_CONTRACT = Web3.to_checksum_address("0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b")
 
-def analyze_dexscreener_pairs():
-    """Analyze NCR trading pairs on DexScreener"""
+# Investigation window used by the Bitquery queries
+BITQUERY_SINCE = "2021-10-01"
+BITQUERY_TILL = "2022-10-31"
+
+# Holder-pattern red flags the investigation looks for
+RED_FLAGS = {
+    "concentration": "Top 10 wallets holding >50% of supply",
+    "dormant_whales": "Large wallets inactive until dump",
+    "connected_wallets": "Multiple wallets with similar behavior",
+    "team_wallets": "Unlabeled team wallets dumping",
+    "fake_holders": "Many wallets with dust amounts",
+    "wash_trading": "Circular transfers between wallets"
+}
+
+def analyze_dexscreener_pairs(token=NCR_CONTRACT, save=True):
+    """Analyze NCR trading pairs on DexScreener
+    
+    With save=False the pairs are only returned, not written to ncr_trading_pairs.csv.
+    """
     print("\nAnalyzing NCR trading pairs...")
     
     # Get token info from DexScreener
-    token_url = f"https://api.dexscreener.com/latest/dex/tokens/{NCR_CONTRACT}"
+    token_url = f"https://api.dexscreener.com/latest/dex/tokens/{token}"
     
     try:
         response = requests.get(token_url)
@@ -50,7 +68,7 @@ def analyze_dexscreener_pairs():
                 print(f"  24h Change: {info['price_change_24h']:.2f}%")
             
             # Save pair data
-            if pair_data:
+            if pair_data and save:
                 df = pd.DataFrame(pair_data)
                 df.to_csv('ncr_trading_pairs.csv', index=False)
                 print(f"\nSaved {len(pair_data)} trading pairs to ncr_trading_pairs.csv")
@@ -62,19 +80,18 @@ def analyze_dexscreener_pairs():
     
     return []
 
-def fetch_bitquery_data():
-    """Generate Bitquery queries for NCR analysis"""
-    print("\nGenerating Bitquery analysis queries...")
+def build_bitquery_queries(since=BITQUERY_SINCE, till=BITQUERY_TILL, limits=None, offset=0):
+    """Build the Bitquery GraphQL queries for one date range and result page"""
+    limits = {"top_traders": 100, "liquidity_events": 1000, **(limits or {})}
     
-    # Bitquery GraphQL queries for NCR analysis
     queries = {
         "top_traders": f"""
         {{
           ethereum(network: polygon) {{
             transfers(
               currency: {{is: "{NCR_CONTRACT}"}}
-              options: {{limit: 100, desc: "amount"}}
-              date: {{since: "2021-10-01", till: "2022-10-31"}}
+              options: {{limit: {limits['top_traders']}, offset: {offset}, desc: "amount"}}
+              date: {{since: "{since}", till: "{till}"}}
             ) {{
               sender {{
                 address
@@ -88,6 +105,12 @@ def fetch_bitquery_data():
               transaction {{
                 hash
               }}
+              block {{
+                height
+                timestamp {{
+                  unixtime
+                }}
+              }}
               date {{
                 date
               }}
@@ -101,15 +124,26 @@ def fetch_bitquery_data():
           ethereum(network: polygon) {{
             dexTrades(
               baseCurrency: {{is: "{NCR_CONTRACT}"}}
-              date: {{since: "2021-10-01", till: "2022-10-31"}}
-              options: {{limit: 1000}}
+              date: {{since: "{since}", till: "{till}"}}
+              options: {{limit: {limits['liquidity_events']}, offset: {offset}, asc: "block.height"}}
             ) {{
               date {{
                 date
               }}
+              block {{
+                height
+                timestamp {{
+                  unixtime
+                }}
+              }}
               exchange {{
                 name
               }}
+              smartContract {{
+                address {{
+                  address
+                }}
+              }}
               baseAmount
               quoteAmount
               transaction {{
@@ -122,6 +156,15 @@ def fetch_bitquery_data():
         """
     }
     
+    return queries
+
+def fetch_bitquery_data():
+    """Generate Bitquery queries for NCR analysis"""
+    print("\nGenerating Bitquery analysis queries...")
+    
+    # Bitquery GraphQL queries for NCR analysis (run them with ncr_bitquery_executor.py)
+    queries = build_bitquery_queries()
+    
     print("\nBitquery queries generated for:")
     print("1. Top traders and large transfers")
     print("2. DEX trading history")
@@ -136,19 +179,18 @@ def analyze_holder_distribution():
     # This would typically use Covalent or similar API
     # For now, we'll document what to look for
     
-    red_flags = {
-        "concentration": "Top 10 wallets holding >50% of supply",
-        "dormant_whales": "Large wallets inactive until dump",
-        "connected_wallets": "Multiple wallets with similar behavior",
-        "team_wallets": "Unlabeled team wallets dumping",
-        "fake_holders": "Many wallets with dust amounts",
-        "wash_trading": "Circular transfers between wallets"
-    }
+    red_flags = dict(RED_FLAGS)
     
     print("\nRed flags to investigate:")
     for flag, description in red_flags.items():
         print(f"- {flag}: {description}")
     
+    # Circular transfers are computed by ncr_wash_trading.py from the event store
+    if os.path.exists('ncr_wash_cycles.csv'):
+        cycles = pd.read_csv('ncr_wash_cycles.csv')
+        print(f"\nwash_trading: {len(cycles):,} circular transfer cycles detected "
+              f"({int(cycles['touches_pair'].sum()):,} through DEX pairs)")
+    
     return red_flags
 
 def create_timeline_visualization():
@@ -0,0 +1,305 @@
+import argparse
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from web3 import Web3
+
+import ncr_event_store as store
+from ncr_chains import ChainBackend
+from ncr_valuation import NCR_CONTRACT
+
+CONTRACT_ANALYSIS_FILE = "ncr_contract_analysis.json"
+SCAN_WORKERS = 8
+MAX_PROXY_DEPTH = 3
+
+# Storage slots that hold a proxy's implementation, beacon or admin address
+EIP1967_IMPLEMENTATION_SLOT = "0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc"
+EIP1967_BEACON_SLOT = "0xa3f0ad74e5423aebfd80d3ef4346578335a9a72aeaee59ff6cb3582b35133d50"
+EIP1967_ADMIN_SLOT = "0xb53127684a568b3173ae13b9f8a6016e243e63b6e8ee1178d6a717850b5d6103"
+ZEPPELINOS_IMPLEMENTATION_SLOT = "0x7050c9e0f4ca769c69bd3a8ef740bc37934f8e2c036e5a723fd8ee048ed3f8c3"
+BEACON_IMPLEMENTATION_SELECTOR = "0x5c60da1b"
+EIP1167_PATTERN = re.compile(r"^363d3d373d3d3d363d73([0-9a-f]{40})5af43d82803e903d91602b57fd5bf3$")
+
+PUSH1, PUSH4, PUSH32 = 0x60, 0x63, 0x7f
+DUP1, DUP16 = 0x80, 0x8f
+EQ = 0x14
+FLAGGED_OPCODES = {0xff: "selfdestruct", 0xf4: "delegatecall", 0xf2: "callcode", 0xf5: "create2"}
+
+# Admin functions by capability; selectors are matched against the dispatcher
+RISK_SIGNATURES = {
+    "mint": ["mint(address,uint256)", "mint(uint256)", "mintTo(address,uint256)", "issue(uint256)",
+             "increaseSupply(uint256)", "setBalance(address,uint256)"],
+    "burn": ["burn(address,uint256)", "destroyBlackFunds(address)"],
+    "blacklist": ["blacklist(address)", "addBlackList(address)", "addToBlacklist(address)", "setBlacklist(address,bool)",
+                  "blacklistAddress(address,bool)", "freeze(address)", "freezeAccount(address,bool)", "setBots(address[])",
+                  "addBots(address[])", "setBot(address,bool)", "blockBots(address[])"],
+    "pause": ["pause()", "unpause()", "setPaused(bool)", "enableTrading()", "openTrading()", "setTradingEnabled(bool)"],
+    "fees": ["setFee(uint256)", "setFees(uint256,uint256)", "setTax(uint256)", "setTaxFeePercent(uint256)",
+             "setLiquidityFeePercent(uint256)", "setBuyFee(uint256)", "setSellFee(uint256)", "updateFees(uint256,uint256)",
+             "setMarketingFee(uint256)", "setSwapFee(uint256)"],
+    "limits": ["setMaxTxAmount(uint256)", "setMaxTxPercent(uint256)", "setMaxWallet(uint256)",
+               "setMaxWalletSize(uint256)", "setCooldown(uint256)"],
+    "upgrade": ["upgradeTo(address)", "upgradeToAndCall(address,bytes)", "changeAdmin(address)", "setImplementation(address)"],
+    "ownership": ["owner()", "transferOwnership(address)", "renounceOwnership()", "grantRole(bytes32,address)"],
+}
+SELECTOR_INDEX = {Web3.keccak(text=signature)[:4].hex(): (category, signature)
+                  for category, signatures in RISK_SIGNATURES.items() for signature in signatures}
+HIGH_RISK = {"mint", "burn", "blacklist", "upgrade", "selfdestruct"}
+MEDIUM_RISK = {"pause", "fees", "limits", "callcode"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS code_analysis (
+    code_hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    selectors TEXT NOT NULL,
+    opcodes TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS contract_code (
+    chain TEXT NOT NULL,
+    address TEXT NOT NULL,
+    code_hash TEXT,
+    proxy_kind TEXT,
+    implementation TEXT,
+    checked_at TEXT NOT NULL,
+    PRIMARY KEY (chain, address)
+);
+"""
+
+def strip_metadata(code):
+    """Drop the trailing CBOR metadata solc appends (its length is in the last two bytes)"""
+    if len(code) < 2:
+        return code
+    length = int.from_bytes(code[-2:], "big")
+    start = len(code) - length - 2
+    # CBOR maps of 1-5 entries start with 0xa1-0xa5
+    if 0 <= start < len(code) - 2 and 0xa1 <= code[start] <= 0xa5:
+        return code[:start]
+    return code
+
+def disassemble(code):
+    """Linear sweep over runtime bytecode; returns (opcodes, push arguments) as parallel lists"""
+    ops, args = [], []
+    i, n = 0, len(code)
+    while i < n:
+        op = code[i]
+        if PUSH1 <= op <= PUSH32:
+            width = op - PUSH1 + 1
+            args.append(code[i + 1:i + 1 + width])
+            i += width + 1
+        else:
+            args.append(None)
+            i += 1
+        ops.append(op)
+    return ops, args
+
+def analyze_code(code):
+    """Function selectors from the dispatcher and flagged opcodes of one runtime bytecode"""
+    ops, args = disassemble(strip_metadata(code))
+    selectors, opcodes = set(), set()
+    for i, op in enumerate(ops):
+        if op == PUSH4 and len(args[i]) == 4:
+            # Dispatcher compares against the selector directly or after a DUPn
+            j = i + 1
+            if j < len(ops) and DUP1 <= ops[j] <= DUP16:
+                j += 1
+            if j < len(ops) and ops[j] == EQ:
+                selectors.add(args[i].hex())
+        elif op in FLAGGED_OPCODES:
+            opcodes.add(FLAGGED_OPCODES[op])
+    return {"size": len(code), "selectors": sorted(selectors), "opcodes": sorted(opcodes)}
+
+def capabilities(analysis):
+    """Risky capabilities found in an analysis: category -> matched signatures"""
+    found = {}
+    for selector in analysis["selectors"]:
+        if selector in SELECTOR_INDEX:
+            category, signature = SELECTOR_INDEX[selector]
+            found.setdefault(category, []).append(signature)
+    for opcode in analysis["opcodes"]:
+        if opcode in ("selfdestruct", "callcode"):
+            found.setdefault(opcode, []).append(opcode.upper())
+    return found
+
+def risk_level(found):
+    if HIGH_RISK & set(found):
+        return "high"
+    if MEDIUM_RISK & set(found):
+        return "medium"
+    return "low"
+
+def _slot_address(word):
+    value = int(word, 16) if word and word != "0x" else 0
+    return Web3.to_checksum_address(f"{value:040x}") if 0 < value < 1 << 160 else None
+
+class BytecodeAnalyzer:
+    """Contract risk analysis with results cached by code hash
+    
+    Most tokens are clones of a handful of templates, so the disassembly for
+    a keccak code hash is done once and kept in the event store; scanning
+    more addresses with the same bytecode only costs the eth_getCode call.
+    Proxies are followed through EIP-1167, EIP-1967 (direct and beacon) and
+    ZeppelinOS slots, and each layer's findings are reported.
+    """
+    
+    def __init__(self, conn=None, backend=None, chain="polygon"):
+        self.conn = conn or store.connect()
+        self.conn.executescript(SCHEMA)
+        self.chain = chain
+        self.backend = backend or ChainBackend(chain)
+        self.lock = threading.Lock()
+        self.analyses = {}
+        self.stats = {"contracts": 0, "unique_code": 0, "disassembled": 0, "cache_hits": 0}
+    
+    def _analysis(self, code_hash, code):
+        # Disassembly is CPU-bound and holds the GIL anyway; doing it under the
+        # lock guarantees concurrent scans of one template disassemble it once
+        with self.lock:
+            if code_hash in self.analyses:
+                self.stats["cache_hits"] += 1
+                return self.analyses[code_hash]
+            row = self.conn.execute("SELECT size, selectors, opcodes FROM code_analysis WHERE code_hash = ?", (code_hash,)).fetchone()
+            if row:
+                analysis = {"size": row[0], "selectors": json.loads(row[1]), "opcodes": json.loads(row[2])}
+                self.stats["cache_hits"] += 1
+            else:
+                analysis = analyze_code(code)
+                self.stats["disassembled"] += 1
+                self.conn.execute("INSERT OR REPLACE INTO code_analysis VALUES (?, ?, ?, ?, ?)",
+                                  (code_hash, analysis["size"], json.dumps(analysis["selectors"]),
+                                   json.dumps(analysis["opcodes"]), datetime.now().isoformat(timespec='seconds')))
+                self.conn.commit()
+            self.stats["unique_code"] += 1
+            self.analyses[code_hash] = analysis
+        return analysis
+    
+    def _proxy_target(self, address, code):
+        """(proxy kind, implementation address) or (None, None)"""
+        clone = EIP1167_PATTERN.match(code.hex())
+        if clone:
+            return "eip1167", Web3.to_checksum_address(clone.group(1))
+        implementation = _slot_address(self.backend.rpc("eth_getStorageAt", [address, EIP1967_IMPLEMENTATION_SLOT, "latest"]))
+        if implementation:
+            return "eip1967", implementation
+        beacon = _slot_address(self.backend.rpc("eth_getStorageAt", [address, EIP1967_BEACON_SLOT, "latest"]))
+        if beacon:
+            result = self.backend.rpc("eth_call", [{"to": beacon, "data": BEACON_IMPLEMENTATION_SELECTOR}, "latest"])
+            return "eip1967-beacon", _slot_address(result)
+        implementation = _slot_address(self.backend.rpc("eth_getStorageAt", [address, ZEPPELINOS_IMPLEMENTATION_SLOT, "latest"]))
+        if implementation:
+            return "zeppelinos", implementation
+        return None, None
+    
+    def _layer(self, address):
+        code = bytes.fromhex(self.backend.rpc("eth_getCode", [address, "latest"])[2:])
+        if not code:
+            return {"address": address, "code_hash": None, "kind": "eoa"}, None
+        code_hash = Web3.keccak(code).hex()
+        analysis = self._analysis(code_hash, code)
+        # Selector-less DELEGATECALL forwarders are proxies even if no known slot is set
+        kind, implementation = self._proxy_target(address, code) if "delegatecall" in analysis["opcodes"] else (None, None)
+        layer = {"address": address, "code_hash": code_hash, "kind": kind or "contract", "size": analysis["size"],
+                 "selectors": len(analysis["selectors"]), "capabilities": capabilities(analysis)}
+        if kind:
+            layer["implementation"] = implementation
+            admin = _slot_address(self.backend.rpc("eth_getStorageAt", [address, EIP1967_ADMIN_SLOT, "latest"]))
+            if admin:
+                layer["admin"] = admin
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO contract_code VALUES (?, ?, ?, ?, ?, ?)",
+                              (self.chain, address.lower(), code_hash, kind, implementation,
+                               datetime.now().isoformat(timespec='seconds')))
+            self.conn.commit()
+        return layer, implementation
+    
+    def inspect(self, address):
+        """Analyze a contract and every implementation behind it"""
+        address = Web3.to_checksum_address(address)
+        layers = []
+        target = address
+        while target and len(layers) <= MAX_PROXY_DEPTH:
+            layer, target = self._layer(target)
+            layers.append(layer)
+        with self.lock:
+            self.stats["contracts"] += 1
+        
+        found = {}
+        for layer in layers:
+            for category, signatures in layer.get("capabilities", {}).items():
+                listed = found.setdefault(category, [])
+                listed.extend(signature for signature in signatures if signature not in listed)
+        if layers[0]["kind"] not in ("contract", "eoa", "eip1167"):
+            # Whoever controls the proxy admin can swap the code behind the token
+            found.setdefault("upgrade", []).append(f"{layers[0]['kind']} proxy")
+        return {"chain": self.chain, "address": address, "layers": layers, "capabilities": found,
+                "risk": risk_level(found), "checked_at": datetime.now().isoformat(timespec='seconds')}
+    
+    def scan(self, addresses, workers=SCAN_WORKERS):
+        """inspect() many addresses concurrently; failures are returned as {"address", "error"}"""
+        def run(address):
+            try:
+                return self.inspect(address)
+            except Exception as e:
+                return {"address": address, "error": str(e)}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run, addresses))
+
+def contract_observation(result):
+    """One-line summary of an inspect() result for the written reports"""
+    found = result["capabilities"]
+    if not found or set(found) == {"ownership"}:
+        return "**No risky admin functions found in the contract bytecode** (mint, blacklist, pause, fee setters, upgradeability)"
+    listed = ", ".join(f"{category} ({', '.join(signatures)})" for category, signatures in sorted(found.items()))
+    return f"**Contract bytecode exposes {result['risk']}-risk admin functions**: {listed}"
+
+def load_contract_analysis(address, path=CONTRACT_ANALYSIS_FILE):
+    """Saved inspect() result for address, or None"""
+    try:
+        with open(path) as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for result in results:
+        if result.get("address", "").lower() == address.lower() and "capabilities" in result:
+            return result
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag mint, blacklist, pause, fee and upgrade functions in token bytecode")
+    parser.add_argument("addresses", nargs="*", default=[NCR_CONTRACT])
+    parser.add_argument("--file", help="text file with one address per line")
+    parser.add_argument("--chain", default="polygon")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    args = parser.parse_args()
+    
+    addresses = list(args.addresses)
+    if args.file:
+        with open(args.file) as f:
+            addresses = [line.strip() for line in f if line.strip()]
+    
+    print("=== Contract Bytecode Analysis ===")
+    analyzer = BytecodeAnalyzer(chain=args.chain)
+    results = analyzer.scan(addresses, workers=args.workers)
+    
+    for result in results:
+        if "error" in result:
+            print(f"{result['address']}: failed - {result['error']}")
+            continue
+        path = " -> ".join(f"{layer['address']} [{layer['kind']}]" for layer in result["layers"])
+        print(f"\n{path}")
+        print(f"  Risk: {result['risk']}")
+        for category, signatures in sorted(result["capabilities"].items()):
+            print(f"  {category}: {', '.join(signatures)}")
+    
+    stats = analyzer.stats
+    print(f"\n{stats['contracts']} contracts, {stats['unique_code']} unique bytecodes, "
+          f"{stats['disassembled']} disassembled, {stats['cache_hits']} cache hits")
+    with open(CONTRACT_ANALYSIS_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {CONTRACT_ANALYSIS_FILE}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
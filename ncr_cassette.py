@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import runpy
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_DIR = "cassettes"
+COMPRESSION_LEVEL = 6
+
+# Query parameters that carry secrets or change every call; they are left out of the match key
+IGNORED_PARAMS = {"apikey", "api_key", "x_cg_demo_api_key", "x_cg_pro_api_key"}
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """A request in replay mode that was never recorded"""
+
+def _canonical_body(body):
+    """Request body with JSON-RPC ids removed, so renumbered calls still match"""
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        body = body.encode()
+    try:
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return body
+    calls = payload if isinstance(payload, list) else [payload]
+    if all(isinstance(c, dict) and "jsonrpc" in c for c in calls):
+        calls = [{k: v for k, v in c.items() if k != "id"} for c in calls]
+        payload = calls if isinstance(payload, list) else calls[0]
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+
+def _redact(url):
+    """URL with sorted query parameters and API keys removed"""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+def request_key(method, url, body=None):
+    """Stable match key for a request: method, URL with sorted non-secret params, body hash"""
+    url = _redact(url)
+    digest = hashlib.sha256(_canonical_body(body)).hexdigest()[:32]
+    return f"{method.upper()} {url} {digest}"
+
+def _renumber(content, body):
+    """Give a replayed JSON-RPC response the ids of the live request"""
+    try:
+        request = json.loads(body)
+        response = json.loads(content)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return content
+    if isinstance(request, dict) and isinstance(response, dict) and "id" in request:
+        response["id"] = request["id"]
+    elif isinstance(request, list) and isinstance(response, list):
+        for call, answer in zip(request, response):
+            if isinstance(call, dict) and isinstance(answer, dict) and "id" in call:
+                answer["id"] = call["id"]
+    else:
+        return content
+    return json.dumps(response).encode()
+
+class Cassette:
+    """Append-only archive of zlib-compressed request/response records
+    
+    <path>.data holds the compressed records back to back; <path>.idx maps
+    each request key to the (offset, length) of its recorded responses in
+    the order they were seen. Replay memory-maps the data file and only
+    decompresses the records that are actually requested.
+    """
+    
+    def __init__(self, path, mode="replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.index = {}
+        self.hits = 0
+        self.misses = 0
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self._data = None
+        self._map = None
+        
+        if mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._data = open(path + ".data", "wb")
+        else:
+            with open(path + ".idx") as f:
+                self.index = {key: [tuple(entry) for entry in entries] for key, entries in json.load(f).items()}
+            self._data = open(path + ".data", "rb")
+            if os.path.getsize(path + ".data"):
+                self._map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    def __len__(self):
+        return sum(len(entries) for entries in self.index.values())
+    
+    def record(self, key, response):
+        record = {
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "url": _redact(response.url),
+            "encoding": response.encoding,
+            "content": response.content.hex()
+        }
+        blob = zlib.compress(json.dumps(record).encode(), COMPRESSION_LEVEL)
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(blob)
+            self.index.setdefault(key, []).append((offset, len(blob)))
+    
+    def play(self, key, request):
+        """Rebuild the next recorded response for a key; repeats the last one once exhausted"""
+        with self._lock:
+            entries = self.index.get(key)
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"no recorded response for {key}", request=request)
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            offset, length = entries[min(position, len(entries) - 1)]
+            self.hits += 1
+        record = json.loads(zlib.decompress(self._map[offset:offset + length]))
+        
+        response = requests.models.Response()
+        response.status_code = record["status"]
+        response.reason = record["reason"]
+        response.headers = CaseInsensitiveDict(record["headers"])
+        # The stored body is already decoded; drop transfer encodings so it isn't decoded twice
+        response.headers.pop("Content-Encoding", None)
+        response.headers.pop("Transfer-Encoding", None)
+        response.url = record["url"]
+        response.encoding = record["encoding"]
+        response._content = _renumber(bytes.fromhex(record["content"]), request.body)
+        response.request = request
+        response.elapsed = timedelta(0)
+        return response
+    
+    def close(self):
+        if self.mode == "record" and self._data and not self._data.closed:
+            self._data.close()
+            with open(self.path + ".idx", "w") as f:
+                json.dump(self.index, f)
+        else:
+            if self._map is not None:
+                self._map.close()
+            if self._data:
+                self._data.close()
+
+_original_send = requests.Session.send
+
+@contextmanager
+def use_cassette(path, mode="replay"):
+    """Route every requests call (CoinGecko, DexScreener, explorers, JSON-RPC, web3) through a cassette
+    
+    Patching Session.send catches requests.get/post as well as sessions and
+    web3's HTTP provider, since they all end up there.
+    """
+    cassette = Cassette(path, mode)
+    
+    def send(session, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if cassette.mode == "replay":
+            return cassette.play(key, request)
+        response = _original_send(session, request, **kwargs)
+        cassette.record(key, response)
+        return response
+    
+    requests.Session.send = send
+    try:
+        yield cassette
+    finally:
+        requests.Session.send = _original_send
+        cassette.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay all HTTP/RPC traffic of an NCR analysis script")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("cassette", help=f"cassette name or path (bare names go under {CASSETTE_DIR}/)")
+    parser.add_argument("script", help="analysis script to run, e.g. ncr_enhanced_analysis.py")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed to the script")
+    args = parser.parse_args()
+    
+    path = args.cassette if os.path.dirname(args.cassette) else os.path.join(CASSETTE_DIR, args.cassette)
+    if args.mode == "replay" and not os.path.exists(path + ".idx"):
+        parser.error(f"no cassette at {path}; record it first")
+    
+    sys.argv = [args.script, *args.args]
+    started = time.time()
+    with use_cassette(path, args.mode) as cassette:
+        try:
+            runpy.run_path(args.script, run_name="__main__")
+        finally:
+            elapsed = time.time() - started
+            if args.mode == "record":
+                print(f"\n[cassette] recorded {len(cassette):,} responses to {path} in {elapsed:.1f}s")
+            else:
+                print(f"\n[cassette] replayed {cassette.hits:,} responses ({cassette.misses:,} misses) in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
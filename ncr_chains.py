@@ -0,0 +1,224 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from eth_abi import encode, decode
+
+import ncr_event_store as store
+from ncr_ledger import load_ledger
+from ncr_polygonscan_fetcher import REORG_OVERLAP, ExplorerClient, sync_transfers
+from ncr_rate_limiter import RateLimiter
+from ncr_rpc import rpc_call
+
+# Multicall3 is deployed at the same address on every chain listed here
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+CHAINS = {
+    "polygon": {
+        "chain_id": 137,
+        "rpc_urls": ["https://polygon-rpc.com", "https://polygon-bor-rpc.publicnode.com"],
+        "explorer_api": "https://api.polygonscan.com/api",
+        "explorer_key_env": "POLYGONSCAN_API_KEY",
+        "explorer_url": "https://polygonscan.com",
+        "block_time": 2.0,
+        "native_token": "MATIC",
+        "multicall": MULTICALL3,
+        "rpc_rate": 10.0,
+        "explorer_rate": 5.0
+    },
+    "ethereum": {
+        "chain_id": 1,
+        "rpc_urls": ["https://ethereum-rpc.publicnode.com", "https://eth.llamarpc.com"],
+        "explorer_api": "https://api.etherscan.io/api",
+        "explorer_key_env": "ETHERSCAN_API_KEY",
+        "explorer_url": "https://etherscan.io",
+        "block_time": 12.0,
+        "native_token": "ETH",
+        "multicall": MULTICALL3,
+        "rpc_rate": 10.0,
+        "explorer_rate": 5.0
+    },
+    "bsc": {
+        "chain_id": 56,
+        "rpc_urls": ["https://bsc-dataseed.binance.org", "https://bsc-rpc.publicnode.com"],
+        "explorer_api": "https://api.bscscan.com/api",
+        "explorer_key_env": "BSCSCAN_API_KEY",
+        "explorer_url": "https://bscscan.com",
+        "block_time": 3.0,
+        "native_token": "BNB",
+        "multicall": MULTICALL3,
+        "rpc_rate": 10.0,
+        "explorer_rate": 5.0
+    },
+    "arbitrum": {
+        "chain_id": 42161,
+        "rpc_urls": ["https://arb1.arbitrum.io/rpc", "https://arbitrum-one-rpc.publicnode.com"],
+        "explorer_api": "https://api.arbiscan.io/api",
+        "explorer_key_env": "ARBISCAN_API_KEY",
+        "explorer_url": "https://arbiscan.io",
+        "block_time": 0.25,
+        "native_token": "ETH",
+        "multicall": MULTICALL3,
+        "rpc_rate": 10.0,
+        "explorer_rate": 5.0
+    }
+}
+
+# Token deployments to scan; bridged copies are added per investigation with --token chain=address
+TOKEN_ADDRESSES = {
+    "polygon": "0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b"
+}
+
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")
+MULTICALL_BATCH = 500
+POOL_SIZE = 16
+
+class ChainBackend:
+    """Endpoints, connection pool and rate limiters for one chain
+    
+    Each chain gets its own HTTP session and limiters, so a slow or throttled
+    chain never holds up requests to the others.
+    """
+    
+    def __init__(self, name, config=None):
+        self.name = name
+        self.config = config or CHAINS[name]
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rpc_limiter = RateLimiter(self.config["rpc_rate"], burst=max(1, int(self.config["rpc_rate"])))
+        self.explorer = ExplorerClient(self.config["explorer_api"], os.environ.get(self.config["explorer_key_env"], ""),
+                                       self.config["explorer_rate"], session=self.session)
+    
+    def rpc(self, method, params=None):
+        """JSON-RPC call against the chain's primary endpoint"""
+        self.rpc_limiter.acquire()
+        return rpc_call(method, params or [], url=self.config["rpc_urls"][0], session=self.session)
+    
+    def block_number(self):
+        return int(self.rpc("eth_blockNumber"), 16)
+    
+    def blocks_for(self, seconds):
+        """Approximate number of blocks produced in a duration"""
+        return int(seconds / self.config["block_time"])
+    
+    def token_decimals(self, token):
+        return int(self.rpc("eth_call", [{"to": token, "data": "0x313ce567"}, "latest"]), 16)
+    
+    def multicall(self, calls, block="latest"):
+        """Run (target, calldata) pairs through Multicall3.aggregate3; returns (success, returndata) pairs"""
+        payload = AGGREGATE3_SELECTOR + encode(["(address,bool,bytes)[]"], [[(target, True, data) for target, data in calls]])
+        tag = hex(block) if isinstance(block, int) else block
+        result = self.rpc("eth_call", [{"to": self.config["multicall"], "data": "0x" + payload.hex()}, tag])
+        return decode(["(bool,bytes)[]"], bytes.fromhex(result[2:]))[0]
+    
+    def balances_of(self, token, holders, block="latest"):
+        """On-chain token balances for many holders, MULTICALL_BATCH per eth_call"""
+        balances = {}
+        for start in range(0, len(holders), MULTICALL_BATCH):
+            batch = holders[start:start + MULTICALL_BATCH]
+            calls = [(token, BALANCE_OF_SELECTOR + encode(["address"], [holder])) for holder in batch]
+            for holder, (success, data) in zip(batch, self.multicall(calls, block)):
+                balances[holder] = decode(["uint256"], data)[0] if success and len(data) >= 32 else None
+        return balances
+
+def scan_chain(name, token, conn, write_lock, start_block=0, verify_top=100, full=False, backend=None, block=None):
+    """Sync a token's transfer history on one chain past its watermark and summarize holders
+    
+    Pass a backend to reuse its warm session and rate limiters across scans.
+    With block, holders are summarized as of that height rather than the head.
+    """
+    backend = backend or ChainBackend(name)
+    started = time.time()
+    
+    end_block = backend.explorer.latest_block()
+    if block is not None:
+        if block > end_block:
+            raise ValueError(f"block {block} is above the {name} head {end_block}")
+        end_block = block
+    fetched = sync_transfers(conn, token, backend.explorer, start_block, end_block, full, chain=name, write_lock=write_lock)
+    
+    with write_lock:
+        ledger, _ = load_ledger(conn, token, name, final_block=end_block - REORG_OVERLAP, to_block=block)
+    
+    try:
+        decimals = backend.token_decimals(token)
+    except Exception as e:
+        print(f"[{name}] could not read decimals ({e}); assuming 18")
+        decimals = 18
+    
+    holders = sorted(((b, a) for a, b in ledger.balances.items() if b > 0), reverse=True)
+    summary = pd.DataFrame({
+        "chain": name,
+        "address": [a for _, a in holders],
+        "balance": [b / 10 ** decimals for b, _ in holders]
+    })
+    
+    if verify_top and holders:
+        try:
+            onchain = backend.balances_of(token, [a for _, a in holders[:verify_top]],
+                                          "latest" if block is None else hex(block))
+            mismatched = sum(1 for b, a in holders[:verify_top] if onchain.get(a) not in (None, b))
+            print(f"[{name}] verified top {min(verify_top, len(holders))} balances via Multicall3: {mismatched} mismatches")
+        except Exception as e:
+            print(f"[{name}] Multicall verification skipped: {e}")
+    
+    print(f"[{name}] {fetched:,} transfers, {len(holders):,} holders in {time.time() - started:.1f}s")
+    return summary
+
+def scan_chains(tokens=None, conn=None, start_blocks=None, full=False):
+    """Scan every configured deployment concurrently and merge holders keyed by (chain, address)"""
+    tokens = tokens or TOKEN_ADDRESSES
+    conn = conn or store.connect()
+    write_lock = threading.Lock()
+    start_blocks = start_blocks or {}
+    
+    with ThreadPoolExecutor(max_workers=len(tokens)) as pool:
+        futures = {chain: pool.submit(scan_chain, chain, token.lower(), conn, write_lock, start_blocks.get(chain, 0), full=full)
+                   for chain, token in tokens.items()}
+        summaries = []
+        for chain, future in futures.items():
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                print(f"[{chain}] scan failed: {e}")
+    
+    if not summaries:
+        return pd.DataFrame(columns=["balance"], index=pd.MultiIndex.from_arrays([[], []], names=["chain", "address"]))
+    return pd.concat(summaries, ignore_index=True).set_index(["chain", "address"]).sort_index()
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan NCR deployments across chains concurrently")
+    parser.add_argument("--token", action="append", default=[], metavar="CHAIN=ADDRESS",
+                        help="token deployment to scan (repeatable); defaults to NCR on Polygon")
+    parser.add_argument("--full", action="store_true", help="ignore stored watermarks and rescan every chain")
+    args = parser.parse_args()
+    
+    tokens = dict(TOKEN_ADDRESSES)
+    for spec in args.token:
+        chain, address = spec.split("=", 1)
+        if chain not in CHAINS:
+            parser.error(f"unknown chain '{chain}' (known: {', '.join(CHAINS)})")
+        tokens[chain] = address
+    
+    print("=== NCR Cross-Chain Scan ===")
+    for chain, address in tokens.items():
+        print(f"- {chain}: {CHAINS[chain]['explorer_url']}/token/{address}")
+    
+    holders = scan_chains(tokens, full=args.full)
+    holders.to_csv('ncr_cross_chain_holders.csv')
+    
+    # The same EOA on several chains is a strong link between deployments
+    per_address = holders.reset_index().pivot_table(index="address", columns="chain", values="balance", aggfunc="sum")
+    multi_chain = per_address[per_address.notna().sum(axis=1) > 1]
+    print(f"\nHolders across all chains: {len(per_address):,}; present on more than one chain: {len(multi_chain):,}")
+    print("Saved ncr_cross_chain_holders.csv")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
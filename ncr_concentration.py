@@ -0,0 +1,263 @@
+import argparse
+import json
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+import ncr_kernels as kernels
+from ncr_interning import AddressInterner
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, read_transfers, split_amounts
+from ncr_watch import ALERTS_FILE, CONCENTRATION_LIMIT, CONCENTRATION_TOP, load_pairs
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+NAKAMOTO_THRESHOLD = 0.5
+RESOLUTIONS = {"block": None, "hour": 3600, "day": 86400}
+
+class BalanceFenwick:
+    """Holder counts and balance sums over coordinate-compressed balance values
+    
+    Every balance the replay will ever produce is known up front, so each
+    distinct value gets a fixed slot. Two Fenwick trees (count and sum) plus
+    a running sum of rank-weighted balances give holder count, top-N share,
+    Nakamoto coefficient and Gini in O(log n) per balance change.
+    """
+    
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float64).tolist()
+        self.size = len(self.values)
+        self.counts = [0] * (self.size + 1)
+        self.sums = [0.0] * (self.size + 1)
+        self.holders = 0
+        self.total = 0.0
+        self.weighted = 0.0          # sum of rank * balance with balances sorted ascending
+        self._top_bit = 1 << max(self.size.bit_length() - 1, 0)
+    
+    def _prefix(self, slot):
+        """(count, sum) of holders in slots [0, slot]"""
+        count, total = 0, 0.0
+        i = slot + 1
+        while i > 0:
+            count += self.counts[i]
+            total += self.sums[i]
+            i -= i & -i
+        return count, total
+    
+    def _update(self, slot, count):
+        value = self.values[slot]
+        i = slot + 1
+        while i <= self.size:
+            self.counts[i] += count
+            self.sums[i] += count * value
+            i += i & -i
+    
+    def add(self, slot):
+        value = self.values[slot]
+        below, below_sum = self._prefix(slot)
+        # The new holder ranks after everyone at or below its value; everyone above moves up one
+        self.weighted += value * (below + 1) + (self.total - below_sum)
+        self._update(slot, 1)
+        self.holders += 1
+        self.total += value
+    
+    def remove(self, slot):
+        value = self.values[slot]
+        below, below_sum = self._prefix(slot)
+        self.weighted -= value * below + (self.total - below_sum)
+        self._update(slot, -1)
+        self.holders -= 1
+        self.total -= value
+    
+    def _descend(self, limit, by_sum):
+        """Largest slot prefix whose count (or sum) stays <= limit (< limit for sums); returns (slot, count, sum)"""
+        position, count, total = 0, 0, 0.0
+        step = self._top_bit
+        while step:
+            nxt = position + step
+            if nxt <= self.size:
+                if by_sum:
+                    fits = total + self.sums[nxt] < limit
+                else:
+                    fits = count + self.counts[nxt] <= limit
+                if fits:
+                    position = nxt
+                    count += self.counts[nxt]
+                    total += self.sums[nxt]
+            step >>= 1
+        return position, count, total
+    
+    def top_share(self, n):
+        """Share of the held total owned by the n largest holders"""
+        if self.total <= 0:
+            return np.nan
+        if n >= self.holders:
+            return 1.0
+        slot, count, bottom = self._descend(self.holders - n, by_sum=False)
+        # The next slot is a run of equal balances; take just enough of them
+        if slot < self.size:
+            bottom += (self.holders - n - count) * self.values[slot]
+        return 1.0 - bottom / self.total
+    
+    def nakamoto(self, threshold=NAKAMOTO_THRESHOLD):
+        """Fewest holders that together own more than threshold of the held total"""
+        if self.total <= 0:
+            return 0
+        limit = (1.0 - threshold) * self.total
+        slot, count, bottom = self._descend(limit, by_sum=True)
+        extra = 0
+        if slot < self.size:
+            value = self.values[slot]
+            available = self._prefix(slot)[0] - count
+            # Equal balances in the next slot that still keep the bottom group under the limit
+            extra = min(available, max(int(np.ceil((limit - bottom) / value)) - 1, 0))
+        return self.holders - count - extra
+    
+    def gini(self):
+        n = self.holders
+        if n == 0 or self.total <= 0:
+            return np.nan
+        return 2.0 * self.weighted / (n * self.total) - (n + 1.0) / n
+
+def balance_updates(chunks, interner, exclude=(), decimals=NCR_DECIMALS, jit=None):
+    """First pass: every (address ID, new balance, block, timestamp) change in event order
+    
+    Running balances are exact integers so an address that sends everything
+    it holds lands on exactly zero; only the recorded values become floats.
+    With the compiled kernel they are exact (whole, fractional) int64 pairs.
+    """
+    skip = {interner.intern(ZERO_ADDRESS), *interner.intern_many([a.lower() for a in exclude]).tolist()} if len(exclude) \
+        else {interner.intern(ZERO_ADDRESS)}
+    use_jit = kernels.resolve(jit)
+    balances = {}
+    scale = 10 ** decimals
+    bal_whole = bal_frac = np.zeros(0, dtype=np.int64)
+    skip_mask = np.zeros(0, dtype=bool)
+    parts = []
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if use_jit:
+            senders = interner.intern_many(chunk['from_address'].to_numpy())
+            receivers = interner.intern_many(chunk['to_address'].to_numpy())
+            if len(interner) > len(bal_whole):
+                grow = max(len(interner), 2 * len(bal_whole)) - len(bal_whole)
+                bal_whole = np.concatenate([bal_whole, np.zeros(grow, dtype=np.int64)])
+                bal_frac = np.concatenate([bal_frac, np.zeros(grow, dtype=np.int64)])
+                skip_mask = np.zeros(len(bal_whole), dtype=bool)
+                skip_mask[list(skip)] = True
+            whole, frac = split_amounts(chunk['value'].to_numpy(), decimals)
+            ids, new, index = kernels.replay_balances(senders, receivers, whole.astype(np.int64), frac, skip_mask,
+                                                      bal_whole, bal_frac, np.int64(scale))
+            parts.append((ids, new, chunk['block_number'].to_numpy(dtype=np.int64)[index],
+                          chunk['timestamp'].to_numpy(dtype=np.int64)[index]))
+            continue
+        senders = interner.intern_many(chunk['from_address'].to_numpy()).tolist()
+        receivers = interner.intern_many(chunk['to_address'].to_numpy()).tolist()
+        ids, new, index = [], [], []
+        for i, (sender, receiver, value) in enumerate(zip(senders, receivers, chunk['value'].tolist())):
+            value = int(value)
+            if sender not in skip:
+                balance = balances.get(sender, 0) - value
+                balances[sender] = balance
+                ids.append(sender)
+                new.append(balance)
+                index.append(i)
+            if receiver not in skip:
+                balance = balances.get(receiver, 0) + value
+                balances[receiver] = balance
+                ids.append(receiver)
+                new.append(balance)
+                index.append(i)
+        index = np.asarray(index, dtype=np.int64)
+        parts.append((np.asarray(ids, dtype=np.int64), np.array([b / scale if b > 0 else 0.0 for b in new]),
+                      chunk['block_number'].to_numpy(dtype=np.int64)[index], chunk['timestamp'].to_numpy(dtype=np.int64)[index]))
+    
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(0), empty, empty
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+def concentration_series(ids, balances, blocks, times, every="hour", top_n=CONCENTRATION_TOP):
+    """Second pass: replay balance changes through BalanceFenwick and sample the metrics
+    
+    every is "block", "hour" or "day"; hourly and daily series are dense,
+    with quiet periods carrying the previous values forward.
+    """
+    columns = ['holders', 'held', f'top{top_n}_share', 'nakamoto', 'gini']
+    if not len(ids):
+        return pd.DataFrame(columns=columns)
+    values = np.unique(balances[balances > 0])
+    slots = np.where(balances > 0, np.searchsorted(values, balances), -1)
+    period = RESOLUTIONS[every]
+    keys = blocks if period is None else times // period
+    last = np.r_[keys[1:] != keys[:-1], True].tolist()
+    
+    tree = BalanceFenwick(values)
+    current = np.full(int(ids.max()) + 1, -1, dtype=np.int64).tolist()
+    rows = []
+    for i, (holder, slot) in enumerate(zip(ids.tolist(), slots.tolist())):
+        previous = current[holder]
+        if previous != slot:
+            if previous >= 0:
+                tree.remove(previous)
+            if slot >= 0:
+                tree.add(slot)
+            current[holder] = slot
+        if last[i]:
+            rows.append((int(keys[i]), tree.holders, tree.total, tree.top_share(top_n), tree.nakamoto(), tree.gini()))
+    
+    df = pd.DataFrame(rows, columns=['key', *columns])
+    if period is None:
+        return df.rename(columns={'key': 'block_number'}).set_index('block_number')
+    df.index = pd.to_datetime(df.pop('key') * period, unit='s')
+    calendar = pd.date_range(df.index[0], df.index[-1], freq=f'{period}s', name='time')
+    return df.reindex(calendar).ffill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Holder count, Gini, top-N share and Nakamoto coefficient over NCR's history")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--every", choices=list(RESOLUTIONS), default="hour")
+    parser.add_argument("--top", type=int, default=CONCENTRATION_TOP)
+    parser.add_argument("--exclude-pairs", action="store_true", help="leave DEX pair balances out of the metrics")
+    args = parser.parse_args()
+    
+    print("=== NCR Holder Concentration ===")
+    conn = store.connect()
+    interner = AddressInterner()
+    exclude = load_pairs() if args.exclude_pairs else []
+    
+    start = time.time()
+    updates = balance_updates(read_transfers(conn, args.token), interner, exclude)
+    series = concentration_series(*updates, every=args.every, top_n=args.top)
+    if series.empty:
+        print("No stored transfers; run ncr_polygonscan_fetcher.py or ncr_watch.py first")
+        return
+    print(f"{len(updates[0]):,} balance changes -> {len(series):,} {args.every} samples in {time.time() - start:.1f}s")
+    
+    share = f'top{args.top}_share'
+    latest = series.iloc[-1]
+    print(f"Latest: {int(latest['holders']):,} holders, Gini {latest['gini']:.3f}, top {args.top} hold {latest[share]:.1%}, "
+          f"Nakamoto coefficient {int(latest['nakamoto'])}")
+    print(f"Peak holders: {int(series['holders'].max()):,} at {series['holders'].idxmax()}")
+    
+    # Record each time the top-N share crosses the watcher's concentration limit
+    crossed = series[share].gt(CONCENTRATION_LIMIT)
+    entries = series[crossed & ~crossed.shift(fill_value=False)]
+    if len(entries) and args.every == "block":
+        with open(ALERTS_FILE, 'a') as f:
+            for block, row in entries.iterrows():
+                f.write(json.dumps({
+                    "time": datetime.now().isoformat(timespec='seconds'), "type": "concentration", "block": int(block),
+                    "message": f"Top {args.top} wallets held {row[share]:.1%} of supply", "share": row[share]
+                }) + "\n")
+        print(f"Concentration limit crossings: {len(entries)} (appended to {ALERTS_FILE})")
+    elif len(entries):
+        print(f"Concentration limit crossings: {len(entries)}; rerun with --every block to record them as alerts")
+    
+    path = f'ncr_concentration_{args.every}.csv'
+    series.to_csv(path)
+    print(f"\nSaved {path}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,354 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from array import array
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+import ncr_kernels as kernels
+from ncr_audit_db import CLUSTERS_FILE
+from ncr_interning import AddressInterner
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, PRICE_HISTORY, asof_lookup, load_price_history, read_transfers, split_amounts
+from ncr_watch import load_pairs
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+MAX_HOT_WALLETS = 200_000        # wallets whose lot queues stay in memory; the rest spill to disk
+INITIAL_CAPACITY = 1 << 16
+DUST = 1e-12                     # lots smaller than this many tokens are dropped
+INITIAL_LOTS = 1 << 18           # lot slots preallocated for the compiled kernel
+
+# Per-wallet counters kept in arrays indexed by interned ID
+COUNTERS = ("balance", "open_cost", "realized_pnl", "proceeds", "bought", "sold", "received", "sent", "unmatched")
+
+class Lots:
+    """Queue of (amount, unit price) lots backed by two float arrays
+    
+    FIFO consumes from the head pointer and LIFO from the tail; consumed
+    head slots are compacted away once they make up half the queue.
+    """
+    __slots__ = ("amounts", "prices", "head")
+    
+    def __init__(self, amounts=None, prices=None):
+        self.amounts = amounts if amounts is not None else array('d')
+        self.prices = prices if prices is not None else array('d')
+        self.head = 0
+    
+    def __len__(self):
+        return len(self.amounts) - self.head
+    
+    def push(self, amount, price):
+        self.amounts.append(amount)
+        self.prices.append(price)
+    
+    def take(self, amount, lifo=False):
+        """Remove up to `amount` tokens; returns (taken pieces, missing amount)"""
+        pieces = []
+        amounts, prices = self.amounts, self.prices
+        while amount > DUST and len(amounts) > self.head:
+            index = len(amounts) - 1 if lifo else self.head
+            lot = amounts[index]
+            used = lot if lot <= amount else amount
+            pieces.append((used, prices[index]))
+            amount -= used
+            if lot - used > DUST:
+                amounts[index] = lot - used
+            elif lifo:
+                amounts.pop()
+                prices.pop()
+            else:
+                self.head += 1
+        if self.head and self.head * 2 >= len(amounts):
+            del amounts[:self.head]
+            del prices[:self.head]
+            self.head = 0
+        return pieces, max(amount, 0.0)
+    
+    def dump(self):
+        return self.amounts[self.head:].tobytes(), self.prices[self.head:].tobytes()
+    
+    @classmethod
+    def load(cls, amounts, prices):
+        a, p = array('d'), array('d')
+        a.frombytes(amounts)
+        p.frombytes(prices)
+        return cls(a, p)
+
+class CostBasisEngine:
+    """Per-wallet FIFO/LIFO cost basis over transfers in block order
+    
+    Transfers out of a DEX pair are buys at the as-of price and transfers
+    into a pair are sells that realize proceeds minus the cost of the lots
+    consumed. Mints open zero-cost lots and burns dispose at zero proceeds.
+    Wallet-to-wallet transfers carry their lots (and cost) to the receiver
+    unless realize_transfers is set, in which case they are valued at
+    market like a sale and a purchase.
+    
+    Lot queues live in an LRU of at most max_hot wallets; colder wallets are
+    written to a SQLite spill file and read back on their next event, so
+    memory stays bounded however many wallets the history touches.
+    
+    With jit=True (needs Numba) the compiled kernel keeps every lot in memory
+    as a linked list in flat arrays instead, at about 32 bytes per lot, and
+    nothing spills; it is opt-in because that memory is unbounded.
+    """
+    
+    def __init__(self, pairs=(), method="fifo", realize_transfers=False, max_hot=MAX_HOT_WALLETS,
+                 spill_path=None, interner=None, capacity=INITIAL_CAPACITY, allocate=None, jit=False):
+        if method not in ("fifo", "lifo"):
+            raise ValueError("method must be 'fifo' or 'lifo'")
+        self.lifo = method == "lifo"
+        self.realize_transfers = realize_transfers
+        self.max_hot = max_hot
+        self.interner = interner if interner is not None else AddressInterner()
+        self.zero_id = self.interner.intern(ZERO_ADDRESS)
+        self.pair_ids = set(self.interner.intern_many([p.lower() for p in pairs]).tolist()) if len(pairs) else set()
+        # allocate(name, size) lets out-of-core runs back the counters with memory-mapped files
+        allocate = allocate or (lambda name, size: np.zeros(size))
+        self.counters = {name: allocate(name, capacity) for name in COUNTERS}
+        self.hot = OrderedDict()
+        self.cold = set()
+        self.spills = 0
+        self.events = 0
+        self.jit = kernels.resolve(jit)
+        if self.jit:
+            self.lot_head = np.full(capacity, -1, dtype=np.int64)
+            self.lot_tail = np.full(capacity, -1, dtype=np.int64)
+            self.is_pair = np.zeros(capacity, dtype=bool)
+            self.lot_amount = self.lot_price = np.zeros(0)
+            self.lot_next = self.lot_prev = np.zeros(0, dtype=np.int64)
+            self.pool = np.array([-1, 0], dtype=np.int64)
+            self._grow_lots(INITIAL_LOTS)
+        
+        self._spill_file = None
+        if spill_path is None:
+            self._spill_file = tempfile.NamedTemporaryFile(prefix="ncr_lots_", suffix=".db", delete=False)
+            self._spill_file.close()
+            spill_path = self._spill_file.name
+        self.spill_path = spill_path
+        self.spill = sqlite3.connect(spill_path)
+        self.spill.execute("PRAGMA journal_mode=OFF")
+        self.spill.execute("PRAGMA synchronous=OFF")
+        self.spill.execute("CREATE TABLE IF NOT EXISTS lots (wallet INTEGER PRIMARY KEY, amounts BLOB, prices BLOB)")
+    
+    def _ensure(self, size):
+        current = len(self.counters["balance"])
+        if size <= current:
+            return
+        capacity = max(size, 2 * current)
+        for name, values in self.counters.items():
+            self.counters[name] = np.concatenate([values, np.zeros(capacity - current)])
+        if self.jit:
+            self.lot_head = np.concatenate([self.lot_head, np.full(capacity - current, -1, dtype=np.int64)])
+            self.lot_tail = np.concatenate([self.lot_tail, np.full(capacity - current, -1, dtype=np.int64)])
+            self.is_pair = np.concatenate([self.is_pair, np.zeros(capacity - current, dtype=bool)])
+    
+    def _grow_lots(self, size):
+        # New slots are chained onto the front of the free list
+        current = len(self.lot_amount)
+        self.lot_amount = np.concatenate([self.lot_amount, np.zeros(size - current)])
+        self.lot_price = np.concatenate([self.lot_price, np.zeros(size - current)])
+        self.lot_prev = np.concatenate([self.lot_prev, np.full(size - current, -1, dtype=np.int64)])
+        links = np.arange(current + 1, size + 1, dtype=np.int64)
+        links[-1] = self.pool[0]
+        self.lot_next = np.concatenate([self.lot_next, links])
+        self.pool[0] = current
+        self.pool[1] += size - current
+    
+    def _lots(self, wallet):
+        lots = self.hot.get(wallet)
+        if lots is not None:
+            self.hot.move_to_end(wallet)
+            return lots
+        if wallet in self.cold:
+            row = self.spill.execute("SELECT amounts, prices FROM lots WHERE wallet = ?", (wallet,)).fetchone()
+            self.spill.execute("DELETE FROM lots WHERE wallet = ?", (wallet,))
+            self.cold.discard(wallet)
+            lots = Lots.load(*row)
+        else:
+            lots = Lots()
+        self.hot[wallet] = lots
+        if len(self.hot) > self.max_hot:
+            self._evict(len(self.hot) - self.max_hot * 3 // 4)
+        return lots
+    
+    def _evict(self, count):
+        rows = []
+        for _ in range(count):
+            wallet, lots = self.hot.popitem(last=False)
+            if len(lots):
+                rows.append((wallet, *lots.dump()))
+                self.cold.add(wallet)
+        with self.spill:
+            self.spill.executemany("INSERT OR REPLACE INTO lots VALUES (?, ?, ?)", rows)
+        self.spills += 1
+    
+    def _dispose(self, wallet, amount, price, proceeds):
+        """Consume lots for an outflow; returns the consumed pieces"""
+        c = self.counters
+        pieces, missing = self._lots(wallet).take(amount, self.lifo)
+        cost = sum(a * p for a, p in pieces)
+        c["balance"][wallet] -= amount - missing
+        c["open_cost"][wallet] -= cost
+        c["unmatched"][wallet] += missing
+        if proceeds:
+            # Tokens with no known lots were acquired before the history starts: zero cost
+            c["realized_pnl"][wallet] += amount * price - cost
+            c["proceeds"][wallet] += amount * price
+        return pieces
+    
+    def _acquire(self, wallet, amount, price):
+        lots = self._lots(wallet)
+        lots.push(amount, price)
+        self.counters["balance"][wallet] += amount
+        self.counters["open_cost"][wallet] += amount * price
+    
+    def apply(self, senders, receivers, amounts, prices):
+        """Apply a block-ordered batch of transfers (interned IDs, token amounts, USD prices)"""
+        self._ensure(len(self.interner))
+        c = self.counters
+        if self.jit:
+            self.events += len(senders)
+            self.is_pair[list(self.pair_ids)] = True
+            columns = (np.asarray(senders, dtype=np.int64), np.asarray(receivers, dtype=np.int64),
+                       np.asarray(amounts, dtype=np.float64), np.asarray(prices, dtype=np.float64))
+            position = 0
+            while True:
+                # The kernel stops early when the lot pool runs low
+                position = kernels.cost_basis_batch(
+                    *columns, position, self.is_pair, self.zero_id, self.lifo, self.realize_transfers, DUST,
+                    self.lot_head, self.lot_tail, self.lot_amount, self.lot_price, self.lot_next, self.lot_prev, self.pool,
+                    *(c[name] for name in COUNTERS))
+                if position == len(senders):
+                    return
+                self._grow_lots(2 * len(self.lot_amount))
+        zero, pairs = self.zero_id, self.pair_ids
+        for sender, receiver, amount, price in zip(senders.tolist(), receivers.tolist(), amounts.tolist(), prices.tolist()):
+            self.events += 1
+            if amount <= 0 or sender == receiver:
+                continue
+            sender_is_wallet = sender != zero and sender not in pairs
+            receiver_is_wallet = receiver != zero and receiver not in pairs
+            if sender_is_wallet and receiver_is_wallet and not self.realize_transfers:
+                c["sent"][sender] += amount
+                c["received"][receiver] += amount
+                pieces = self._dispose(sender, amount, price, proceeds=False)
+                if self.lifo:
+                    pieces.reverse()
+                lots = self._lots(receiver)
+                for piece_amount, piece_price in pieces:
+                    lots.push(piece_amount, piece_price)
+                moved = sum(a for a, _ in pieces)
+                c["balance"][receiver] += moved
+                c["open_cost"][receiver] += sum(a * p for a, p in pieces)
+                if amount - moved > DUST:
+                    # Unknown-cost tokens stay unknown-cost for the receiver
+                    self._acquire(receiver, amount - moved, 0.0)
+                continue
+            if sender_is_wallet:
+                c["sold" if receiver in pairs else "sent"][sender] += amount
+                self._dispose(sender, amount, 0.0 if receiver == zero else price, proceeds=True)
+            if receiver_is_wallet:
+                c["bought" if sender in pairs else "received"][receiver] += amount
+                self._acquire(receiver, amount, 0.0 if sender == zero else price)
+    
+    def wallet_frame(self, price, start=0, stop=None):
+        """Realized and unrealized PnL per wallet at a mark price (optionally for an ID range only)"""
+        stop = len(self.interner) if stop is None else min(stop, len(self.interner))
+        c = {name: values[start:stop] for name, values in self.counters.items()}
+        active = np.flatnonzero((c["balance"] > DUST) | (c["realized_pnl"] != 0) | (c["bought"] > 0) | (c["sold"] > 0))
+        active = active[(active + start != self.zero_id) & ~np.isin(active + start, list(self.pair_ids))]
+        df = pd.DataFrame({name: c[name][active] for name in COUNTERS})
+        df.insert(0, "address", self.interner.lookup(active + start))
+        df["balance"] = df["balance"].clip(lower=0.0)
+        df["market_value"] = df["balance"] * price
+        df["unrealized_pnl"] = df["market_value"] - df["open_cost"]
+        df["total_pnl"] = df["realized_pnl"] + df["unrealized_pnl"]
+        return df.sort_values("total_pnl", ascending=False, ignore_index=True)
+    
+    def close(self):
+        self.spill.close()
+        if self._spill_file is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+def cluster_pnl(wallets, clusters_file=CLUSTERS_FILE):
+    """Aggregate wallet PnL by funding cluster (ncr_wallet_clusters.csv); unclustered wallets stand alone"""
+    if os.path.exists(clusters_file):
+        clusters = pd.read_csv(clusters_file).drop_duplicates("address")
+        clusters["address"] = clusters["address"].str.lower()
+        wallets = wallets.merge(clusters, on="address", how="left")
+    else:
+        wallets = wallets.assign(cluster=np.nan)
+    wallets["cluster"] = wallets["cluster"].fillna(wallets["address"])
+    grouped = wallets.groupby("cluster").agg(
+        wallets=("address", "size"), balance=("balance", "sum"), bought=("bought", "sum"), sold=("sold", "sum"),
+        proceeds=("proceeds", "sum"), realized_pnl=("realized_pnl", "sum"), unrealized_pnl=("unrealized_pnl", "sum"),
+        total_pnl=("total_pnl", "sum"))
+    return grouped.sort_values("total_pnl", ascending=False).reset_index()
+
+def run_cost_basis(conn, prices, token=NCR_CONTRACT, pairs=(), chain="polygon", decimals=NCR_DECIMALS, chunks=None, **options):
+    """Stream stored (or already loaded) transfer chunks through a CostBasisEngine; returns (engine, mark price)"""
+    engine = CostBasisEngine(pairs, **options)
+    price_times = prices['timestamp'].to_numpy()
+    price_values = prices['price'].to_numpy()
+    for chunk in read_transfers(conn, token, chain) if chunks is None else chunks:
+        if chunk.empty:
+            continue
+        whole, frac = split_amounts(chunk['value'].to_numpy(), decimals)
+        amounts = whole.astype(np.float64) + frac.astype(np.float64) / 10 ** decimals
+        price = np.nan_to_num(asof_lookup(price_times, price_values, chunk['timestamp'].to_numpy()))
+        senders = engine.interner.intern_many(chunk['from_address'].to_numpy())
+        receivers = engine.interner.intern_many(chunk['to_address'].to_numpy())
+        engine.apply(senders, receivers, amounts, price)
+    mark = float(price_values[-1]) if len(price_values) else 0.0
+    return engine, mark
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-wallet cost basis and PnL for NCR holders")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--method", choices=["fifo", "lifo"], default="fifo")
+    parser.add_argument("--realize-transfers", action="store_true",
+                        help="value wallet-to-wallet transfers at market instead of carrying cost basis")
+    parser.add_argument("--max-hot", type=int, default=MAX_HOT_WALLETS, help="wallets kept in memory before spilling")
+    parser.add_argument("--jit", action="store_true",
+                        help="use the compiled in-memory lot kernel (faster, but never spills)")
+    args = parser.parse_args()
+    
+    print("=== NCR Wallet Cost Basis & PnL ===")
+    if not os.path.exists(PRICE_HISTORY):
+        print(f"No price history at {PRICE_HISTORY}; run ncr_analysis.py first")
+        return
+    pairs = load_pairs()
+    if not pairs:
+        print("No trading pairs found; DEX buys and sells cannot be told apart from transfers")
+    
+    conn = store.connect()
+    start = time.time()
+    engine, mark = run_cost_basis(conn, load_price_history(), args.token, pairs, method=args.method,
+                                  realize_transfers=args.realize_transfers, max_hot=args.max_hot, jit=args.jit)
+    print(f"Processed {engine.events:,} transfers in {time.time() - start:.1f}s "
+          f"({len(engine.interner):,} addresses, {len(engine.cold):,} spilled to disk)")
+    
+    wallets = engine.wallet_frame(mark)
+    engine.close()
+    clusters = cluster_pnl(wallets)
+    wallets.to_csv('ncr_wallet_pnl.csv', index=False)
+    clusters.to_csv('ncr_cluster_pnl.csv', index=False)
+    
+    print(f"Mark price: ${mark:.6f}")
+    print(f"Realized PnL across wallets: ${wallets['realized_pnl'].sum():,.2f}; "
+          f"unrealized: ${wallets['unrealized_pnl'].sum():,.2f}")
+    print("\nTop profiting wallets:")
+    for _, row in wallets.head(10).iterrows():
+        print(f"- {row['address']}: realized ${row['realized_pnl']:,.2f}, unrealized ${row['unrealized_pnl']:,.2f}, "
+              f"sold {row['sold']:,.2f} NCR")
+    print("\nTop profiting clusters:")
+    for _, row in clusters.head(5).iterrows():
+        print(f"- {row['cluster']} ({row['wallets']} wallets): total ${row['total_pnl']:,.2f}")
+    print("\nSaved ncr_wallet_pnl.csv and ncr_cluster_pnl.csv")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
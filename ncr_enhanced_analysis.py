@@ -7,6 +7,8 @@ import seaborn as sns
 from web3 import Web3
 import time
 
+from ncr_bytecode import contract_observation, load_contract_analysis
+
 # NCR Token Information - Fixed checksum address
 NCR_CONTRACT = Web3.to_checksum_address("0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b")
 POLYGON_RPC = "https://polygon-rpc.com"
@@ -105,6 +107,7 @@ def scrape_polygonscan_data():
     print("\nGenerating PolygonScan investigation queries...")
     
     # Note: These would require a PolygonScan API key
+    # token_transfers is capped at 10,000 rows per window; ncr_polygonscan_fetcher.py fetches the full history
     queries = {
         "token_supply": f"https://api.polygonscan.com/api?module=stats&action=tokensupply&contractaddress={NCR_CONTRACT}",
         "token_transfers": f"https://api.polygonscan.com/api?module=account&action=tokentx&contractaddress={NCR_CONTRACT}&startblock=0&endblock=99999999&sort=desc",
@@ -296,6 +299,12 @@ This analysis is for educational and investigative purposes only. The findings a
 *Analysis Status: Preliminary - Manual verification required*
 """
     
+    # Replace the unverified contract claim with ncr_bytecode.py's findings when they exist
+    contract = load_contract_analysis(NCR_CONTRACT)
+    if contract:
+        report = report.replace("**Token appears to be standard ERC-20** without obvious malicious functions",
+                                contract_observation(contract))
+    
     with open('NCR_Rugpull_Analysis_Enhanced.md', 'w') as f:
         f.write(report)
     
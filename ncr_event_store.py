@@ -0,0 +1,428 @@
+import sqlite3
+import time
+from datetime import datetime
+
+# Local SQLite store shared by every ingestion path (RPC logs, explorers, indexers)
+EVENT_STORE = "ncr_events.db"
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+SYNC_TOPIC = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+SWAP_TOPIC = "0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822"
+MINT_TOPIC = "0x4c209b5fc8ad50758f13e2e1088ba56a560dff690a1c6fef26394f4c03821c4f"
+BURN_TOPIC = "0xdccd412f0b1252819cb1fd330b93224ca42612892bb3f4f789976e6d81936496"
+PAIR_TOPICS = {SYNC_TOPIC: "sync", SWAP_TOPIC: "swap", MINT_TOPIC: "mint", BURN_TOPIC: "burn"}
+
+# uint256 amounts don't fit SQLite integers, so they are stored as decimal text
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    timestamp INTEGER,
+    from_address TEXT NOT NULL,
+    to_address TEXT NOT NULL,
+    value TEXT NOT NULL,
+    source TEXT NOT NULL,
+    UNIQUE (chain, token, tx_hash, log_index, from_address, to_address, value)
+);
+CREATE INDEX IF NOT EXISTS transfers_block ON transfers (chain, token, block_number, log_index);
+
+CREATE TABLE IF NOT EXISTS pair_events (
+    chain TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    timestamp INTEGER,
+    event TEXT NOT NULL,
+    sender TEXT,
+    recipient TEXT,
+    amount0 TEXT NOT NULL,
+    amount1 TEXT NOT NULL,
+    UNIQUE (chain, pair, tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS pair_events_block ON pair_events (chain, pair, block_number, log_index);
+
+-- Indexer transfers without log indexes (Bitquery). They are kept apart from transfers so
+-- they never double-count against RPC/explorer rows; occurrence numbers identical
+-- transfers within one transaction in the order the indexer returned them.
+CREATE TABLE IF NOT EXISTS indexer_transfers (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    occurrence INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    timestamp INTEGER,
+    from_address TEXT NOT NULL,
+    to_address TEXT NOT NULL,
+    value TEXT NOT NULL,
+    source TEXT NOT NULL,
+    UNIQUE (chain, token, tx_hash, from_address, to_address, value, occurrence)
+);
+CREATE INDEX IF NOT EXISTS indexer_transfers_block ON indexer_transfers (chain, token, block_number);
+
+CREATE TABLE IF NOT EXISTS dex_trades (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    pair TEXT,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    timestamp INTEGER,
+    exchange TEXT,
+    base_amount REAL NOT NULL,
+    quote_amount REAL NOT NULL,
+    price REAL,
+    source TEXT NOT NULL,
+    UNIQUE (chain, token, tx_hash, pair, base_amount, quote_amount)
+);
+CREATE INDEX IF NOT EXISTS dex_trades_block ON dex_trades (chain, token, block_number);
+
+CREATE TABLE IF NOT EXISTS blocks (
+    chain TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    parent_hash TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (chain, block_number)
+);
+
+-- High-water marks: how far each source has been synced for a token/contract and data kind.
+-- unit is 'block' or 'timestamp'; block marks are pulled back when a reorg is rolled back.
+CREATE TABLE IF NOT EXISTS watermarks (
+    source TEXT NOT NULL,
+    chain TEXT NOT NULL,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    unit TEXT NOT NULL DEFAULT 'block',
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (source, chain, key, kind)
+);
+
+-- Final balances at a block, so ledgers resume from the snapshot instead of replaying everything
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    total_supply TEXT NOT NULL,
+    PRIMARY KEY (chain, token)
+);
+CREATE TABLE IF NOT EXISTS ledger_balances (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    address TEXT NOT NULL,
+    balance TEXT NOT NULL,
+    PRIMARY KEY (chain, token, address)
+);
+"""
+
+def connect(path=EVENT_STORE):
+    """Open the event store, creating tables on first use"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _word(data, index):
+    return int(data[2 + 64 * index:2 + 64 * (index + 1)], 16)
+
+def _topic_address(topic):
+    return "0x" + topic[-40:].lower()
+
+def decode_log(log, chain="polygon", timestamp=None):
+    """Decode a raw Transfer/Sync/Swap/Mint/Burn log into a store row
+    
+    Returns ("transfer", row), ("pair_event", row) or (None, None) for other topics.
+    """
+    topics = log['topics']
+    if not topics:
+        return None, None
+    topic0 = topics[0].lower()
+    base = {
+        'chain': chain,
+        'block_number': int(log['blockNumber'], 16),
+        'log_index': int(log['logIndex'], 16),
+        'tx_hash': log['transactionHash'].lower(),
+        'timestamp': timestamp
+    }
+    data = log.get('data', '0x')
+    
+    if topic0 == TRANSFER_TOPIC and len(topics) == 3:
+        return "transfer", {
+            **base,
+            'token': log['address'].lower(),
+            'from_address': _topic_address(topics[1]),
+            'to_address': _topic_address(topics[2]),
+            'value': str(_word(data, 0)),
+            'source': 'rpc'
+        }
+    
+    event = PAIR_TOPICS.get(topic0)
+    if event is None:
+        return None, None
+    
+    row = {**base, 'pair': log['address'].lower(), 'event': event, 'sender': None, 'recipient': None}
+    if event == "sync":
+        row.update(amount0=str(_word(data, 0)), amount1=str(_word(data, 1)))
+    elif event == "mint":
+        row.update(sender=_topic_address(topics[1]), amount0=str(_word(data, 0)), amount1=str(_word(data, 1)))
+    elif event == "burn":
+        row.update(sender=_topic_address(topics[1]), recipient=_topic_address(topics[2]),
+                   amount0=str(_word(data, 0)), amount1=str(_word(data, 1)))
+    else:
+        # Net flow into the pair per side: positive means the pair received that token
+        amount0 = _word(data, 0) - _word(data, 2)
+        amount1 = _word(data, 1) - _word(data, 3)
+        row.update(sender=_topic_address(topics[1]), recipient=_topic_address(topics[2]),
+                   amount0=str(amount0), amount1=str(amount1))
+    return "pair_event", row
+
+TRANSFER_INSERT = """
+    INSERT OR IGNORE INTO transfers
+    (chain, token, block_number, log_index, tx_hash, timestamp, from_address, to_address, value, source)
+    VALUES (:chain, :token, :block_number, :log_index, :tx_hash, :timestamp, :from_address, :to_address, :value, :source)
+"""
+
+def insert_transfers(conn, rows):
+    """Insert normalized transfer rows, ignoring duplicates
+    
+    Ledgers resume after their snapshot block, so a new row at or below it
+    (e.g. an explorer backfill after the watcher) would never be applied:
+    the snapshot for that token is dropped instead. Re-inserted duplicates
+    leave it alone.
+    """
+    snapshots = {(chain, token): block for chain, token, block in
+                 conn.execute("SELECT chain, token, block_number FROM ledger_snapshots")}
+    if not snapshots:
+        conn.executemany(TRANSFER_INSERT, rows)
+        return
+    
+    late = {}
+    current = []
+    for row in rows:
+        key = (row['chain'], row['token'])
+        if key in snapshots and row['block_number'] <= snapshots[key]:
+            late.setdefault(key, []).append(row)
+        else:
+            current.append(row)
+    conn.executemany(TRANSFER_INSERT, current)
+    for (chain, token), late_rows in late.items():
+        before = conn.total_changes
+        conn.executemany(TRANSFER_INSERT, late_rows)
+        if conn.total_changes > before:
+            print(f"Transfers backfilled at or below the {token} ledger snapshot; it will be rebuilt")
+            drop_ledger_snapshot(conn, token, chain)
+
+def insert_indexer_transfers(conn, rows):
+    """Insert indexer transfer rows (with an occurrence instead of a log index), ignoring duplicates"""
+    conn.executemany("""
+        INSERT OR IGNORE INTO indexer_transfers
+        (chain, token, block_number, occurrence, tx_hash, timestamp, from_address, to_address, value, source)
+        VALUES (:chain, :token, :block_number, :occurrence, :tx_hash, :timestamp, :from_address, :to_address, :value, :source)
+    """, rows)
+
+def move_indexer_transfers(conn, source="bitquery"):
+    """Move indexer rows that older versions wrote into transfers over to indexer_transfers
+    
+    Ledger snapshots of the affected tokens are dropped since they counted
+    those rows. Returns the number of rows moved.
+    """
+    with conn:
+        tokens = conn.execute("SELECT DISTINCT chain, token FROM transfers WHERE source = ?", (source,)).fetchall()
+        if not tokens:
+            return 0
+        conn.execute("""
+            INSERT OR IGNORE INTO indexer_transfers
+            (chain, token, block_number, occurrence, tx_hash, timestamp, from_address, to_address, value, source)
+            SELECT chain, token, block_number, 0, tx_hash, timestamp, from_address, to_address, value, source
+            FROM transfers WHERE source = ?
+        """, (source,))
+        moved = conn.execute("DELETE FROM transfers WHERE source = ?", (source,)).rowcount
+        for chain, token in tokens:
+            drop_ledger_snapshot(conn, token, chain)
+    return moved
+
+def insert_pair_events(conn, rows):
+    """Insert decoded pair events, ignoring duplicates"""
+    conn.executemany("""
+        INSERT OR IGNORE INTO pair_events
+        (chain, pair, block_number, log_index, tx_hash, timestamp, event, sender, recipient, amount0, amount1)
+        VALUES (:chain, :pair, :block_number, :log_index, :tx_hash, :timestamp, :event, :sender, :recipient, :amount0, :amount1)
+    """, rows)
+
+def insert_dex_trades(conn, rows):
+    """Insert indexer-reported DEX trades, ignoring duplicates"""
+    conn.executemany("""
+        INSERT OR IGNORE INTO dex_trades
+        (chain, token, pair, block_number, tx_hash, timestamp, exchange, base_amount, quote_amount, price, source)
+        VALUES (:chain, :token, :pair, :block_number, :tx_hash, :timestamp, :exchange, :base_amount, :quote_amount, :price, :source)
+    """, rows)
+
+def insert_logs(conn, logs, chain="polygon", timestamps=None, interner=None):
+    """Decode raw logs in bulk and write them to the store; returns (transfers, pair_events)
+    
+    Decoding goes through ncr_log_decoder's columnar path; decode_log is the
+    per-log equivalent.
+    """
+    from ncr_log_decoder import store_rows
+    transfers, pair_events = store_rows(logs, chain, timestamps, interner)
+    with conn:
+        insert_transfers(conn, transfers)
+        insert_pair_events(conn, pair_events)
+    return transfers, pair_events
+
+def record_block(conn, chain, block):
+    """Remember a block header so reorgs can be detected later"""
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)", (
+            chain, int(block['number'], 16), block['hash'].lower(), block['parentHash'].lower(), int(block['timestamp'], 16)
+        ))
+
+def get_block_hash(conn, chain, block_number):
+    """Return the stored hash for a block, or None if it was never recorded"""
+    row = conn.execute("SELECT block_hash FROM blocks WHERE chain = ? AND block_number = ?", (chain, block_number)).fetchone()
+    return row[0] if row else None
+
+def rollback_to(conn, chain, block_number):
+    """Delete everything recorded after block_number (used when a reorg orphans blocks)"""
+    with conn:
+        for table in ("transfers", "indexer_transfers", "pair_events", "dex_trades", "blocks"):
+            conn.execute(f"DELETE FROM {table} WHERE chain = ? AND block_number > ?", (chain, block_number))
+        conn.execute("""
+            DELETE FROM ledger_balances WHERE chain = ? AND token IN
+            (SELECT token FROM ledger_snapshots WHERE chain = ? AND block_number > ?)
+        """, (chain, chain, block_number))
+        conn.execute("DELETE FROM ledger_snapshots WHERE chain = ? AND block_number > ?", (chain, block_number))
+        conn.execute("UPDATE watermarks SET position = ? WHERE chain = ? AND unit = 'block' AND position > ?",
+                     (block_number, chain, block_number))
+
+def get_watermark(conn, source, key, kind, chain="polygon"):
+    """Return how far a source has synced for a key and data kind, or None if never synced"""
+    row = conn.execute("SELECT position FROM watermarks WHERE source = ? AND chain = ? AND key = ? AND kind = ?",
+                       (source, chain, key.lower(), kind)).fetchone()
+    return row[0] if row else None
+
+def set_watermark(conn, source, key, kind, position, chain="polygon", unit="block"):
+    """Advance a watermark; it never moves backwards here (reorg rollback lowers it)"""
+    with conn:
+        conn.execute("""
+            INSERT INTO watermarks (source, chain, key, kind, position, unit, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (source, chain, key, kind)
+            DO UPDATE SET position = MAX(position, excluded.position), updated_at = excluded.updated_at
+        """, (source, chain, key.lower(), kind, int(position), unit, int(time.time())))
+
+def save_ledger_snapshot(conn, token, block_number, balances, total_supply, chain="polygon"):
+    """Replace the stored balance snapshot for a token with balances final at block_number"""
+    token = token.lower()
+    with conn:
+        conn.execute("DELETE FROM ledger_balances WHERE chain = ? AND token = ?", (chain, token))
+        conn.executemany("INSERT INTO ledger_balances VALUES (?, ?, ?, ?)",
+                         ((chain, token, address, str(balance)) for address, balance in balances.items() if balance))
+        conn.execute("INSERT OR REPLACE INTO ledger_snapshots VALUES (?, ?, ?, ?)",
+                     (chain, token, block_number, str(total_supply)))
+
+def drop_ledger_snapshot(conn, token, chain="polygon"):
+    """Forget a token's balance snapshot so the next ledger load replays from the start"""
+    token = token.lower()
+    conn.execute("DELETE FROM ledger_balances WHERE chain = ? AND token = ?", (chain, token))
+    conn.execute("DELETE FROM ledger_snapshots WHERE chain = ? AND token = ?", (chain, token))
+
+def load_ledger_snapshot(conn, token, chain="polygon"):
+    """Return (block_number, {address: balance}, total_supply) or None when no snapshot exists"""
+    token = token.lower()
+    row = conn.execute("SELECT block_number, total_supply FROM ledger_snapshots WHERE chain = ? AND token = ?",
+                       (chain, token)).fetchone()
+    if row is None:
+        return None
+    balances = {address: int(balance) for address, balance in conn.execute(
+        "SELECT address, balance FROM ledger_balances WHERE chain = ? AND token = ?", (chain, token))}
+    return row[0], balances, int(row[1])
+
+def latest_reserves(conn, pairs, chain="polygon"):
+    """Most recent Sync reserves per pair as {pair: (reserve0, reserve1)}"""
+    pairs = [p.lower() for p in pairs]
+    if not pairs:
+        return {}
+    placeholders = ",".join("?" * len(pairs))
+    rows = conn.execute(f"""
+        SELECT pair, amount0, amount1 FROM pair_events p
+        WHERE chain = ? AND pair IN ({placeholders}) AND event = 'sync'
+          AND (block_number, log_index) = (
+              SELECT block_number, log_index FROM pair_events
+              WHERE chain = p.chain AND pair = p.pair AND event = 'sync'
+              ORDER BY block_number DESC, log_index DESC LIMIT 1)
+    """, [chain, *pairs])
+    return {pair: (int(amount0), int(amount1)) for pair, amount0, amount1 in rows}
+
+def prune_blocks(conn, chain, below):
+    """Forget block headers that are deeper than the reorg window"""
+    with conn:
+        conn.execute("DELETE FROM blocks WHERE chain = ? AND block_number < ?", (chain, below))
+
+def latest_block(conn, chain="polygon", token=None):
+    """Highest block with stored transfers (optionally for a single token)"""
+    if token:
+        row = conn.execute("SELECT MAX(block_number) FROM transfers WHERE chain = ? AND token = ?", (chain, token.lower())).fetchone()
+    else:
+        row = conn.execute("SELECT MAX(block_number) FROM transfers WHERE chain = ?", (chain,)).fetchone()
+    return row[0]
+
+def iter_transfers(conn, token, chain="polygon", from_block=0, to_block=None):
+    """Yield stored transfers for a token in block order as dicts"""
+    query = """
+        SELECT block_number, log_index, tx_hash, timestamp, from_address, to_address, value
+        FROM transfers WHERE chain = ? AND token = ? AND block_number >= ?
+    """
+    params = [chain, token.lower(), from_block]
+    if to_block is not None:
+        query += " AND block_number <= ?"
+        params.append(to_block)
+    query += " ORDER BY block_number, log_index"
+    for row in conn.execute(query, params):
+        yield {
+            'block_number': row[0],
+            'log_index': row[1],
+            'tx_hash': row[2],
+            'timestamp': row[3],
+            'from': row[4],
+            'to': row[5],
+            'value': int(row[6])
+        }
+
+def iter_pair_events(conn, pairs, chain="polygon", from_block=0):
+    """Yield stored pair events for the given pairs in block order as dicts"""
+    pairs = [p.lower() for p in pairs]
+    if not pairs:
+        return
+    placeholders = ",".join("?" * len(pairs))
+    query = f"""
+        SELECT pair, block_number, log_index, tx_hash, timestamp, event, sender, recipient, amount0, amount1
+        FROM pair_events WHERE chain = ? AND pair IN ({placeholders}) AND block_number >= ?
+        ORDER BY block_number, log_index
+    """
+    for row in conn.execute(query, [chain, *pairs, from_block]):
+        yield {
+            'pair': row[0],
+            'block_number': row[1],
+            'log_index': row[2],
+            'tx_hash': row[3],
+            'timestamp': row[4],
+            'event': row[5],
+            'sender': row[6],
+            'recipient': row[7],
+            'amount0': int(row[8]),
+            'amount1': int(row[9])
+        }
+
+def describe(conn):
+    """Print row counts and block coverage for the store"""
+    print(f"\nEvent store summary ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}):")
+    for table in ("transfers", "indexer_transfers", "pair_events", "dex_trades"):
+        count, low, high = conn.execute(f"SELECT COUNT(*), MIN(block_number), MAX(block_number) FROM {table}").fetchone()
+        print(f"- {table}: {count:,} rows, blocks {low} - {high}")
+    for source, chain, key, kind, position, unit in conn.execute(
+            "SELECT source, chain, key, kind, position, unit FROM watermarks ORDER BY source, chain, key, kind"):
+        print(f"- watermark {source}/{chain}/{kind} {key}: {unit} {position}")
\ No newline at end of file
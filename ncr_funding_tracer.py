@@ -0,0 +1,282 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_labels import LabelStore
+from ncr_polygonscan_fetcher import ExplorerClient
+from ncr_topk_tracker import replay_transfers
+from ncr_watch import load_pairs
+
+NCR_CONTRACT = "0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b"
+
+# Tracing bounds
+MAX_DEPTH = 3
+MAX_FRONTIER = 500           # addresses expanded per seed per hop
+HISTORY_LIMIT = 200          # earliest transactions considered per address and kind
+MAX_WORKERS = 5
+TOP_HOLDER_SEEDS = 20
+HUB_COUNTERPARTIES = 100     # unlabeled addresses with more distinct counterparties are treated as hubs
+
+# Labeled infrastructure is recorded but never expanded; a CEX hot wallet would pull in half the chain
+STOP_CATEGORIES = {"cex", "dex_router", "bridge", "burn", "contract"}
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS funding_history (
+    chain TEXT NOT NULL,
+    address TEXT NOT NULL,
+    history_limit INTEGER NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    edges TEXT NOT NULL,
+    PRIMARY KEY (chain, address)
+);
+"""
+
+class HistoryCache:
+    """Memoized per-address history fetches shared by concurrent workers
+    
+    Each address is fetched at most once per run (concurrent requests for the
+    same address wait on the first) and persisted so later traces skip the API.
+    """
+    
+    def __init__(self, client, conn=None, chain="polygon", history_limit=HISTORY_LIMIT):
+        self.client = client
+        self.conn = conn or store.connect()
+        self.conn.executescript(HISTORY_SCHEMA)
+        self.chain = chain
+        self.history_limit = history_limit
+        self.fetches = 0
+        self._memo = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+    
+    def _load(self, address):
+        with self._db_lock:
+            row = self.conn.execute(
+                "SELECT edges FROM funding_history WHERE chain = ? AND address = ? AND history_limit >= ?",
+                (self.chain, address, self.history_limit)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _save(self, address, edges):
+        with self._db_lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO funding_history VALUES (?, ?, ?, ?, ?)",
+                              (self.chain, address, self.history_limit, int(time.time()), json.dumps(edges)))
+    
+    def _fetch(self, address):
+        edges = []
+        common = dict(module="account", address=address, startblock=0, endblock=99999999,
+                      page=1, offset=self.history_limit, sort="asc")
+        for tx in self.client.get(action="txlist", **common):
+            if int(tx.get('value', 0)) > 0 and tx.get('isError', '0') == '0':
+                edges.append({'from': tx['from'].lower(), 'to': tx['to'].lower(), 'value': tx['value'],
+                              'token': 'native', 'symbol': 'MATIC', 'block': int(tx['blockNumber']),
+                              'tx_hash': tx['hash'].lower()})
+        for tx in self.client.get(action="tokentx", **common):
+            if int(tx.get('value', 0)) > 0:
+                edges.append({'from': tx['from'].lower(), 'to': tx['to'].lower(), 'value': tx['value'],
+                              'token': tx['contractAddress'].lower(), 'symbol': tx.get('tokenSymbol'),
+                              'block': int(tx['blockNumber']), 'tx_hash': tx['hash'].lower()})
+        edges.sort(key=lambda e: e['block'])
+        self.fetches += 1
+        return edges
+    
+    def get(self, address):
+        """Return the early funding edges touching an address"""
+        with self._lock:
+            if address in self._memo:
+                return self._memo[address]
+            event = self._events.get(address)
+            owner = event is None
+            if owner:
+                event = self._events[address] = threading.Event()
+        if not owner:
+            event.wait()
+            return self._memo.get(address, [])
+        
+        try:
+            edges = self._load(address)
+            if edges is None:
+                edges = self._fetch(address)
+                self._save(address, edges)
+        except Exception as e:
+            print(f"History fetch failed for {address}: {e}")
+            edges = []
+        with self._lock:
+            self._memo[address] = edges
+        event.set()
+        return edges
+
+def trace_funding(seeds, cache, labels=None, depth=MAX_DEPTH, max_frontier=MAX_FRONTIER,
+                  direction="both", max_workers=MAX_WORKERS, stops=None):
+    """Walk funding edges out from each seed, one hop at a time
+    
+    direction: "backward" follows who funded an address, "forward" follows whom
+    it funded, "both" does both. All seeds advance together so every hop's
+    frontier is fetched concurrently in one batch. stops maps addresses that
+    are recorded but never expanded (DEX pairs, known contracts) to their
+    category; labeled infrastructure and unlabeled hubs with more than
+    HUB_COUNTERPARTIES counterparties are stopped too.
+    Returns {seed: {"nodes": {address: {...}}, "edges": [...]}}.
+    """
+    stops = {address.lower(): category for address, category in (stops or {}).items()}
+    graphs = {seed: {"nodes": {seed: {"depth": 0, "expanded": False}}, "edges": [], "edge_keys": set()}
+              for seed in seeds}
+    frontiers = {seed: [seed] for seed in seeds}
+    
+    def stop_category(address):
+        if address in stops:
+            return stops[address]
+        if labels is None:
+            return None
+        index = labels.label_index([address])[0]
+        category = labels.labels['category'].iat[index] if index >= 0 else None
+        return category if category in STOP_CATEGORIES else None
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for hop in range(depth):
+            batch = sorted({address for frontier in frontiers.values() for address in frontier})
+            if not batch:
+                break
+            print(f"Hop {hop + 1}: expanding {len(batch):,} addresses ({cache.fetches:,} fetched so far)")
+            histories = dict(zip(batch, pool.map(cache.get, batch)))
+            hubs = set()
+            for address in batch:
+                counterparties = {edge['to'] if edge['from'] == address else edge['from'] for edge in histories[address]}
+                if len(counterparties) > HUB_COUNTERPARTIES and address not in graphs:
+                    hubs.add(address)
+            
+            next_frontiers = {}
+            for seed, frontier in frontiers.items():
+                graph = graphs[seed]
+                candidates = []
+                for address in frontier:
+                    if address in hubs:
+                        graph["nodes"][address]["stop"] = "hub"
+                        continue
+                    graph["nodes"][address]["expanded"] = True
+                    for edge in histories[address]:
+                        inbound = edge['to'] == address and direction in ("backward", "both")
+                        outbound = edge['from'] == address and direction in ("forward", "both")
+                        if not (inbound or outbound):
+                            continue
+                        key = (edge['tx_hash'], edge['from'], edge['to'], edge['token'], edge['value'])
+                        if key not in graph["edge_keys"]:
+                            graph["edge_keys"].add(key)
+                            graph["edges"].append({**edge, 'hop': hop + 1})
+                        other = edge['from'] if inbound else edge['to']
+                        if other not in graph["nodes"]:
+                            category = stop_category(other)
+                            graph["nodes"][other] = {"depth": hop + 1, "expanded": False, "stop": category}
+                            if category is None:
+                                candidates.append((edge['block'], other))
+                # Earliest counterparties first: initial funding is what links wallets to their owner
+                next_frontiers[seed] = [address for _, address in sorted(candidates)[:max_frontier]]
+            frontiers = next_frontiers
+    
+    for graph in graphs.values():
+        del graph["edge_keys"]
+    return graphs
+
+def funding_clusters(graphs, stops=None):
+    """Union-find over funding edges between non-infrastructure wallets; returns {address: cluster_id}
+    
+    An address stopped in any graph (or listed in stops) is never unioned
+    through, so a shared pair or hub cannot merge its counterparties.
+    """
+    parent = {}
+    stopped = {address.lower() for address in (stops or ())}
+    for graph in graphs.values():
+        stopped.update(address for address, node in graph["nodes"].items() if node.get("stop"))
+    
+    def find(address):
+        parent.setdefault(address, address)
+        while parent[address] != address:
+            parent[address] = parent[parent[address]]
+            address = parent[address]
+        return address
+    
+    for graph in graphs.values():
+        for edge in graph["edges"]:
+            a, b = edge['from'], edge['to']
+            if a in stopped or b in stopped:
+                continue
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+    
+    roots = {}
+    return {address: roots.setdefault(find(address), len(roots)) for address in sorted(parent)}
+
+def default_seeds(conn, client, token=NCR_CONTRACT, pairs=(), top=TOP_HOLDER_SEEDS):
+    """Deployer, first liquidity provider and current top holders"""
+    seeds = {}
+    try:
+        creation = client.get(module="contract", action="getcontractcreation", contractaddresses=token)
+        if creation:
+            seeds[creation[0]['contractCreator'].lower()] = "deployer"
+    except Exception as e:
+        print(f"Could not look up deployer: {e}")
+    
+    pairs = [p.lower() for p in pairs]
+    if pairs:
+        placeholders = ",".join("?" * len(pairs))
+        row = conn.execute(f"""
+            SELECT from_address FROM transfers WHERE token = ? AND to_address IN ({placeholders})
+            ORDER BY block_number, log_index LIMIT 1
+        """, [token.lower(), *pairs]).fetchone()
+        if row:
+            seeds.setdefault(row[0], "first_lp_provider")
+    
+    _, _, tracker = replay_transfers(store.iter_transfers(conn, token), k=top)
+    for _, address, _ in tracker.snapshot():
+        if address not in pairs:
+            seeds.setdefault(address, "top_holder")
+    return seeds
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace early funding sources of NCR team/dev wallet candidates")
+    parser.add_argument("--seed", action="append", default=[], help="extra seed address (repeatable)")
+    parser.add_argument("--depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--max-frontier", type=int, default=MAX_FRONTIER)
+    parser.add_argument("--direction", choices=["backward", "forward", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+    
+    print("=== NCR Funding Source Tracer ===")
+    conn = store.connect()
+    client = ExplorerClient()
+    labels = LabelStore(conn).load()
+    
+    pairs = load_pairs()
+    stops = {**{pair: "dex_pair" for pair in pairs}, NCR_CONTRACT: "token"}
+    seeds = default_seeds(conn, client, pairs=pairs)
+    for address in args.seed:
+        seeds[address.lower()] = "manual"
+    if not seeds:
+        print("No seeds found; pass --seed or populate the event store first")
+        return
+    print(f"Tracing {len(seeds)} seeds to depth {args.depth}")
+    
+    start = time.time()
+    cache = HistoryCache(client, conn)
+    graphs = trace_funding(list(seeds), cache, labels, args.depth, args.max_frontier, args.direction, args.workers, stops)
+    clusters = funding_clusters(graphs, stops)
+    print(f"Traced in {time.time() - start:.1f}s with {cache.fetches:,} history fetches")
+    
+    for seed, graph in graphs.items():
+        print(f"- {seed} ({seeds[seed]}): {len(graph['nodes']):,} wallets, {len(graph['edges']):,} funding edges")
+    
+    with open('ncr_funding_graph.json', 'w') as f:
+        json.dump({"seeds": seeds, "graphs": graphs}, f)
+    pd.DataFrame({"address": list(clusters), "cluster": list(clusters.values())}).to_csv('ncr_wallet_clusters.csv', index=False)
+    
+    shared = pd.Series([clusters.get(seed) for seed in seeds]).value_counts()
+    print(f"\nSeeds sharing a funding cluster: {int(shared[shared > 1].sum()) if (shared > 1).any() else 0}")
+    print("Saved ncr_funding_graph.json and ncr_wallet_clusters.csv")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
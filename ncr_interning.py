@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+class AddressInterner:
+    """Map addresses to dense integer IDs so per-address state can live in arrays
+    
+    IDs are assigned in first-seen order and never change, so arrays indexed by
+    ID stay valid as new addresses are interned.
+    """
+    
+    def __init__(self, addresses=()):
+        self._ids = {}
+        self.addresses = []
+        if len(addresses):
+            self.intern_many(addresses)
+    
+    def __len__(self):
+        return len(self.addresses)
+    
+    def __contains__(self, address):
+        return address.lower() in self._ids
+    
+    def intern(self, address):
+        """Return the ID for one address, assigning a new one if needed"""
+        address = address.lower()
+        existing = self._ids.get(address)
+        if existing is not None:
+            return existing
+        new_id = len(self.addresses)
+        self._ids[address] = new_id
+        self.addresses.append(address)
+        return new_id
+    
+    def intern_many(self, addresses):
+        """Intern a column of addresses and return an int64 ID array
+        
+        Only the distinct values go through the dictionary; the result is
+        broadcast back to every row with a single take.
+        """
+        codes, uniques = pd.factorize(pd.Series(addresses, dtype=object), sort=False)
+        unique_ids = np.fromiter((self.intern(address) for address in uniques), dtype=np.int64, count=len(uniques))
+        return unique_ids[codes]
+    
+    def get_ids(self, addresses):
+        """Look up IDs without interning; unknown addresses map to -1"""
+        get = self._ids.get
+        return np.fromiter((get(address.lower(), -1) for address in addresses), dtype=np.int64, count=len(addresses))
+    
+    def lookup(self, ids):
+        """Translate an ID array back into addresses"""
+        return np.asarray(self.addresses, dtype=object)[np.asarray(ids)]
+
+def valid_addresses(addresses):
+    """Boolean mask of entries that are 0x-prefixed 40-digit hex strings"""
+    if len(addresses) == 0:
+        return np.zeros(0, dtype=bool)
+    return pd.Series(addresses, dtype=object).str.fullmatch(r"0x[0-9a-fA-F]{40}", na=False).to_numpy(dtype=bool)
+
+def address_bytes(addresses):
+    """Pack 0x-prefixed hex addresses into an (n, 20) uint8 array with one hex decode
+    
+    The input must already be valid (see valid_addresses): the digits are
+    decoded as one string, so a short entry would shift every later row.
+    """
+    if len(addresses) == 0:
+        return np.zeros((0, 20), dtype=np.uint8)
+    raw = bytes.fromhex("".join(address[2:] for address in addresses))
+    if len(raw) != 20 * len(addresses):
+        raise ValueError("address_bytes needs 0x-prefixed 20-byte hex addresses")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, 20)
\ No newline at end of file
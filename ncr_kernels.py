@@ -0,0 +1,661 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# The per-event loops below compile with Numba when it is installed. Callers
+# keep their pure Python/NumPy implementations as the reference and the
+# fallback; NCR_JIT=0 forces the reference even when Numba is present.
+AVAILABLE = numba is not None
+ENABLED = AVAILABLE and os.environ.get("NCR_JIT", "1") != "0"
+
+BENCH_EVENTS = 10_000_000
+VERIFY_EVENTS = 200_000
+SYNTH_WALLETS = 200_000
+SYNTH_CHUNK = 1_000_000
+BENCH_FILE = "ncr_kernel_bench.json"
+RAW_DECIMALS = 18            # raw uint256 values are split at 10^18 for exact int64 arithmetic
+
+def jit(function):
+    """numba.njit when Numba is installed, the plain function otherwise"""
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+def resolve(flag=None):
+    """Per-call jit= argument: None follows ENABLED; True without Numba runs the kernels uncompiled"""
+    return ENABLED if flag is None else bool(flag)
+
+@jit
+def _positive(whole, frac):
+    return whole > 0 or (whole == 0 and frac > 0)
+
+@jit
+def replay_balances(senders, receivers, whole, frac, skip, bal_whole, bal_frac, scale):
+    """balance_updates() inner loop: exact (whole, frac) running balances, a float per change
+    
+    bal_whole/bal_frac are indexed by address ID and updated in place so the
+    next chunk continues from them. Returns (ids, new balances, row index).
+    """
+    n = len(senders)
+    ids = np.empty(2 * n, dtype=np.int64)
+    new = np.empty(2 * n, dtype=np.float64)
+    index = np.empty(2 * n, dtype=np.int64)
+    count = 0
+    for i in range(n):
+        sender = senders[i]
+        if not skip[sender]:
+            w = bal_whole[sender] - whole[i]
+            f = bal_frac[sender] - frac[i]
+            if f < 0:
+                f += scale
+                w -= 1
+            bal_whole[sender] = w
+            bal_frac[sender] = f
+            ids[count] = sender
+            new[count] = w + f / scale if _positive(w, f) else 0.0
+            index[count] = i
+            count += 1
+        receiver = receivers[i]
+        if not skip[receiver]:
+            w = bal_whole[receiver] + whole[i]
+            f = bal_frac[receiver] + frac[i]
+            if f >= scale:
+                f -= scale
+                w += 1
+            bal_whole[receiver] = w
+            bal_frac[receiver] = f
+            ids[count] = receiver
+            new[count] = w + f / scale if _positive(w, f) else 0.0
+            index[count] = i
+            count += 1
+    return ids[:count], new[:count], index[:count]
+
+@jit
+def _unlink(wallet, node, head, tail, lot_next, lot_prev, pool):
+    previous, following = lot_prev[node], lot_next[node]
+    if previous >= 0:
+        lot_next[previous] = following
+    else:
+        head[wallet] = following
+    if following >= 0:
+        lot_prev[following] = previous
+    else:
+        tail[wallet] = previous
+    lot_next[node] = pool[0]
+    pool[0] = node
+    pool[1] += 1
+
+@jit
+def _push(wallet, amount, price, head, tail, lot_amount, lot_price, lot_next, lot_prev, pool):
+    node = pool[0]
+    pool[0] = lot_next[node]
+    pool[1] -= 1
+    lot_amount[node] = amount
+    lot_price[node] = price
+    lot_next[node] = -1
+    lot_prev[node] = tail[wallet]
+    if tail[wallet] >= 0:
+        lot_next[tail[wallet]] = node
+    else:
+        head[wallet] = node
+    tail[wallet] = node
+
+@jit
+def cost_basis_batch(senders, receivers, amounts, prices, start, is_pair, zero, lifo, realize_transfers, dust,
+                     head, tail, lot_amount, lot_price, lot_next, lot_prev, pool, balance, open_cost, realized_pnl,
+                     proceeds, bought, sold, received, sent, unmatched):
+    """CostBasisEngine.apply() over flat lot lists
+    
+    Each wallet's lots are a doubly linked list in the lot_* arrays (head and
+    tail per wallet, free nodes chained from pool[0], pool[1] free nodes
+    left). An event needs at most two fresh nodes, so the loop stops and
+    returns its position when fewer remain; the caller grows the pool and
+    calls again from there. Returns len(senders) when the batch is done.
+    """
+    pieces_amount = np.empty(16, dtype=np.float64)
+    pieces_price = np.empty(16, dtype=np.float64)
+    for i in range(start, len(senders)):
+        if pool[1] < 2:
+            return i
+        sender, receiver, amount, price = senders[i], receivers[i], amounts[i], prices[i]
+        if amount <= 0 or sender == receiver:
+            continue
+        sender_is_wallet = sender != zero and not is_pair[sender]
+        receiver_is_wallet = receiver != zero and not is_pair[receiver]
+        carry = sender_is_wallet and receiver_is_wallet and not realize_transfers
+        if carry:
+            sent[sender] += amount
+            received[receiver] += amount
+        elif sender_is_wallet:
+            if is_pair[receiver]:
+                sold[sender] += amount
+            else:
+                sent[sender] += amount
+        
+        if sender_is_wallet:
+            # Consume the sender's lots from the head (FIFO) or the tail (LIFO)
+            remaining = amount
+            cost = 0.0
+            count = 0
+            while remaining > dust and head[sender] >= 0:
+                node = tail[sender] if lifo else head[sender]
+                lot = lot_amount[node]
+                used = lot if lot <= remaining else remaining
+                if carry:
+                    if count == len(pieces_amount):
+                        pieces_amount = np.concatenate((pieces_amount, np.empty(count, dtype=np.float64)))
+                        pieces_price = np.concatenate((pieces_price, np.empty(count, dtype=np.float64)))
+                    pieces_amount[count] = used
+                    pieces_price[count] = lot_price[node]
+                    count += 1
+                cost += used * lot_price[node]
+                remaining -= used
+                if lot - used > dust:
+                    lot_amount[node] = lot - used
+                else:
+                    _unlink(sender, node, head, tail, lot_next, lot_prev, pool)
+            missing = remaining if remaining > 0.0 else 0.0
+            balance[sender] -= amount - missing
+            open_cost[sender] -= cost
+            unmatched[sender] += missing
+            if not carry:
+                sale_price = 0.0 if receiver == zero else price
+                realized_pnl[sender] += amount * sale_price - cost
+                proceeds[sender] += amount * sale_price
+            else:
+                moved = 0.0
+                moved_cost = 0.0
+                for j in range(count):
+                    k = count - 1 - j if lifo else j
+                    _push(receiver, pieces_amount[k], pieces_price[k], head, tail, lot_amount, lot_price, lot_next,
+                          lot_prev, pool)
+                    moved += pieces_amount[k]
+                    moved_cost += pieces_amount[k] * pieces_price[k]
+                balance[receiver] += moved
+                open_cost[receiver] += moved_cost
+                if amount - moved > dust:
+                    # Unknown-cost tokens stay unknown-cost for the receiver
+                    _push(receiver, amount - moved, 0.0, head, tail, lot_amount, lot_price, lot_next, lot_prev, pool)
+                    balance[receiver] += amount - moved
+                continue
+        
+        if receiver_is_wallet:
+            if is_pair[sender]:
+                bought[receiver] += amount
+            else:
+                received[receiver] += amount
+            lot_cost = 0.0 if sender == zero else price
+            _push(receiver, amount, lot_cost, head, tail, lot_amount, lot_price, lot_next, lot_prev, pool)
+            balance[receiver] += amount
+            open_cost[receiver] += amount * lot_cost
+    return len(senders)
+
+@jit
+def _segment(ptr, seqs, node, after_seq, until_seq):
+    if node >= len(ptr) - 1:
+        return 0, 0
+    lo, hi = ptr[node], ptr[node + 1]
+    segment = seqs[lo:hi]
+    return lo + np.searchsorted(segment, after_seq, side="right"), lo + np.searchsorted(segment, until_seq, side="right")
+
+@jit
+def find_cycles(seq, src, dst, timestamp, amount, out_order, out_ptr, out_seq, in_order, in_ptr, in_seq, starts,
+                window, max_length, tolerance, max_cycles, max_steps):
+    """cycles_from() for every start edge in one call, over TemporalGraph's CSR arrays
+    
+    Returns (flat edge positions, cycle lengths) with cycles in start order
+    and, per start, in the order the reference DFS finds them.
+    """
+    nodes = len(out_ptr) - 1
+    distance = np.full(nodes, -1, dtype=np.int64)
+    on_path = np.zeros(nodes, dtype=np.bool_)
+    queue = np.empty(nodes, dtype=np.int64)
+    stack_node = np.empty(max_length + 1, dtype=np.int64)
+    stack_cursor = np.empty(max_length + 1, dtype=np.int64)
+    stack_stop = np.empty(max_length + 1, dtype=np.int64)
+    path = np.empty(max_length + 1, dtype=np.int64)
+    flat = np.empty(1024, dtype=np.int64)
+    lengths = np.empty(64, dtype=np.int64)
+    n_flat = 0
+    n_cycles = 0
+    
+    for start in starts:
+        origin, first = src[start], dst[start]
+        low, high = amount[start] * (1 - tolerance), amount[start] * (1 + tolerance)
+        start_seq = seq[start]
+        until_seq = seq[np.searchsorted(timestamp, timestamp[start] + window, side="right") - 1]
+        
+        # Hops back to the origin over in-window, amount-compatible edges
+        distance[origin] = 0
+        queue[0] = origin
+        queued, head = 1, 0
+        while head < queued:
+            node = queue[head]
+            head += 1
+            hops = distance[node] + 1
+            if hops > max_length - 1:
+                continue
+            lo, hi = _segment(in_ptr, in_seq, node, start_seq, until_seq)
+            for j in range(lo, hi):
+                position = in_order[j]
+                if amount[position] < low or amount[position] > high:
+                    continue
+                previous = src[position]
+                if distance[previous] < 0:
+                    distance[previous] = hops
+                    queue[queued] = previous
+                    queued += 1
+        
+        if distance[first] >= 0:
+            found = 0
+            steps = 0
+            path[0] = start
+            length = 1
+            on_path[origin] = True
+            on_path[first] = True
+            lo, hi = _segment(out_ptr, out_seq, first, start_seq, until_seq)
+            stack_node[0], stack_cursor[0], stack_stop[0] = first, lo, hi
+            depth = 1
+            while depth > 0:
+                top = depth - 1
+                if stack_cursor[top] >= stack_stop[top]:
+                    depth -= 1
+                    length -= 1
+                    on_path[stack_node[top]] = False
+                    continue
+                position = out_order[stack_cursor[top]]
+                stack_cursor[top] += 1
+                steps += 1
+                if steps > max_steps or found >= max_cycles:
+                    break
+                if amount[position] < low or amount[position] > high:
+                    continue
+                nxt = dst[position]
+                if nxt == origin:
+                    if n_flat + length + 1 > len(flat):
+                        flat = np.concatenate((flat, np.empty(len(flat) + length + 1, dtype=np.int64)))
+                    if n_cycles == len(lengths):
+                        lengths = np.concatenate((lengths, np.empty(n_cycles, dtype=np.int64)))
+                    flat[n_flat:n_flat + length] = path[:length]
+                    flat[n_flat + length] = position
+                    n_flat += length + 1
+                    lengths[n_cycles] = length + 1
+                    n_cycles += 1
+                    found += 1
+                    continue
+                if on_path[nxt] or distance[nxt] < 0 or length + 1 + distance[nxt] > max_length:
+                    continue
+                path[length] = position
+                length += 1
+                on_path[nxt] = True
+                lo, hi = _segment(out_ptr, out_seq, nxt, seq[position], until_seq)
+                stack_node[depth], stack_cursor[depth], stack_stop[depth] = nxt, lo, hi
+                depth += 1
+            for d in range(depth):
+                on_path[stack_node[d]] = False
+            on_path[origin] = False
+        for j in range(queued):
+            distance[queue[j]] = -1
+    return flat[:n_flat], lengths[:n_cycles]
+
+@jit
+def _before(heap, i, j, descending):
+    # Rows are (whole, frac, rank, id); ascending heaps order by (balance, rank),
+    # descending ones by larger balance first with ties on the smaller rank
+    if heap[0, i] != heap[0, j]:
+        return heap[0, i] > heap[0, j] if descending else heap[0, i] < heap[0, j]
+    if heap[1, i] != heap[1, j]:
+        return heap[1, i] > heap[1, j] if descending else heap[1, i] < heap[1, j]
+    return heap[2, i] < heap[2, j]
+
+@jit
+def _sift_down(heap, size, i, descending):
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            return
+        if child + 1 < size and _before(heap, child + 1, child, descending):
+            child += 1
+        if not _before(heap, child, i, descending):
+            return
+        for row in range(4):
+            heap[row, i], heap[row, child] = heap[row, child], heap[row, i]
+        i = child
+
+@jit
+def _heap_push(heap, size, whole, frac, rank, address, descending):
+    if size == heap.shape[1]:
+        grown = np.empty((4, 2 * size), dtype=np.int64)
+        grown[:, :size] = heap
+        heap = grown
+    heap[0, size], heap[1, size], heap[2, size], heap[3, size] = whole, frac, rank, address
+    i = size
+    while i > 0:
+        parent = (i - 1) // 2
+        if not _before(heap, i, parent, descending):
+            break
+        for row in range(4):
+            heap[row, i], heap[row, parent] = heap[row, parent], heap[row, i]
+        i = parent
+    return heap, size + 1
+
+@jit
+def _heap_pop(heap, size, descending):
+    size -= 1
+    for row in range(4):
+        heap[row, 0] = heap[row, size]
+    _sift_down(heap, size, 0, descending)
+    return size
+
+@jit
+def _heapify(heap, size, descending):
+    for i in range(size // 2 - 1, -1, -1):
+        _sift_down(heap, size, i, descending)
+
+@jit
+def _valid_root(heap, size, descending, member_pos, bal_whole, bal_frac):
+    """Pop stale entries and return the ID at the root, or -1; members live in the ascending heap"""
+    while size:
+        address = heap[3, 0]
+        if (member_pos[address] >= 0) != descending and bal_whole[address] == heap[0, 0] and bal_frac[address] == heap[1, 0]:
+            return address, size
+        size = _heap_pop(heap, size, descending)
+    return -1, size
+
+@jit
+def _record(events, count, block, kind, address, whole, frac):
+    if count == events.shape[1]:
+        grown = np.empty((5, 2 * count), dtype=np.int64)
+        grown[:, :count] = events
+        events = grown
+    events[0, count], events[1, count], events[2, count], events[3, count], events[4, count] = block, kind, address, whole, frac
+    return events, count + 1
+
+@jit
+def _leave(address, members, member_pos, count):
+    position = member_pos[address]
+    count -= 1
+    members[position] = members[count]
+    member_pos[members[position]] = position
+    member_pos[address] = -1
+    return count
+
+@jit
+def _ranks_above(whole, frac, rank, a, b):
+    if whole[a] != whole[b]:
+        return whole[a] > whole[b]
+    if frac[a] != frac[b]:
+        return frac[a] > frac[b]
+    return rank[a] > rank[b]
+
+@jit
+def topk_replay(senders, receivers, whole, frac, blocks, buckets, rank, zero, k):
+    """replay_transfers() over interned columns with exact (whole, frac) balances
+    
+    Mirrors TopKTracker: a lazy min-heap over the top-K members and a lazy
+    max-heap over everyone else, ties broken by address (rank is each ID's
+    position in sorted address order). Balances that reach zero or below
+    are dropped, as the tracker does. Returns (events, snapshots, final
+    whole, final frac, members); event rows are block, enter (1) or exit
+    (0), id, whole, frac and snapshot rows block, rank, id, whole, frac.
+    """
+    n_ids = len(rank)
+    scale = np.int64(10) ** 18
+    bal_whole = np.zeros(n_ids, dtype=np.int64)
+    bal_frac = np.zeros(n_ids, dtype=np.int64)
+    member_pos = np.full(n_ids, -1, dtype=np.int64)
+    members = np.empty(max(k, 1), dtype=np.int64)
+    n_members = 0
+    holders = 0
+    top = np.empty((4, 4 * k + 1024), dtype=np.int64)
+    rest = np.empty((4, 1024), dtype=np.int64)
+    top_size = rest_size = 0
+    events = np.empty((5, 1024), dtype=np.int64)
+    n_events = 0
+    emits = 1 + np.count_nonzero(buckets[1:] != buckets[:-1]) if len(buckets) else 0
+    snapshots = np.empty((5, emits * k), dtype=np.int64)
+    n_snapshots = 0
+    order = np.empty(max(k, 1), dtype=np.int64)
+    
+    for i in range(len(senders) + 1):
+        # Snapshot the state as of the last block of each finished interval
+        if i > 0 and (i == len(senders) or buckets[i] != buckets[i - 1]):
+            for m in range(n_members):
+                current = members[m]
+                j = m
+                while j > 0 and _ranks_above(bal_whole, bal_frac, rank, current, order[j - 1]):
+                    order[j] = order[j - 1]
+                    j -= 1
+                order[j] = current
+            for m in range(n_members):
+                address = order[m]
+                snapshots[0, n_snapshots], snapshots[1, n_snapshots], snapshots[2, n_snapshots] = blocks[i - 1], m + 1, address
+                snapshots[3, n_snapshots], snapshots[4, n_snapshots] = bal_whole[address], bal_frac[address]
+                n_snapshots += 1
+        if i == len(senders):
+            break
+        
+        for side in range(2):
+            address = senders[i] if side == 0 else receivers[i]
+            if address == zero:
+                continue
+            w, f = bal_whole[address], bal_frac[address]
+            if side == 0:
+                w -= whole[i]
+                f -= frac[i]
+                if f < 0:
+                    f += scale
+                    w -= 1
+            else:
+                w += whole[i]
+                f += frac[i]
+                if f >= scale:
+                    f -= scale
+                    w += 1
+            positive = _positive(w, f)
+            holders += int(positive) - int(_positive(bal_whole[address], bal_frac[address]))
+            if not positive:
+                w, f = 0, 0
+            bal_whole[address], bal_frac[address] = w, f
+            
+            if member_pos[address] >= 0:
+                if positive:
+                    top, top_size = _heap_push(top, top_size, w, f, rank[address], address, False)
+                else:
+                    n_members = _leave(address, members, member_pos, n_members)
+                    events, n_events = _record(events, n_events, blocks[i], 0, address, 0, 0)
+            elif positive:
+                rest, rest_size = _heap_push(rest, rest_size, w, f, rank[address], address, True)
+            
+            # Fill free slots from the best outsider, then swap while it strictly beats the weakest member
+            while True:
+                candidate, rest_size = _valid_root(rest, rest_size, True, member_pos, bal_whole, bal_frac)
+                if candidate < 0:
+                    break
+                if n_members >= k:
+                    weakest, top_size = _valid_root(top, top_size, False, member_pos, bal_whole, bal_frac)
+                    if weakest < 0 or not (bal_whole[candidate] > bal_whole[weakest] or (
+                            bal_whole[candidate] == bal_whole[weakest] and bal_frac[candidate] > bal_frac[weakest])):
+                        break
+                    n_members = _leave(weakest, members, member_pos, n_members)
+                    rest, rest_size = _heap_push(rest, rest_size, bal_whole[weakest], bal_frac[weakest], rank[weakest],
+                                                 weakest, True)
+                    events, n_events = _record(events, n_events, blocks[i], 0, weakest, bal_whole[weakest],
+                                               bal_frac[weakest])
+                member_pos[candidate] = n_members
+                members[n_members] = candidate
+                n_members += 1
+                top, top_size = _heap_push(top, top_size, bal_whole[candidate], bal_frac[candidate], rank[candidate],
+                                           candidate, False)
+                events, n_events = _record(events, n_events, blocks[i], 1, candidate, bal_whole[candidate],
+                                           bal_frac[candidate])
+            
+            # Stale heap entries accumulate on every update; rebuild once they dominate
+            if rest_size > 2 * holders + 1024:
+                rest_size = 0
+                for c in range(n_ids):
+                    if member_pos[c] < 0 and _positive(bal_whole[c], bal_frac[c]):
+                        rest, rest_size = _heap_push(rest, rest_size, bal_whole[c], bal_frac[c], rank[c], c, True)
+            if top_size > 4 * k + 1024:
+                top_size = 0
+                for m in range(n_members):
+                    c = members[m]
+                    top, top_size = _heap_push(top, top_size, bal_whole[c], bal_frac[c], rank[c], c, False)
+    return events[:, :n_events], snapshots[:, :n_snapshots], bal_whole, bal_frac, members[:n_members]
+
+def synthetic_chunks(events, wallets=SYNTH_WALLETS, pairs=2, seed=0, chunk=SYNTH_CHUNK):
+    """Deterministic transfer chunks in read_transfers() format for verification and benchmarks
+    
+    Zipf-weighted traders, pairs taking part in ~40% of transfers, 1% mints
+    and a three-wallet wash ring every 500 rows, four transfers per block.
+    """
+    rng = np.random.default_rng(seed)
+    addresses = np.array([f"0x{i:040x}" for i in range(1, wallets + 1)], dtype=object)
+    weights = 1.0 / np.arange(1, wallets + 1) ** 0.8
+    weights /= weights.sum()
+    for start in range(0, events, chunk):
+        n = min(chunk, events - start)
+        src = rng.choice(wallets, n, p=weights)
+        dst = rng.choice(wallets, n, p=weights)
+        dex = rng.random(n) < 0.4
+        sell = rng.random(n) < 0.5
+        dst[dex & sell] = rng.integers(0, pairs, np.count_nonzero(dex & sell))
+        src[dex & ~sell] = rng.integers(0, pairs, np.count_nonzero(dex & ~sell))
+        micro = np.clip(np.rint(rng.lognormal(18, 2, n)), 1, 1e15).astype(np.int64)
+        rings = np.arange(0, n - 2, 500)
+        members = rng.integers(pairs, wallets, (len(rings), 3))
+        for hop in range(3):
+            src[rings + hop] = members[:, hop]
+            dst[rings + hop] = members[:, (hop + 1) % 3]
+            micro[rings + hop] = micro[rings] - hop * (micro[rings] // 100)
+        from_address = addresses[src]
+        from_address[rng.random(n) < 0.01] = "0x" + "0" * 40
+        row = start + np.arange(n, dtype=np.int64)
+        yield pd.DataFrame({
+            'block_number': 20_000_000 + row // 4, 'log_index': row % 4, 'tx_hash': "",
+            'timestamp': 1_633_046_400 + (row // 4) * 2, 'from_address': from_address, 'to_address': addresses[dst],
+            'value': np.char.add(micro.astype(str), "0" * 12).astype(object)
+        })
+
+def _synthetic_dicts(chunks):
+    for chunk in chunks:
+        for block, sender, receiver, value in zip(chunk['block_number'].tolist(), chunk['from_address'].tolist(),
+                                                  chunk['to_address'].tolist(), chunk['value'].tolist()):
+            yield {'block_number': block, 'from': sender, 'to': receiver, 'value': value}
+
+def _synthetic_prices(blocks):
+    return 0.01 * (1.5 + np.sin(blocks / 10_000.0))
+
+def _run_cost_basis(chunks, use_jit, method="fifo", realize_transfers=False):
+    from ncr_cost_basis import CostBasisEngine
+    from ncr_valuation import token_amounts
+    engine = CostBasisEngine(["0x" + f"{1:040x}", "0x" + f"{2:040x}"], method=method, realize_transfers=realize_transfers,
+                             jit=use_jit)
+    for chunk in chunks:
+        engine.apply(engine.interner.intern_many(chunk['from_address'].to_numpy()),
+                     engine.interner.intern_many(chunk['to_address'].to_numpy()), token_amounts(chunk['value'].to_numpy()),
+                     _synthetic_prices(chunk['block_number'].to_numpy()))
+    engine.close()
+    return engine
+
+def _runs(chunks):
+    """(name, run(use_jit)) pairs over the same list of transfer chunks"""
+    from ncr_concentration import balance_updates
+    from ncr_interning import AddressInterner
+    from ncr_topk_tracker import replay_transfers
+    from ncr_wash_trading import detect_cycles
+    
+    def cycles(use_jit):
+        interner = AddressInterner()
+        pair_ids = interner.intern_many(["0x" + f"{1:040x}", "0x" + f"{2:040x}"])
+        return detect_cycles(iter(chunks), interner, pair_ids, jit=use_jit)
+    return [
+        ("balances", lambda use_jit: balance_updates(iter(chunks), AddressInterner(), jit=use_jit)),
+        ("fifo_lots", lambda use_jit: _run_cost_basis(chunks, use_jit)),
+        ("cycles", cycles),
+        ("top_k", lambda use_jit: replay_transfers(_synthetic_dicts(chunks), interval=10_000, jit=use_jit)),
+    ]
+
+def _same(name, reference, kernel):
+    if name == "balances":
+        return all(np.array_equal(a, b) for a, b in zip(reference[::2], kernel[::2])) and \
+            np.array_equal(reference[3], kernel[3]) and np.allclose(reference[1], kernel[1], rtol=1e-12, atol=0)
+    if name == "fifo_lots":
+        return all(np.allclose(reference.counters[c], kernel.counters[c], rtol=1e-9, atol=1e-9) for c in reference.counters)
+    if name == "cycles":
+        return reference[0].equals(kernel[0]) and np.isclose(reference[1], kernel[1]) and np.isclose(reference[2], kernel[2])
+    return reference[0] == kernel[0] and reference[1] == kernel[1] and reference[2].snapshot() == kernel[2].snapshot()
+
+def verify(events=VERIFY_EVENTS, seed=0):
+    """Compare every kernel with its reference implementation on the same synthetic history"""
+    chunks = list(synthetic_chunks(events, seed=seed))
+    results = {}
+    for name, run in _runs(chunks):
+        results[name] = bool(_same(name, run(False), run(True)))
+    for method, realize in (("lifo", False), ("fifo", True)):
+        reference = _run_cost_basis(chunks, False, method, realize)
+        kernel = _run_cost_basis(chunks, True, method, realize)
+        results[f"{method}_lots{'_realized' if realize else ''}"] = bool(_same("fifo_lots", reference, kernel))
+    return results
+
+def benchmark(events=BENCH_EVENTS, reference=True, seed=0):
+    """Seconds per stage with and without the kernels over one in-memory synthetic history
+
+    Each stage is timed end to end (interning, amount parsing and output
+    building included); the compile time is measured separately on a small
+    warm-up history.
+    """
+    from ncr_out_of_core import peak_rss_mb
+    warm_up = dict(_runs(list(synthetic_chunks(10_000, seed=seed))))
+    chunks = list(synthetic_chunks(events, seed=seed))
+    results = {}
+    for name, run in _runs(chunks):
+        started = time.time()
+        warm_up[name](True)
+        compile_time = time.time() - started
+        started = time.time()
+        run(True)
+        row = {"jit": round(time.time() - started, 2), "compile": round(compile_time, 2)}
+        if reference:
+            started = time.time()
+            run(False)
+            row["reference"] = round(time.time() - started, 2)
+            row["speedup"] = round(row["reference"] / row["jit"], 1) if row["jit"] else None
+        row["peak_rss_mb"] = round(peak_rss_mb())
+        results[name] = row
+        print(f"{name}: " + ", ".join(f"{k} {v}" for k, v in row.items()))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the compiled per-event kernels against the reference code")
+    parser.add_argument("--events", type=int, default=BENCH_EVENTS, help="benchmark history size")
+    parser.add_argument("--verify-events", type=int, default=VERIFY_EVENTS)
+    parser.add_argument("--no-reference", action="store_true", help="only time the kernels")
+    parser.add_argument("--verify-only", action="store_true")
+    args = parser.parse_args()
+    
+    print("=== NCR Event Kernels ===")
+    print(f"Numba {'available (' + numba.__version__ + ')' if AVAILABLE else 'not installed: kernels run uncompiled'}")
+    started = time.time()
+    checks = verify(args.verify_events)
+    print(f"Verified on {args.verify_events:,} transfers in {time.time() - started:.1f}s: "
+          + ", ".join(f"{name} {'ok' if ok else 'MISMATCH'}" for name, ok in checks.items()))
+    results = {"numba": numba.__version__ if AVAILABLE else None, "verify": checks}
+    if not args.verify_only:
+        print(f"\nBenchmark on {args.events:,} transfers:")
+        results["events"] = args.events
+        results["benchmark"] = benchmark(args.events, not args.no_reference)
+    with open(BENCH_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {BENCH_FILE}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_interning import AddressInterner, address_bytes, valid_addresses
+
+# Label categories understood by the analyses
+CATEGORIES = ("cex", "dex_router", "bridge", "burn", "team", "marketing", "development", "top_holder", "contract", "other")
+
+# Built-in labels; CEX hot wallets, bridges and team wallets are imported per investigation
+BUILTIN_LABELS = [
+    ("0x0000000000000000000000000000000000000000", "Null Address", "burn"),
+    ("0x000000000000000000000000000000000000dead", "Dead Address", "burn"),
+    ("0xa5e0829caced8ffdd4de3c43696c57f7d7a678ff", "QuickSwap: Router", "dex_router"),
+    ("0x1b02da8cb0d097eb8d57a175b88c7d8b47997506", "SushiSwap: Router", "dex_router"),
+    ("0xe592427a0aece92de3edee1f18e0157c05861564", "Uniswap V3: Router", "dex_router"),
+    ("0x1111111254fb6c44bac0bed2854e76f90643097d", "1inch: Aggregation Router V4", "dex_router"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS label_versions (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    note TEXT,
+    row_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    address TEXT NOT NULL,
+    label TEXT NOT NULL,
+    category TEXT NOT NULL,
+    source TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    removed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (address, version)
+);
+"""
+
+class BloomFilter:
+    """Vectorized Bloom filter over 20-byte addresses
+    
+    Addresses are keccak-derived and already uniformly distributed, so two
+    64-bit words of the address feed double hashing directly.
+    """
+    
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = int(-capacity * np.log(error_rate) / (np.log(2) ** 2)) + 64
+        self.hashes = max(1, int(round(self.size / capacity * np.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+    
+    def _positions(self, addresses):
+        raw = address_bytes(addresses)
+        words = np.ascontiguousarray(raw[:, :16]).view(np.uint64)
+        h1 = words[:, 0]
+        h2 = words[:, 1] | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.size)
+    
+    def add(self, addresses):
+        positions = self._positions(addresses).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+    
+    def might_contain(self, addresses):
+        """Boolean mask: False means definitely not in the set"""
+        if len(addresses) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(addresses)
+        hits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return hits.all(axis=1)
+
+class LabelStore:
+    """Versioned address labels with array-indexed bulk annotation
+    
+    Every import or manual tag creates a new version; loading resolves each
+    address to its newest label at or below the requested version.
+    """
+    
+    def __init__(self, conn=None, interner=None):
+        self.conn = conn or store.connect()
+        self.conn.executescript(SCHEMA)
+        self.interner = interner or AddressInterner()
+        self.labels = pd.DataFrame(columns=["address", "label", "category", "source", "version"])
+        self.version = None
+        self._label_of_id = np.full(0, -1, dtype=np.int64)
+        self._bloom = BloomFilter(1)
+    
+    def current_version(self):
+        row = self.conn.execute("SELECT MAX(version) FROM label_versions").fetchone()
+        return row[0]
+    
+    def load(self, version=None):
+        """Load the label set as of a version (latest by default) and rebuild the indexes"""
+        version = version or self.current_version() or 0
+        self.labels = pd.read_sql_query("""
+            SELECT l.address, l.label, l.category, l.source, l.version, l.removed
+            FROM labels l
+            JOIN (SELECT address, MAX(version) AS version FROM labels WHERE version <= ? GROUP BY address) latest
+              ON l.address = latest.address AND l.version = latest.version
+        """, self.conn, params=(version,))
+        self.labels = self.labels[self.labels['removed'] == 0].drop(columns="removed").reset_index(drop=True)
+        self.version = version
+        self._build_index()
+        return self
+    
+    def _build_index(self):
+        addresses = self.labels['address'].tolist()
+        ids = self.interner.intern_many(addresses) if addresses else np.zeros(0, dtype=np.int64)
+        self._label_of_id = np.full(len(self.interner), -1, dtype=np.int64)
+        self._label_of_id[ids] = np.arange(len(ids))
+        self._bloom = BloomFilter(len(addresses))
+        if addresses:
+            self._bloom.add(addresses)
+    
+    def _write_version(self, rows, source, note=None):
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO label_versions (created_at, source, note, row_count) VALUES (?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), source, note, len(rows)))
+            version = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO labels (address, label, category, source, version, removed) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r['address'].lower(), r.get('label', ''), r.get('category', 'other'), r.get('source') or source,
+                  version, int(r.get('removed', 0))) for r in rows])
+        self.load()
+        return version
+    
+    def import_records(self, records, source, note=None):
+        """Add a batch of {address, label, category} records as a new version"""
+        rows = []
+        for record in records:
+            category = str(record.get('category') or 'other').lower()
+            if category not in CATEGORIES:
+                print(f"Unknown category '{category}' for {record['address']}, storing as 'other'")
+                category = 'other'
+            rows.append({**record, 'category': category})
+        return self._write_version(rows, source, note)
+    
+    def import_csv(self, path, note=None):
+        """Import labels from a CSV with address, label and category columns"""
+        df = pd.read_csv(path, dtype=str).fillna('')
+        return self.import_records(df.to_dict('records'), source=os.path.basename(path), note=note)
+    
+    def import_json(self, path, note=None):
+        """Import labels from a JSON list of records or an {address: label | record} mapping"""
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [{'address': address, **(value if isinstance(value, dict) else {'label': value})}
+                    for address, value in data.items()]
+        return self.import_records(data, source=os.path.basename(path), note=note)
+    
+    def tag(self, address, label, category="team", note=None):
+        """Manually tag one address (e.g. a suspected team wallet)"""
+        return self.import_records([{'address': address, 'label': label, 'category': category}], source="user", note=note)
+    
+    def untag(self, address, note=None):
+        """Remove an address's label in a new version; history is kept"""
+        return self._write_version([{'address': address, 'label': '', 'category': 'other', 'removed': 1}], "user", note)
+    
+    def history(self, address):
+        """Every version of the label for one address"""
+        return pd.read_sql_query("""
+            SELECT l.version, v.created_at, l.label, l.category, l.source, l.removed
+            FROM labels l JOIN label_versions v ON l.version = v.version
+            WHERE l.address = ? ORDER BY l.version
+        """, self.conn, params=(address.lower(),))
+    
+    def label_index(self, addresses):
+        """Row index into self.labels for each address, or -1 when unlabeled
+        
+        The Bloom filter rejects almost every unlabeled address, so only
+        candidates reach the interned-ID lookup. Empty, null or malformed
+        entries are never packed and always map to -1.
+        """
+        addresses = np.asarray(addresses, dtype=object)
+        result = np.full(len(addresses), -1, dtype=np.int64)
+        if not len(self.labels) or not len(addresses):
+            return result
+        valid = np.flatnonzero(valid_addresses(addresses))
+        candidates = valid[self._bloom.might_contain(addresses[valid])]
+        ids = self.interner.get_ids(addresses[candidates])
+        known = ids >= 0
+        ids = ids[known]
+        in_range = ids < len(self._label_of_id)
+        found = np.full(len(ids), -1, dtype=np.int64)
+        found[in_range] = self._label_of_id[ids[in_range]]
+        result[candidates[known]] = found
+        return result
+    
+    def is_labeled(self, addresses):
+        """Boolean mask of addresses that carry any label"""
+        return self.label_index(addresses) >= 0
+    
+    def annotate(self, df, columns=("from", "to")):
+        """Add <column>_label and <column>_category columns to a transfers frame
+        
+        Each column is factorized first, so lookups run once per distinct
+        address and the result is broadcast back as categoricals.
+        """
+        label_names, label_codes = np.unique(self.labels['label'].to_numpy(dtype=object).astype(str), return_inverse=True)
+        category_names = pd.Index(CATEGORIES)
+        category_codes = category_names.get_indexer(self.labels['category'])
+        
+        for column in columns:
+            codes, uniques = pd.factorize(df[column].str.lower() if pd.api.types.is_string_dtype(df[column]) else df[column])
+            index = self.label_index(np.asarray(uniques, dtype=object))
+            row_index = np.where(codes >= 0, index[codes], -1)
+            labeled = row_index >= 0
+            label_rows = np.full(len(df), -1, dtype=np.int64)
+            category_rows = np.full(len(df), -1, dtype=np.int64)
+            label_rows[labeled] = label_codes[row_index[labeled]]
+            category_rows[labeled] = category_codes[row_index[labeled]]
+            df[f"{column}_label"] = pd.Categorical.from_codes(label_rows, categories=label_names)
+            df[f"{column}_category"] = pd.Categorical.from_codes(category_rows, categories=category_names)
+        return df
+
+def seed_builtin_labels(labels):
+    """Write the built-in label set as the first version of an empty store"""
+    if labels.current_version() is None:
+        records = [{'address': a, 'label': l, 'category': c} for a, l, c in BUILTIN_LABELS]
+        labels.import_records(records, source="builtin", note="Burn addresses and Polygon DEX routers")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage NCR address labels and annotate stored transfers")
+    parser.add_argument("files", nargs="*", help="CSV or JSON label files to import")
+    parser.add_argument("--tag", nargs=3, metavar=("ADDRESS", "LABEL", "CATEGORY"), help="tag one address")
+    parser.add_argument("--token", default="0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b")
+    args = parser.parse_args()
+    
+    print("=== NCR Address Labels ===")
+    conn = store.connect()
+    labels = LabelStore(conn)
+    seed_builtin_labels(labels)
+    
+    for path in args.files:
+        version = labels.import_json(path) if path.endswith(".json") else labels.import_csv(path)
+        print(f"Imported {path} as label version {version}")
+    if args.tag:
+        version = labels.tag(*args.tag)
+        print(f"Tagged {args.tag[0]} as {args.tag[1]} ({args.tag[2]}) in version {version}")
+    
+    labels.load()
+    print(f"\nLabel version {labels.version}: {len(labels.labels)} labeled addresses")
+    for category, count in labels.labels['category'].value_counts().items():
+        print(f"- {category}: {count}")
+    
+    transfers = pd.read_sql_query(
+        "SELECT block_number, tx_hash, from_address AS 'from', to_address AS 'to', value FROM transfers WHERE token = ?",
+        conn, params=(args.token.lower(),))
+    if transfers.empty:
+        print("\nNo stored transfers to annotate")
+        return
+    
+    labels.annotate(transfers)
+    flows = transfers[transfers['to_category'].notna()].groupby('to_category', observed=True).size()
+    print(f"\nAnnotated {len(transfers):,} transfers; transfers into labeled addresses by category:")
+    for category, count in flows.items():
+        print(f"- {category}: {count:,}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
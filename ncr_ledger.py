@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+import ncr_event_store as store
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+class BalanceLedger:
+    """Exact per-address token balances with a per-block undo journal
+    
+    Journals are kept only for blocks that may still be reorged; call
+    confirm() as blocks become final to drop them.
+    """
+    
+    def __init__(self, on_change=None):
+        self.balances = defaultdict(int)
+        self.total_supply = 0
+        self.last_block = None
+        self.on_change = on_change
+        self._journal = {}
+    
+    def _set(self, address, balance):
+        if balance:
+            self.balances[address] = balance
+        else:
+            self.balances.pop(address, None)
+        if self.on_change:
+            self.on_change(address, balance)
+    
+    def apply_transfer(self, transfer, journal=True):
+        """Apply one transfer dict (block_number, from, to, value) to the balances
+        
+        Pass journal=False when replaying final history that will never be rolled back.
+        """
+        block = transfer['block_number']
+        value = int(transfer['value'])
+        sender = transfer['from'].lower()
+        receiver = transfer['to'].lower()
+        journal = self._journal.setdefault(block, []) if journal else []
+        
+        if sender == ZERO_ADDRESS:
+            self.total_supply += value
+        else:
+            journal.append((sender, self.balances.get(sender, 0)))
+            self._set(sender, self.balances.get(sender, 0) - value)
+        
+        if receiver == ZERO_ADDRESS:
+            self.total_supply -= value
+        else:
+            journal.append((receiver, self.balances.get(receiver, 0)))
+            self._set(receiver, self.balances.get(receiver, 0) + value)
+        
+        journal.append((None, value if sender == ZERO_ADDRESS else -value if receiver == ZERO_ADDRESS else 0))
+        self.last_block = block if self.last_block is None else max(self.last_block, block)
+    
+    def rollback_to(self, block_number):
+        """Undo every transfer applied after block_number"""
+        for block in sorted((b for b in self._journal if b > block_number), reverse=True):
+            for address, previous in reversed(self._journal.pop(block)):
+                if address is None:
+                    self.total_supply -= previous
+                else:
+                    self._set(address, previous)
+        self.last_block = block_number
+    
+    def confirm(self, block_number):
+        """Drop undo journals at or below block_number; those blocks can no longer reorg"""
+        for block in [b for b in self._journal if b <= block_number]:
+            del self._journal[block]
+    
+    def holders(self):
+        """Number of addresses with a positive balance"""
+        return sum(1 for balance in self.balances.values() if balance > 0)
+
+def load_ledger(conn, token, chain="polygon", final_block=None, on_change=None, to_block=None):
+    """Resume a ledger from its stored snapshot and replay only the transfers after it
+    
+    When final_block is given, the snapshot is advanced to it so the next run
+    starts from there; blocks above it are still applied, journaled so a
+    later reorg can undo them, but never persisted. to_block builds the
+    ledger as of that height instead: a newer snapshot is ignored and none
+    is saved.
+    """
+    ledger = BalanceLedger(on_change=on_change)
+    snapshot = store.load_ledger_snapshot(conn, token, chain)
+    if to_block is not None:
+        final_block = None
+        if snapshot is not None and snapshot[0] > to_block:
+            snapshot = None
+    start = 0
+    if snapshot is not None:
+        start, balances, ledger.total_supply = snapshot
+        ledger.balances.update(balances)
+        if on_change:
+            for address, balance in balances.items():
+                on_change(address, balance)
+        ledger.last_block = start
+        start += 1
+    
+    replayed = 0
+    if final_block is not None and final_block >= start:
+        for transfer in store.iter_transfers(conn, token, chain, start, final_block):
+            ledger.apply_transfer(transfer, journal=False)
+            replayed += 1
+        store.save_ledger_snapshot(conn, token, final_block, ledger.balances, ledger.total_supply, chain)
+        start = final_block + 1
+    for transfer in store.iter_transfers(conn, token, chain, start, to_block):
+        ledger.apply_transfer(transfer, journal=final_block is not None)
+        replayed += 1
+    return ledger, replayed
\ No newline at end of file
@@ -0,0 +1,274 @@
+import numpy as np
+
+import ncr_event_store as store
+from ncr_interning import AddressInterner
+
+# uint256 values are (n, 4) uint64 limbs, most significant first: [:, :2] is the high
+# uint128 half and [:, 2:] the low half. Every operation here is exact.
+LIMBS = 4
+MASK32 = np.uint64(0xFFFFFFFF)
+SHIFT32 = np.uint64(32)
+DECIMAL_CHUNK = 10 ** 9          # largest power of ten that keeps long division inside uint64
+DECIMAL_DIGITS = 81              # 9 chunks of 9 digits covers 2^256 - 1 (78 digits)
+
+# Event topic -> (name, indexed address topics, data words)
+EVENTS = {
+    store.TRANSFER_TOPIC: ("transfer", ("from", "to"), ("value",)),
+    store.SYNC_TOPIC: ("sync", (), ("reserve0", "reserve1")),
+    store.SWAP_TOPIC: ("swap", ("sender", "to"), ("amount0_in", "amount1_in", "amount0_out", "amount1_out")),
+    store.MINT_TOPIC: ("mint", ("sender",), ("amount0", "amount1")),
+    store.BURN_TOPIC: ("burn", ("sender", "to"), ("amount0", "amount1"))
+}
+
+def zeros(n):
+    return np.zeros((n, LIMBS), dtype=np.uint64)
+
+def from_ints(values):
+    """Python ints (or decimal strings) -> (n, 4) limbs"""
+    out = zeros(len(values))
+    for row, value in enumerate(values):
+        value = int(value)
+        for limb in range(LIMBS - 1, -1, -1):
+            out[row, limb] = value & 0xFFFFFFFFFFFFFFFF
+            value >>= 64
+    return out
+
+def to_ints(a):
+    """(n, 4) limbs -> list of Python ints"""
+    return [(int(r[0]) << 192) | (int(r[1]) << 128) | (int(r[2]) << 64) | int(r[3]) for r in a]
+
+def hex_words(hex_strings, count):
+    """Decode the first `count` 32-byte words of each 0x-hex string with a single fromhex call
+    
+    Returns (n, count, 4) limbs. Short payloads are zero-padded.
+    """
+    width = 64 * count
+    joined = "".join(h[2:2 + width].ljust(width, "0") for h in hex_strings)
+    raw = np.frombuffer(bytes.fromhex(joined), dtype=">u8")
+    return raw.astype(np.uint64).reshape(len(hex_strings), count, LIMBS)
+
+def add(a, b):
+    """Limb-wise a + b; returns (sum, overflowed)"""
+    out = zeros(len(a))
+    carry = np.zeros(len(a), dtype=np.uint64)
+    for limb in range(LIMBS - 1, -1, -1):
+        partial = a[:, limb] + b[:, limb]
+        first = partial < a[:, limb]
+        total = partial + carry
+        second = total < partial
+        out[:, limb] = total
+        carry = (first | second).astype(np.uint64)
+    return out, carry.astype(bool)
+
+def sub(a, b):
+    """Limb-wise a - b; returns (difference mod 2^256, borrowed) where borrowed means a < b"""
+    out = zeros(len(a))
+    borrow = np.zeros(len(a), dtype=np.uint64)
+    for limb in range(LIMBS - 1, -1, -1):
+        partial = a[:, limb] - b[:, limb]
+        first = a[:, limb] < b[:, limb]
+        total = partial - borrow
+        second = partial < borrow
+        out[:, limb] = total
+        borrow = (first | second).astype(np.uint64)
+    return out, borrow.astype(bool)
+
+def compare(a, b):
+    """Row-wise -1 / 0 / 1 for a < b, a == b, a > b"""
+    result = np.zeros(len(a), dtype=np.int8)
+    undecided = np.ones(len(a), dtype=bool)
+    for limb in range(LIMBS):
+        greater = undecided & (a[:, limb] > b[:, limb])
+        less = undecided & (a[:, limb] < b[:, limb])
+        result[greater] = 1
+        result[less] = -1
+        undecided &= ~(greater | less)
+    return result
+
+def signed_difference(a, b):
+    """(|a - b|, a < b) so signed quantities like net swap flow stay exact"""
+    negative = compare(a, b) < 0
+    forward, _ = sub(a, b)
+    backward, _ = sub(b, a)
+    forward[negative] = backward[negative]
+    return forward, negative
+
+def _halves(a):
+    """Split limbs into eight 32-bit digits (most significant first) held in uint64"""
+    out = np.empty((len(a), 2 * LIMBS), dtype=np.uint64)
+    out[:, 0::2] = a >> SHIFT32
+    out[:, 1::2] = a & MASK32
+    return out
+
+def _carry(halves):
+    """Propagate carries through summed 32-bit digits and pack back into limbs (mod 2^256)"""
+    digits = np.empty_like(halves)
+    carry = np.zeros(len(halves), dtype=np.uint64)
+    for column in range(2 * LIMBS - 1, -1, -1):
+        value = halves[:, column] + carry
+        digits[:, column] = value & MASK32
+        carry = value >> SHIFT32
+    return (digits[:, 0::2] << SHIFT32) | digits[:, 1::2]
+
+def total(a):
+    """Exact sum of all rows as a (4,) limb vector (up to 2^32 rows)"""
+    if not len(a):
+        return zeros(1)[0]
+    return _carry(_halves(a).sum(axis=0, keepdims=True))[0]
+
+def group_sum(ids, a, size):
+    """Exact per-id sums: (size, 4) limbs where row i is the sum of a[ids == i]"""
+    out = zeros(size)
+    if not len(ids):
+        return out
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    sums = np.add.reduceat(_halves(a[order]), starts, axis=0)
+    out[sorted_ids[starts]] = _carry(sums)
+    return out
+
+def divmod_small(a, divisor):
+    """Long division by an integer below 2^32; returns (quotient limbs, remainder uint64)"""
+    if not 0 < divisor < 2 ** 32:
+        raise ValueError("divisor must be in (0, 2^32)")
+    d = np.uint64(divisor)
+    halves = _halves(a)
+    quotient = np.empty_like(halves)
+    remainder = np.zeros(len(a), dtype=np.uint64)
+    for column in range(2 * LIMBS):
+        current = (remainder << SHIFT32) | halves[:, column]
+        quotient[:, column] = current // d
+        remainder = current % d
+    return (quotient[:, 0::2] << SHIFT32) | quotient[:, 1::2], remainder
+
+def to_decimal(a):
+    """Exact base-10 strings for every row, built as one digit matrix"""
+    n = len(a)
+    chunks = np.empty((n, DECIMAL_DIGITS // 9), dtype=np.uint64)
+    rest = a
+    for column in range(DECIMAL_DIGITS // 9 - 1, -1, -1):
+        rest, chunks[:, column] = divmod_small(rest, DECIMAL_CHUNK)
+    powers = np.array([10 ** i for i in range(8, -1, -1)], dtype=np.uint64)
+    digits = (chunks[:, :, None] // powers) % np.uint64(10)
+    text = (digits.reshape(n, DECIMAL_DIGITS).astype(np.uint8) + ord("0")).view(f"S{DECIMAL_DIGITS}").ravel()
+    stripped = np.char.lstrip(text, b"0")
+    return np.where(stripped == b"", b"0", stripped).astype(str)
+
+def split(a, decimals):
+    """Exact (whole tokens uint64, fractional raw units int64) for decimals <= 18"""
+    if decimals > 18:
+        raise ValueError("decimals above 18 do not fit the int64 fractional part")
+    frac = np.zeros(len(a), dtype=np.int64)
+    scale = 1
+    remaining = decimals
+    while remaining:
+        step = min(remaining, 9)
+        a, remainder = divmod_small(a, 10 ** step)
+        frac += remainder.astype(np.int64) * scale
+        scale *= 10 ** step
+        remaining -= step
+    if (a[:, :3] != 0).any():
+        raise ValueError("whole-token part does not fit in uint64")
+    return a[:, 3].copy(), frac
+
+def to_float(a, decimals=0):
+    """Nearest float64 of each value scaled by 10^-decimals (for display and USD math)"""
+    whole = ((a[:, 0].astype(np.float64) * 2.0 ** 64 + a[:, 1].astype(np.float64)) * 2.0 ** 64
+             + a[:, 2].astype(np.float64)) * 2.0 ** 64 + a[:, 3].astype(np.float64)
+    return whole / 10.0 ** decimals
+
+def decode_logs(logs, interner=None):
+    """Decode raw eth_getLogs results into columnar arrays per event type
+    
+    Returns {event: {column: array}} with block_number, log_index, tx_hash and
+    the contract ("address") for every event, indexed addresses as interned IDs
+    and amounts as (n, 4) uint256 limbs. Logs with other topics are skipped.
+    """
+    interner = interner if interner is not None else AddressInterner()
+    groups = {}
+    for position, log in enumerate(logs):
+        topics = log['topics']
+        if not topics:
+            continue
+        spec = EVENTS.get(topics[0].lower())
+        if spec is None or len(topics) != len(spec[1]) + 1:
+            continue
+        groups.setdefault(topics[0].lower(), []).append(position)
+    
+    decoded = {}
+    for topic, positions in groups.items():
+        name, indexed, words = EVENTS[topic]
+        rows = [logs[p] for p in positions]
+        columns = {
+            'position': np.asarray(positions, dtype=np.int64),
+            'block_number': np.fromiter((int(r['blockNumber'], 16) for r in rows), dtype=np.int64, count=len(rows)),
+            'log_index': np.fromiter((int(r['logIndex'], 16) for r in rows), dtype=np.int64, count=len(rows)),
+            'tx_hash': np.array([r['transactionHash'].lower() for r in rows], dtype=object),
+            'address': interner.intern_many([r['address'].lower() for r in rows])
+        }
+        for index, field in enumerate(indexed, start=1):
+            columns[field] = interner.intern_many(["0x" + r['topics'][index][-40:].lower() for r in rows])
+        values = hex_words([r.get('data') or "0x" for r in rows], len(words))
+        for index, field in enumerate(words):
+            columns[field] = np.ascontiguousarray(values[:, index])
+        decoded[name] = columns
+    return decoded
+
+def balance_changes(transfers, size):
+    """Exact net balances per interned ID from decoded transfers: (balances, negative)
+    
+    The mint/burn address naturally ends up negative; anything else negative
+    means transfers are missing from the input.
+    """
+    inflow = group_sum(transfers['to'], transfers['value'], size)
+    outflow = group_sum(transfers['from'], transfers['value'], size)
+    return signed_difference(inflow, outflow)
+
+def store_rows(logs, chain="polygon", timestamps=None, interner=None):
+    """Bulk equivalent of ncr_event_store.decode_log over many logs; returns (transfers, pair_events)"""
+    interner = interner if interner is not None else AddressInterner()
+    decoded = decode_logs(logs, interner)
+    timestamps = timestamps or {}
+    transfers = []
+    pair_events = []
+    
+    def base(columns, i):
+        block = int(columns['block_number'][i])
+        return {'chain': chain, 'block_number': block, 'log_index': int(columns['log_index'][i]),
+                'tx_hash': columns['tx_hash'][i], 'timestamp': timestamps.get(block)}
+    
+    if 'transfer' in decoded:
+        columns = decoded['transfer']
+        token, sender, receiver = (interner.lookup(columns[k]) for k in ('address', 'from', 'to'))
+        values = to_decimal(columns['value'])
+        for i in range(len(values)):
+            transfers.append({**base(columns, i), 'token': token[i], 'from_address': sender[i],
+                              'to_address': receiver[i], 'value': values[i], 'source': 'rpc', '_position': columns['position'][i]})
+    
+    for name in ("sync", "mint", "burn", "swap"):
+        if name not in decoded:
+            continue
+        columns = decoded[name]
+        pair = interner.lookup(columns['address'])
+        sender = interner.lookup(columns['sender']) if 'sender' in columns else [None] * len(pair)
+        recipient = interner.lookup(columns['to']) if 'to' in columns else [None] * len(pair)
+        if name == "sync":
+            amount0, amount1 = to_decimal(columns['reserve0']), to_decimal(columns['reserve1'])
+        elif name == "swap":
+            # Net flow into the pair per side, signed as in decode_log
+            net0, negative0 = signed_difference(columns['amount0_in'], columns['amount0_out'])
+            net1, negative1 = signed_difference(columns['amount1_in'], columns['amount1_out'])
+            amount0 = np.char.add(np.where(negative0, "-", ""), to_decimal(net0))
+            amount1 = np.char.add(np.where(negative1, "-", ""), to_decimal(net1))
+        else:
+            amount0, amount1 = to_decimal(columns['amount0']), to_decimal(columns['amount1'])
+        for i in range(len(pair)):
+            pair_events.append({**base(columns, i), 'pair': pair[i], 'event': name, 'sender': sender[i],
+                                'recipient': recipient[i], 'amount0': str(amount0[i]), 'amount1': str(amount1[i]),
+                                '_position': columns['position'][i]})
+    
+    # Restore log order across event types
+    transfers.sort(key=lambda row: row.pop('_position'))
+    pair_events.sort(key=lambda row: row.pop('_position'))
+    return transfers, pair_events
@@ -0,0 +1,301 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_audit_db import CLUSTERS_FILE
+from ncr_labels import LabelStore
+from ncr_polygonscan_fetcher import START_BLOCK
+from ncr_rpc import POLYGON_RPC, get_block, get_block_number, get_logs
+from ncr_watch import CONFIRMATIONS, LIQUIDITY_PULL_SHARE, MAX_BLOCK_RANGE, NCR_CONTRACT, WATCH_TOPICS, load_pairs
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+LP_DECIMALS = 18                 # UniswapV2-style pair tokens
+BACKFILL_KIND = "logs_backfill"
+TIMESTAMP_WORKERS = 8
+DROP_WINDOW_BLOCKS = 43_200      # a drop is measured against the peak LP supply of the previous ~day
+MAJORITY_SHARE = 0.5
+
+def block_timestamps(numbers, url=POLYGON_RPC, workers=TIMESTAMP_WORKERS):
+    """{block number: unix time} for the given blocks"""
+    numbers = sorted(set(numbers))
+    if not numbers:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        blocks = pool.map(lambda number: get_block(number, url), numbers)
+        return {number: int(block['timestamp'], 16) for number, block in zip(numbers, blocks) if block}
+
+def sync_logs(conn, token=NCR_CONTRACT, pairs=(), start_block=START_BLOCK, end_block=None, url=POLYGON_RPC,
+              chain="polygon", block_range=MAX_BLOCK_RANGE):
+    """Backfill the token's and its pairs' logs in one multi-address eth_getLogs pass
+    
+    The pairs' own Transfer logs (LP tokens) come back alongside their
+    Sync/Mint/Burn/Swap events and the token's transfers, and are stored in
+    the transfers table under the pair address. Each address keeps its own
+    watermark, so a newly added pair is caught up without refetching the
+    ranges the others already cover. Returns the number of logs stored.
+    """
+    addresses = [token.lower(), *[p.lower() for p in pairs]]
+    marks = {a: store.get_watermark(conn, "rpc", a, BACKFILL_KIND, chain) for a in addresses}
+    end_block = end_block if end_block is not None else get_block_number(url) - CONFIRMATIONS
+    from_block = min(start_block if mark is None else mark + 1 for mark in marks.values())
+    
+    stored = 0
+    started = time.time()
+    while from_block <= end_block:
+        to_block = min(from_block + block_range - 1, end_block)
+        active = [a for a in addresses if marks[a] is None or marks[a] < to_block]
+        logs = get_logs(active, WATCH_TOPICS, from_block, to_block, url)
+        timestamps = block_timestamps((int(log['blockNumber'], 16) for log in logs), url)
+        transfers, pair_events = store.insert_logs(conn, logs, chain, timestamps)
+        for address in active:
+            store.set_watermark(conn, "rpc", address, BACKFILL_KIND, to_block, chain)
+            marks[address] = to_block
+        stored += len(transfers) + len(pair_events)
+        if logs:
+            print(f"Blocks {from_block:,}-{to_block:,}: {len(transfers):,} transfers, {len(pair_events):,} pair events "
+                  f"({time.time() - started:.0f}s)")
+        from_block = to_block + 1
+    return stored
+
+def load_clusters(path=CLUSTERS_FILE):
+    """{address: cluster id} from ncr_funding_tracer.py's output"""
+    if not os.path.exists(path):
+        return {}
+    clusters = pd.read_csv(path).drop_duplicates("address")
+    return dict(zip(clusters["address"].str.lower(), clusters["cluster"]))
+
+class LPLedger:
+    """Replay one pair's LP-token transfers into wallet and cluster balances
+    
+    UniswapV2 burns are a transfer of LP tokens from the holder into the pair
+    followed by pair -> 0x0 in the same transaction, so each burn is
+    attributed to the wallets that sent LP into the pair in that transaction.
+    Drops are windows where LP supply fell at least drop_share below its
+    peak over the previous window_blocks; every burn between that peak and
+    the trough is tied to the drop.
+    """
+    
+    def __init__(self, pair, clusters=None, drop_share=LIQUIDITY_PULL_SHARE, window_blocks=DROP_WINDOW_BLOCKS):
+        self.pair = pair.lower()
+        self.clusters = clusters or {}
+        self.drop_share = drop_share
+        self.window_blocks = window_blocks
+        self.balances = {}
+        self.cluster_balances = {}
+        self.supply = 0
+        self.changes = []
+        self.burns = []
+        self.drops = []
+        self._returned = {}          # tx hash -> [(wallet, LP sent into the pair)]
+        self._peaks = deque()        # (block a supply level ended at, level), decreasing: rolling window maximum
+        self._changed = set()
+        self._block = None
+        self._timestamp = None
+    
+    def cluster_of(self, address):
+        return self.clusters.get(address, address)
+    
+    def _credit(self, address, amount):
+        self.balances[address] = self.balances.get(address, 0) + amount
+        if address != self.pair:
+            cluster = self.cluster_of(address)
+            self.cluster_balances[cluster] = self.cluster_balances.get(cluster, 0) + amount
+            self._changed.add(cluster)
+    
+    def _flush(self):
+        for cluster in self._changed:
+            self.changes.append((self._block, self._timestamp, cluster, self.cluster_balances[cluster], self.supply))
+        self._changed.clear()
+    
+    def _track_supply(self, block, previous):
+        # The level that held until this block counts towards every window still reaching back to it
+        while self._peaks and self._peaks[-1][1] <= previous:
+            self._peaks.pop()
+        self._peaks.append((block, previous))
+        while self._peaks[0][0] < block - self.window_blocks:
+            self._peaks.popleft()
+    
+    def _check_drop(self, block):
+        if not self._peaks:
+            return
+        peak_block, peak = self._peaks[0]
+        if not peak or 1 - self.supply / peak < self.drop_share:
+            return
+        if self.drops and self.drops[-1]["peak_block"] == peak_block:
+            drop = self.drops[-1]
+        else:
+            drop = {"pair": self.pair, "drop": len(self.drops), "peak_block": peak_block, "peak_supply": peak}
+            self.drops.append(drop)
+        drop.update(block_number=block, timestamp=self._timestamp, trough_supply=self.supply,
+                    depth=1 - self.supply / peak)
+        for burn in reversed(self.burns):
+            if burn["block_number"] < peak_block:
+                break
+            burn["drop"] = drop["drop"]
+    
+    def apply(self, transfer, burn_events=()):
+        """Apply one LP Transfer (iter_transfers dict); burn_events are the pair's Burn events in its transaction"""
+        block = transfer['block_number']
+        if block != self._block:
+            if self._block is not None:
+                self._flush()
+            self._block = block
+            self._timestamp = transfer['timestamp']
+        sender, receiver, value = transfer['from'], transfer['to'], transfer['value']
+        previous = self.supply
+        
+        if sender == ZERO_ADDRESS:
+            self.supply += value
+        else:
+            self._credit(sender, -value)
+        if receiver == ZERO_ADDRESS:
+            self.supply -= value
+        else:
+            self._credit(receiver, value)
+        
+        if receiver == self.pair and sender != ZERO_ADDRESS:
+            self._returned.setdefault(transfer['tx_hash'], []).append((sender, value))
+        if sender == ZERO_ADDRESS or receiver == ZERO_ADDRESS:
+            self._track_supply(block, previous)
+        if sender == self.pair and receiver == ZERO_ADDRESS:
+            self._record_burn(transfer, value, burn_events)
+            self._check_drop(block)
+    
+    def _record_burn(self, transfer, value, burn_events):
+        before = self.supply + value
+        withdrawn0 = sum(event['amount0'] for event in burn_events)
+        withdrawn1 = sum(event['amount1'] for event in burn_events)
+        recipient = burn_events[0]['recipient'] if burn_events else None
+        returned = self._returned.pop(transfer['tx_hash'], None) or [(None, value)]
+        total = sum(amount for _, amount in returned) or 1
+        for wallet, amount in returned:
+            # Split the withdrawn reserves by each wallet's part of the LP returned in the transaction
+            part = amount / total
+            self.burns.append({
+                "pair": self.pair, "block_number": transfer['block_number'], "timestamp": transfer['timestamp'],
+                "tx_hash": transfer['tx_hash'], "wallet": wallet, "cluster": self.cluster_of(wallet) if wallet else None,
+                "lp_burned": amount / 10 ** LP_DECIMALS, "supply_share": amount / before if before else 0.0,
+                "amount0": withdrawn0 * part, "amount1": withdrawn1 * part, "recipient": recipient, "drop": None
+            })
+    
+    def finish(self):
+        if self._block is not None:
+            self._flush()
+        self._returned.clear()
+    
+    def ownership(self):
+        """Long-format cluster balance changes: block_number, timestamp, cluster, balance, supply, share"""
+        df = pd.DataFrame(self.changes, columns=["block_number", "timestamp", "cluster", "balance", "supply"])
+        df["share"] = (df["balance"] / df["supply"].where(df["supply"] > 0)).astype(float)
+        df["balance"] = df["balance"].astype(float) / 10 ** LP_DECIMALS
+        df["supply"] = df["supply"].astype(float) / 10 ** LP_DECIMALS
+        df.insert(0, "pair", self.pair)
+        return df
+    
+    def holders(self):
+        """Current LP balances per wallet, largest first"""
+        rows = [(address, self.cluster_of(address), balance / 10 ** LP_DECIMALS, balance / self.supply if self.supply else 0.0)
+                for address, balance in self.balances.items() if balance > 0 and address != self.pair]
+        df = pd.DataFrame(rows, columns=["address", "cluster", "balance", "share"]).sort_values("balance", ascending=False)
+        df.insert(0, "pair", self.pair)
+        return df.reset_index(drop=True)
+
+def replay_pair(conn, pair, clusters=None, chain="polygon", **options):
+    """Build an LPLedger from the stored LP transfers and Burn events of one pair"""
+    burns = {}
+    for event in store.iter_pair_events(conn, [pair], chain):
+        if event['event'] == 'burn':
+            burns.setdefault(event['tx_hash'], []).append(event)
+    ledger = LPLedger(pair, clusters, **options)
+    for transfer in store.iter_transfers(conn, pair, chain):
+        ledger.apply(transfer, burns.get(transfer['tx_hash'], ()))
+    ledger.finish()
+    return ledger
+
+def ownership_timeline(ownership, top=10):
+    """Wide share-of-supply table (block x cluster) for the clusters with the highest peak shares"""
+    if ownership.empty:
+        return pd.DataFrame()
+    leaders = ownership.groupby("cluster")["share"].max().nlargest(top).index
+    balances = ownership.pivot_table(index="block_number", columns="cluster", values="balance", aggfunc="last").ffill().fillna(0.0)
+    supply = ownership.groupby("block_number")["supply"].last()
+    return balances[leaders].div(supply.where(supply > 0), axis=0)
+
+def main():
+    parser = argparse.ArgumentParser(description="LP-token holder ledger: who controlled NCR's liquidity and who pulled it")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--pair", action="append", default=[], help="pair address (repeatable; defaults to ncr_trading_pairs.csv)")
+    parser.add_argument("--rpc", default=POLYGON_RPC)
+    parser.add_argument("--chain", default="polygon")
+    parser.add_argument("--start-block", type=int, default=START_BLOCK)
+    parser.add_argument("--no-sync", action="store_true", help="only replay logs already in the event store")
+    parser.add_argument("--drop-share", type=float, default=LIQUIDITY_PULL_SHARE)
+    args = parser.parse_args()
+    
+    print("=== NCR LP Ownership ===")
+    pairs = [p.lower() for p in args.pair] or load_pairs(chain=args.chain)
+    if not pairs:
+        print("No trading pairs found; run ncr_blockchain_scanner.py or pass --pair")
+        return
+    conn = store.connect()
+    if not args.no_sync:
+        stored = sync_logs(conn, args.token, pairs, args.start_block, url=args.rpc, chain=args.chain)
+        print(f"Stored {stored:,} new logs for the token and {len(pairs)} pairs")
+    
+    clusters = load_clusters()
+    labels = LabelStore(conn).load()
+    ownership, burns, drops, holders = [], [], [], []
+    for pair in pairs:
+        ledger = replay_pair(conn, pair, clusters, args.chain, drop_share=args.drop_share)
+        ownership.append(ledger.ownership())
+        burns.append(pd.DataFrame(ledger.burns))
+        drops.append(pd.DataFrame(ledger.drops))
+        holders.append(ledger.holders())
+    ownership = pd.concat(ownership, ignore_index=True)
+    burns = pd.concat(burns, ignore_index=True)
+    drops = pd.concat(drops, ignore_index=True)
+    holders = pd.concat(holders, ignore_index=True)
+    if ownership.empty:
+        print("No LP transfers stored for these pairs")
+        return
+    
+    for frame, column in ((holders, "address"), (burns, "wallet")):
+        if not frame.empty:
+            # Burns without an attributable wallet stay unlabeled instead of being looked up
+            present = frame[column].notna().to_numpy()
+            index = np.full(len(frame), -1, dtype=np.int64)
+            index[present] = labels.label_index(frame.loc[present, column].to_numpy(dtype=object))
+            frame["category"] = [labels.labels['category'].iat[i] if i >= 0 else None for i in index]
+    
+    for pair, group in ownership.groupby("pair"):
+        peak = group.loc[group["share"].idxmax()]
+        print(f"\nPair {pair}: {group['cluster'].nunique():,} LP-holding clusters")
+        print(f"  Largest share ever: {peak['share']:.1%} by cluster {peak['cluster']} at block {int(peak['block_number']):,}")
+        majority = group.loc[group["share"] > MAJORITY_SHARE, "cluster"].unique()
+        if len(majority):
+            print(f"  Clusters that controlled a majority of the liquidity: {', '.join(map(str, majority))}")
+        pair_drops = drops[drops["pair"] == pair] if not drops.empty else drops
+        for _, drop in pair_drops.iterrows():
+            drop_burns = burns[(burns["pair"] == pair) & (burns["drop"] == drop["drop"])]
+            print(f"  Liquidity drop of {drop['depth']:.0%} between blocks {int(drop['peak_block']):,} and "
+                  f"{int(drop['block_number']):,}; burned by:")
+            by_wallet = drop_burns.groupby(["wallet", "cluster"], dropna=False)["supply_share"].sum().nlargest(5)
+            for (wallet, cluster), share in by_wallet.items():
+                print(f"    - {wallet} (cluster {cluster}): {share:.1%} of LP supply")
+    
+    for pair, group in ownership.groupby("pair"):
+        ownership_timeline(group).to_csv(f'ncr_lp_timeline_{pair}.csv')
+    ownership.to_csv('ncr_lp_ownership.csv', index=False)
+    burns.to_csv('ncr_lp_burns.csv', index=False)
+    drops.to_csv('ncr_lp_drops.csv', index=False)
+    holders.to_csv('ncr_lp_holders.csv', index=False)
+    print("\nSaved ncr_lp_ownership.csv, ncr_lp_burns.csv, ncr_lp_drops.csv, ncr_lp_holders.csv "
+          "and a share-of-supply timeline per pair (ncr_lp_timeline_<pair>.csv)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -3,6 +3,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime, timedelta
 import seaborn as sns
+import os
+
+import ncr_event_store as store
+from ncr_realized_cap import REALIZED_CAP_CSV, realized_cap_series
+from ncr_valuation import PRICE_HISTORY, load_price_history
 
 def create_market_cap_visualization():
     """Create NCR realized capitalization visualization based on typical rugpull pattern"""
@@ -172,6 +177,52 @@ This pattern strongly suggests orchestrated rugpull activity rather than organic
     
     return df
 
+def load_realized_cap():
+    """Daily realized cap series from the event store, or None when there is no on-chain data yet"""
+    if not os.path.exists(PRICE_HISTORY) or not os.path.exists(store.EVENT_STORE):
+        return None
+    daily = realized_cap_series(store.connect(), load_price_history())
+    return None if daily.empty else daily
+
+def create_realized_cap_chart(daily):
+    """Plot realized cap against market cap, with MVRV and daily realized profit/loss"""
+    fig = plt.figure(figsize=(14, 12))
+    ax1 = plt.subplot2grid((5, 1), (0, 0), rowspan=3)
+    ax2 = plt.subplot2grid((5, 1), (3, 0), rowspan=1, sharex=ax1)
+    ax3 = plt.subplot2grid((5, 1), (4, 0), rowspan=1, sharex=ax1)
+    money = plt.FuncFormatter(lambda x, p: f'${x/1e6:.1f}M' if abs(x) >= 1e6 else f'${x/1e3:.0f}K')
+    
+    ax1.plot(daily.index, daily['realized_cap'], linewidth=2, color='#1f77b4', label='Realized Cap')
+    ax1.fill_between(daily.index, daily['realized_cap'], alpha=0.3, color='#1f77b4')
+    ax1.plot(daily.index, daily['market_cap'], linewidth=1.5, color='#ff7f0e', label='Market Cap')
+    ax1.set_ylabel('Capitalization (USD)', fontsize=12)
+    ax1.set_title(f'NCR Token Realized Capitalization: {daily.index[0]:%b %Y} - {daily.index[-1]:%b %Y}',
+                  fontsize=16, fontweight='bold')
+    ax1.yaxis.set_major_formatter(money)
+    ax1.grid(True, alpha=0.3)
+    ax1.legend(loc='upper right')
+    
+    ax2.plot(daily.index, daily['mvrv'], color='purple', linewidth=1.5)
+    ax2.axhline(1.0, color='black', linestyle='--', linewidth=1)
+    ax2.set_ylabel('MVRV', fontsize=12)
+    ax2.grid(True, alpha=0.3)
+    
+    ax3.bar(daily.index, daily['realized_profit'], width=1, color='green', alpha=0.6, label='Realized Profit')
+    ax3.bar(daily.index, -daily['realized_loss'], width=1, color='red', alpha=0.6, label='Realized Loss')
+    ax3.set_ylabel('Realized P/L (USD)', fontsize=12)
+    ax3.set_xlabel('Date', fontsize=12)
+    ax3.yaxis.set_major_formatter(money)
+    ax3.grid(True, alpha=0.3)
+    ax3.legend(loc='upper right')
+    
+    plt.tight_layout()
+    plt.savefig('ncr_market_cap_chart.png', dpi=300, bbox_inches='tight')
+    print("Realized cap visualization saved to ncr_market_cap_chart.png")
+    
+    daily.to_csv(REALIZED_CAP_CSV)
+    print(f"Raw data saved to {REALIZED_CAP_CSV}")
+    return daily
+
 def create_comparison_chart():
     """Create comparison with other known rugpulls"""
     
@@ -224,10 +275,15 @@ def create_comparison_chart():
 
 def main():
     print("=== NCR Market Capitalization Visualization ===")
-    print("Creating visualizations based on typical rugpull patterns...\n")
     
-    # Create main market cap visualization
-    df = create_market_cap_visualization()
+    # Prefer the realized cap computed from stored transfers; fall back to the pattern model
+    daily = load_realized_cap()
+    if daily is not None:
+        print(f"Creating realized cap chart from {len(daily):,} days of on-chain data...\n")
+        df = create_realized_cap_chart(daily)
+    else:
+        print("No stored transfers or price history; creating visualizations based on typical rugpull patterns...\n")
+        df = create_market_cap_visualization()
     
     # Create comparison chart
     create_comparison_chart()
@@ -0,0 +1,392 @@
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_cost_basis import MAX_HOT_WALLETS, CostBasisEngine
+from ncr_funding_tracer import STOP_CATEGORIES
+from ncr_interning import address_bytes
+from ncr_labels import LabelStore
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, PRICE_HISTORY, asof_lookup, load_price_history, read_transfers, split_amounts
+from ncr_watch import load_pairs
+
+MEMORY_BUDGET_MB = 1024
+SPILL_DIR = "ncr_spill"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+STAGES = ("ledger", "clusters", "pnl")
+
+# Rough working-set cost per row, including the temporaries NumPy/pandas make while processing a chunk
+BYTES_PER_TRANSFER_ROW = 600     # pandas chunk with object strings
+BYTES_PER_RECORD = 4 * 64        # structured sort records and their argsort/concat copies
+BYTES_PER_HOT_WALLET = 600       # LRU entry plus a few lots
+FRAC_SPLIT = 10 ** 9             # fractional units are summed as two int64 halves so 100M+ rows can't overflow
+
+# One record per transfer leg, keyed by the 20-byte address
+LEG_DTYPE = np.dtype([('address', 'S20'), ('whole_in', 'u8'), ('frac_in', 'i8'), ('whole_out', 'u8'),
+                      ('frac_out', 'i8'), ('block', 'i8')])
+
+class MemoryBudget:
+    """Split a working-memory cap between the stages of an out-of-core run"""
+    
+    def __init__(self, mb=MEMORY_BUDGET_MB):
+        self.mb = mb
+        self.bytes = mb * 2 ** 20
+    
+    def rows(self, bytes_per_row, share=1.0):
+        """Rows that fit in `share` of the budget"""
+        return max(10_000, int(self.bytes * share) // bytes_per_row)
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def hex_addresses(raw):
+    """S20 address keys -> 0x-prefixed hex strings"""
+    text = np.ascontiguousarray(raw).view(np.uint8).tobytes().hex()
+    return np.array(["0x" + text[i:i + 40] for i in range(0, len(text), 40)], dtype=object)
+
+def iter_transfer_legs(conn, token, chain="polygon", rows=1_000_000, decimals=NCR_DECIMALS):
+    """Yield block-ordered transfers as LEG_DTYPE arrays (a sender and a receiver leg per transfer)"""
+    cursor = conn.execute("""
+        SELECT block_number, from_address, to_address, value FROM transfers
+        WHERE chain = ? AND token = ? ORDER BY block_number, log_index
+    """, (chain, token.lower()))
+    while True:
+        batch = cursor.fetchmany(rows)
+        if not batch:
+            return
+        blocks, senders, receivers, values = zip(*batch)
+        whole, frac = split_amounts(np.asarray(values), decimals)
+        legs = np.zeros(2 * len(batch), dtype=LEG_DTYPE)
+        legs['address'][0::2] = address_bytes(senders).view('S20').ravel()
+        legs['address'][1::2] = address_bytes(receivers).view('S20').ravel()
+        legs['whole_out'][0::2] = whole
+        legs['frac_out'][0::2] = frac
+        legs['whole_in'][1::2] = whole
+        legs['frac_in'][1::2] = frac
+        legs['block'] = np.repeat(np.asarray(blocks, dtype=np.int64), 2)
+        yield legs
+
+class ExternalSorter:
+    """External merge sort of structured records by one key field
+    
+    Records are buffered up to run_rows, sorted in memory and written as .npy
+    runs. merged() memory-maps the runs and merges them block by block; each
+    yielded batch is sorted and never splits a key group across batches.
+    """
+    
+    def __init__(self, dtype, key, spill_dir, run_rows):
+        self.dtype = np.dtype(dtype)
+        self.key = key
+        self.spill_dir = spill_dir
+        self.run_rows = run_rows
+        self.runs = []
+        self._buffer = []
+        self._buffered = 0
+        os.makedirs(spill_dir, exist_ok=True)
+    
+    def add(self, records):
+        self._buffer.append(records)
+        self._buffered += len(records)
+        if self._buffered >= self.run_rows:
+            self._flush()
+    
+    def _flush(self):
+        if not self._buffered:
+            return
+        records = np.concatenate(self._buffer)
+        self._buffer, self._buffered = [], 0
+        records = records[np.argsort(records[self.key], kind='stable')]
+        path = os.path.join(self.spill_dir, f"run_{len(self.runs):05d}.npy")
+        np.save(path, records)
+        self.runs.append(path)
+    
+    def merged(self):
+        self._flush()
+        runs = [np.load(path, mmap_mode='r') for path in self.runs]
+        positions = [0] * len(runs)
+        block = max(1, self.run_rows // max(len(runs), 1))
+        while True:
+            active = [i for i, run in enumerate(runs) if positions[i] < len(run)]
+            if not active:
+                return
+            # Everything up to the smallest block-end key can be emitted; later records are all larger
+            boundary = min(runs[i][self.key][min(positions[i] + block, len(runs[i])) - 1] for i in active)
+            pieces = []
+            for i in active:
+                keys = runs[i][self.key]
+                end = positions[i] + int(np.searchsorted(keys[positions[i]:], boundary, side='right'))
+                pieces.append(np.asarray(runs[i][positions[i]:end]))
+                positions[i] = end
+            batch = np.concatenate(pieces)
+            yield batch[np.argsort(batch[self.key], kind='stable')]
+    
+    def cleanup(self):
+        for path in self.runs:
+            os.remove(path)
+        self.runs = []
+
+class AddressIndex:
+    """Sorted, memory-mapped address table used in place of an in-memory AddressInterner
+    
+    An address's ID is its rank in the table, found by binary search, so
+    tens of millions of addresses cost 20 bytes each on disk and nothing in
+    RAM. Only addresses present at build time can be looked up.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.keys = np.memmap(path, dtype='S20', mode='r') if os.path.getsize(path) else np.zeros(0, dtype='S20')
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def get_ids(self, addresses):
+        raw = address_bytes([a.lower() for a in addresses]).view('S20').ravel()
+        ids = np.searchsorted(self.keys, raw)
+        found = ids < len(self.keys)
+        found[found] = self.keys[ids[found]] == raw[found]
+        return np.where(found, ids, -1).astype(np.int64)
+    
+    def intern_many(self, addresses):
+        ids = self.get_ids(addresses)
+        if (ids < 0).any():
+            raise KeyError(f"{int((ids < 0).sum())} addresses are not in the index built at {self.path}")
+        return ids
+    
+    def intern(self, address):
+        return int(self.intern_many([address])[0])
+    
+    def lookup(self, ids):
+        return hex_addresses(self.keys[np.asarray(ids)])
+
+def _sum_fraction(frac, starts):
+    """Per-group sums of fractional units, exact for any group size"""
+    high = np.add.reduceat(frac // FRAC_SPLIT, starts)
+    low = np.add.reduceat(frac % FRAC_SPLIT, starts)
+    return high, low
+
+def _normalize(whole, high, low, decimals):
+    """(whole, frac halves) -> exact Python-int raw amounts"""
+    scale = 10 ** decimals
+    return [w * scale + h * FRAC_SPLIT + l for w, h, l in zip(whole.tolist(), high.tolist(), low.tolist())]
+
+def ledger_pass(conn, token, budget, spill_dir, chain="polygon", decimals=NCR_DECIMALS, extra=(),
+                output='ncr_ooc_balances.csv'):
+    """Per-wallet totals via external sort by address; writes balances and the address index
+    
+    Returns (AddressIndex, wallets written). Extra addresses (pairs, the zero
+    address) are added to the index even if they never appear in transfers.
+    With output=None only the index is built and no balances are written.
+    """
+    sorter = ExternalSorter(LEG_DTYPE, 'address', os.path.join(spill_dir, "legs"), budget.rows(BYTES_PER_RECORD, 0.5))
+    for legs in iter_transfer_legs(conn, token, chain, budget.rows(BYTES_PER_TRANSFER_ROW, 0.25), decimals):
+        sorter.add(legs)
+    if len(extra):
+        padding = np.zeros(len(extra), dtype=LEG_DTYPE)
+        padding['address'] = address_bytes([a.lower() for a in extra]).view('S20').ravel()
+        padding['block'] = -1
+        sorter.add(padding)
+    
+    index_path = os.path.join(spill_dir, "addresses.s20")
+    zero = address_bytes([ZERO_ADDRESS]).view('S20')[0, 0]
+    written = 0
+    header = True
+    with open(index_path, 'wb') as index_file:
+        for batch in sorter.merged():
+            keys = batch['address']
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            unique = keys[starts]
+            index_file.write(np.ascontiguousarray(unique).tobytes())
+            if output is None:
+                continue
+            
+            received = _normalize(np.add.reduceat(batch['whole_in'], starts), *_sum_fraction(batch['frac_in'], starts), decimals)
+            sent = _normalize(np.add.reduceat(batch['whole_out'], starts), *_sum_fraction(batch['frac_out'], starts), decimals)
+            real = batch['block'] >= 0
+            counts = np.add.reduceat(real.astype(np.int64), starts)
+            frame = pd.DataFrame({
+                'address': hex_addresses(unique),
+                'balance': [str(r - s) for r, s in zip(received, sent)],
+                'received': [str(r) for r in received],
+                'sent': [str(s) for s in sent],
+                'transfers': counts,
+                'first_block': np.minimum.reduceat(np.where(real, batch['block'], np.iinfo(np.int64).max), starts),
+                'last_block': np.maximum.reduceat(batch['block'], starts)
+            })
+            frame = frame[(unique != zero) & (counts > 0)]
+            frame.to_csv(output, mode='w' if header else 'a', header=header, index=False)
+            header = False
+            written += len(frame)
+    sorter.cleanup()
+    return AddressIndex(index_path), written
+
+def connected_components(edge_path, edge_count, size, spill_dir, chunk):
+    """Min-label connected components over a memory-mapped (edge_count, 2) int64 edge file
+    
+    Each pass hooks both endpoints' labels onto the smaller one and then
+    shortcuts label chains; passes repeat until no label changes. Labels
+    live in a memory-mapped array, so only a chunk of edges is in RAM.
+    """
+    labels = np.memmap(os.path.join(spill_dir, "labels.i64"), dtype=np.int64, mode='w+', shape=(max(size, 1),))
+    for start in range(0, size, chunk):
+        labels[start:start + chunk] = np.arange(start, min(start + chunk, size))
+    edges = np.memmap(edge_path, dtype=np.int64, mode='r', shape=(edge_count, 2)) if edge_count else np.zeros((0, 2), dtype=np.int64)
+    
+    changed = True
+    while changed:
+        changed = False
+        for start in range(0, len(edges), chunk):
+            u, v = np.asarray(edges[start:start + chunk]).T
+            a, b = labels[u], labels[v]
+            low = np.minimum(a, b)
+            differs = a != b
+            if differs.any():
+                changed = True
+                np.minimum.at(labels, a[differs], low[differs])
+                np.minimum.at(labels, b[differs], low[differs])
+        # Pointer jumping: follow each label to its root
+        for start in range(0, size, chunk):
+            current = np.asarray(labels[start:start + chunk])
+            while True:
+                parent = labels[current]
+                if (parent == current).all():
+                    break
+                current = parent
+            if (current != labels[start:start + chunk]).any():
+                changed = True
+            labels[start:start + chunk] = current
+    labels.flush()
+    return labels
+
+def cluster_pass(conn, token, index, budget, spill_dir, exclude=(), chain="polygon", output='ncr_ooc_clusters.csv'):
+    """Cluster wallets that transferred directly to each other, excluding pairs and labelled hubs"""
+    rows = budget.rows(BYTES_PER_TRANSFER_ROW, 0.25)
+    excluded = index.get_ids(list(exclude))
+    excluded = np.unique(excluded[excluded >= 0])
+    edge_path = os.path.join(spill_dir, "edges.i64")
+    edge_count = 0
+    with open(edge_path, 'wb') as f:
+        cursor = conn.execute("SELECT from_address, to_address FROM transfers WHERE chain = ? AND token = ?",
+                              (chain, token.lower()))
+        while True:
+            batch = cursor.fetchmany(rows)
+            if not batch:
+                break
+            senders, receivers = zip(*batch)
+            u, v = index.intern_many(senders), index.intern_many(receivers)
+            keep = (u != v) & ~np.isin(u, excluded) & ~np.isin(v, excluded)
+            f.write(np.column_stack([u[keep], v[keep]]).astype(np.int64).tobytes())
+            edge_count += int(keep.sum())
+    
+    labels = connected_components(edge_path, edge_count, len(index), spill_dir, budget.rows(BYTES_PER_RECORD, 0.5))
+    sizes = np.bincount(np.asarray(labels[:len(index)]), minlength=len(index)) if len(index) else np.zeros(0, dtype=np.int64)
+    clusters, header = 0, True
+    chunk = budget.rows(BYTES_PER_TRANSFER_ROW, 0.25)
+    for start in range(0, len(index), chunk):
+        ids = np.arange(start, min(start + chunk, len(index)))
+        label = np.asarray(labels[start:start + chunk])
+        member = (sizes[label] > 1) & ~np.isin(ids, excluded)
+        if not member.any():
+            continue
+        frame = pd.DataFrame({'address': index.lookup(ids[member]), 'cluster': index.lookup(label[member]),
+                              'cluster_size': sizes[label[member]]})
+        frame.to_csv(output, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        clusters += int((label[member] == ids[member]).sum())
+    os.remove(edge_path)
+    return clusters
+
+def pnl_pass(conn, token, index, budget, spill_dir, pairs=(), chain="polygon", decimals=NCR_DECIMALS,
+             output='ncr_ooc_wallet_pnl.csv', **options):
+    """Cost basis over the full history with memory-mapped counters and a budget-sized hot set"""
+    counters_dir = os.path.join(spill_dir, "counters")
+    os.makedirs(counters_dir, exist_ok=True)
+    
+    def allocate(name, size):
+        return np.memmap(os.path.join(counters_dir, f"{name}.f64"), dtype=np.float64, mode='w+', shape=(max(size, 1),))
+    
+    max_hot = min(MAX_HOT_WALLETS, budget.rows(BYTES_PER_HOT_WALLET, 0.25))
+    engine = CostBasisEngine(pairs, interner=index, capacity=len(index), allocate=allocate, max_hot=max_hot,
+                             spill_path=os.path.join(spill_dir, "lots.db"), **options)
+    prices = load_price_history()
+    price_times, price_values = prices['timestamp'].to_numpy(), prices['price'].to_numpy()
+    for chunk in read_transfers(conn, token, chain, chunksize=budget.rows(BYTES_PER_TRANSFER_ROW, 0.25)):
+        if chunk.empty:
+            continue
+        whole, frac = split_amounts(chunk['value'].to_numpy(), decimals)
+        amounts = whole.astype(np.float64) + frac.astype(np.float64) / 10 ** decimals
+        price = np.nan_to_num(asof_lookup(price_times, price_values, chunk['timestamp'].to_numpy()))
+        engine.apply(index.intern_many(chunk['from_address'].tolist()), index.intern_many(chunk['to_address'].tolist()),
+                     amounts, price)
+    
+    mark = float(price_values[-1]) if len(price_values) else 0.0
+    header, wallets = True, 0
+    step = budget.rows(BYTES_PER_TRANSFER_ROW, 0.25)
+    for start in range(0, len(index), step):
+        frame = engine.wallet_frame(mark, start, start + step)
+        frame.to_csv(output, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        wallets += len(frame)
+    engine.close()
+    return wallets, engine.events
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger, clustering and PnL over very large transfer histories in bounded memory")
+    # Validated by hand: Python 3.11 argparse checks an empty nargs="*" against choices and rejects it
+    parser.add_argument("stages", nargs="*", help=f"stages to run, any of {', '.join(STAGES)} (default: all)")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--chain", default="polygon")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET_MB)
+    parser.add_argument("--spill-dir", default=None, help=f"directory for runs and memory-mapped state (default: temp dir under {SPILL_DIR}/)")
+    parser.add_argument("--method", choices=["fifo", "lifo"], default="fifo")
+    args = parser.parse_args()
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"invalid stage {unknown[0]!r} (choose from {', '.join(STAGES)})")
+    args.stages = args.stages or list(STAGES)
+    
+    print("=== NCR Out-of-Core Analysis ===")
+    budget = MemoryBudget(args.memory_mb)
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    spill_dir = args.spill_dir or tempfile.mkdtemp(dir=SPILL_DIR)
+    conn = store.connect()
+    pairs = load_pairs(chain=args.chain)
+    print(f"Memory budget {budget.mb} MB; spilling to {spill_dir}")
+    
+    try:
+        start = time.time()
+        # The address index is needed by every stage; balances are only written when asked for
+        output = 'ncr_ooc_balances.csv' if "ledger" in args.stages else None
+        index, wallets = ledger_pass(conn, args.token, budget, spill_dir, args.chain, extra=[ZERO_ADDRESS, *pairs], output=output)
+        print(f"[{'ledger' if output else 'index'}] {wallets:,} wallets, {len(index):,} addresses indexed in {time.time() - start:.1f}s "
+              f"(peak RSS {peak_rss_mb():,.0f} MB)" + (f" -> {output}" if output else ""))
+        
+        if "clusters" in args.stages:
+            start = time.time()
+            labels = LabelStore(conn).load().labels
+            hubs = labels.loc[labels['category'].isin(STOP_CATEGORIES), 'address'].tolist()
+            clusters = cluster_pass(conn, args.token, index, budget, spill_dir, exclude=[ZERO_ADDRESS, *pairs, *hubs],
+                                    chain=args.chain)
+            print(f"[clusters] {clusters:,} multi-wallet clusters in {time.time() - start:.1f}s "
+                  f"(peak RSS {peak_rss_mb():,.0f} MB) -> ncr_ooc_clusters.csv")
+        
+        if "pnl" in args.stages:
+            if not os.path.exists(PRICE_HISTORY):
+                print(f"[pnl] skipped: no price history at {PRICE_HISTORY}")
+            else:
+                start = time.time()
+                wallets, events = pnl_pass(conn, args.token, index, budget, spill_dir, pairs, args.chain, method=args.method)
+                print(f"[pnl] {events:,} transfers, {wallets:,} wallets in {time.time() - start:.1f}s "
+                      f"(peak RSS {peak_rss_mb():,.0f} MB) -> ncr_ooc_wallet_pnl.csv")
+    finally:
+        if not args.spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,185 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import requests
+
+import ncr_event_store as store
+from ncr_rate_limiter import RateLimiter
+
+NCR_CONTRACT = "0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b"
+POLYGONSCAN_API = "https://api.polygonscan.com/api"
+
+# Etherscan-family APIs return at most page * offset <= 10,000 rows per query window
+RESULT_CAP = 10000
+REQUESTS_PER_SECOND = 5.0    # free-tier API key limit
+MAX_WORKERS = 5
+INITIAL_WINDOWS = 16
+MAX_RETRIES = 6
+START_BLOCK = 20500000       # "Oct 2021 start" in scrape_polygonscan_data's key blocks
+REORG_OVERLAP = 128          # blocks below the watermark fetched again in case the old tail was reorged
+
+class ExplorerClient:
+    """Rate-limited PolygonScan API client shared by worker threads"""
+    
+    def __init__(self, api_url=POLYGONSCAN_API, api_key=None, rate=REQUESTS_PER_SECOND, session=None):
+        self.api_url = api_url
+        self.api_key = api_key or os.environ.get("POLYGONSCAN_API_KEY", "")
+        self.limiter = RateLimiter(rate, burst=max(1, int(rate)))
+        self.session = session or requests.Session()
+        self.requests_made = 0
+        self._lock = threading.Lock()
+    
+    def get(self, **params):
+        """Call the API and return its "result" field, retrying on rate-limit responses"""
+        if self.api_key:
+            params["apikey"] = self.api_key
+        for attempt in range(MAX_RETRIES):
+            self.limiter.acquire()
+            with self._lock:
+                self.requests_made += 1
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=60)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                print(f"PolygonScan request failed ({e}), retrying...")
+                time.sleep(2 ** attempt)
+                continue
+            
+            result = data.get('result')
+            if data.get('status') == '1' or 'jsonrpc' in data:
+                return result
+            if isinstance(result, str) and 'rate limit' in result.lower():
+                self.limiter.penalize(1.0)
+                continue
+            if 'no transactions found' in str(data.get('message', '')).lower() or result == []:
+                return []
+            raise RuntimeError(f"PolygonScan error: {data.get('message')} {result}")
+        raise RuntimeError(f"PolygonScan request failed after {MAX_RETRIES} attempts")
+    
+    def latest_block(self):
+        """Current chain head via the explorer's proxy module"""
+        return int(self.get(module="proxy", action="eth_blockNumber"), 16)
+
+def normalize_tokentx(row, chain="polygon"):
+    """Map a tokentx row onto the event store's transfer schema"""
+    return {
+        'chain': chain,
+        'token': row['contractAddress'].lower(),
+        'block_number': int(row['blockNumber']),
+        'log_index': int(row['logIndex']),
+        'tx_hash': row['hash'].lower(),
+        'timestamp': int(row['timeStamp']),
+        'from_address': row['from'].lower(),
+        'to_address': row['to'].lower(),
+        'value': row['value'],
+        'source': 'polygonscan'
+    }
+
+def fetch_window(client, contract, start_block, end_block):
+    """Fetch one block window in ascending order, capped at RESULT_CAP rows"""
+    return client.get(module="account", action="tokentx", contractaddress=contract,
+                      startblock=start_block, endblock=end_block,
+                      page=1, offset=RESULT_CAP, sort="asc")
+
+def fetch_all_transfers(contract=NCR_CONTRACT, start_block=START_BLOCK, end_block=None, client=None,
+                        max_workers=MAX_WORKERS, initial_windows=INITIAL_WINDOWS, on_rows=None, chain="polygon"):
+    """Fetch the complete tokentx history by splitting block windows until none hits the cap
+    
+    A capped window is sorted ascending, so every row below its last block is
+    complete and kept; only the remainder is split in two and fetched again.
+    Rows are deduplicated on (tx hash, log index) and passed to on_rows as they arrive.
+    """
+    client = client or ExplorerClient()
+    end_block = end_block or client.latest_block()
+    seen = set()
+    total = 0
+    
+    step = max(1, (end_block - start_block + 1) // initial_windows)
+    windows = [(s, min(s + step - 1, end_block)) for s in range(start_block, end_block + 1, step)]
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(fetch_window, client, contract, s, e): (s, e) for s, e in windows}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                low, high = pending.pop(future)
+                rows = future.result()
+                
+                if len(rows) >= RESULT_CAP:
+                    last = int(rows[-1]['blockNumber'])
+                    if last == low:
+                        print(f"Warning: block {low} alone exceeds {RESULT_CAP} transfers; results truncated")
+                    else:
+                        rows = [r for r in rows if int(r['blockNumber']) < last]
+                        middle = (last + high) // 2
+                        for s, e in ((last, middle), (middle + 1, high)):
+                            if s <= e:
+                                pending[pool.submit(fetch_window, client, contract, s, e)] = (s, e)
+                
+                fresh = []
+                for row in rows:
+                    key = (row['hash'].lower(), int(row['logIndex']))
+                    if key not in seen:
+                        seen.add(key)
+                        fresh.append(normalize_tokentx(row, chain))
+                total += len(fresh)
+                if fresh and on_rows:
+                    on_rows(fresh)
+    
+    return total
+
+def sync_transfers(conn, contract=NCR_CONTRACT, client=None, start_block=START_BLOCK, end_block=None, full=False,
+                   max_workers=MAX_WORKERS, chain="polygon", write_lock=None):
+    """Fetch only the transfers past the stored watermark and merge them into the event store
+    
+    The first run (or full=True) fetches from start_block; later runs resume a
+    little below the watermark, and the store's unique key drops the overlap.
+    """
+    client = client or ExplorerClient()
+    contract = contract.lower()
+    end_block = end_block or client.latest_block()
+    mark = None if full else store.get_watermark(conn, "explorer", contract, "tokentx", chain)
+    windows = INITIAL_WINDOWS
+    if mark is not None:
+        start_block = max(start_block, mark + 1 - REORG_OVERLAP)
+        windows = 1              # a delta is small; capped windows still split on their own
+    if start_block > end_block:
+        return 0
+    
+    write_lock = write_lock or threading.Lock()
+    
+    def write(rows):
+        with write_lock, conn:
+            store.insert_transfers(conn, rows)
+    
+    print(f"Syncing {contract} on {chain} from block {start_block:,} to {end_block:,}"
+          + (f" (watermark {mark:,})" if mark is not None else " (full history)"))
+    total = fetch_all_transfers(contract, start_block, end_block, client, max_workers, windows, write, chain)
+    with write_lock:
+        store.set_watermark(conn, "explorer", contract, "tokentx", end_block, chain)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch the full NCR tokentx history from PolygonScan into the event store")
+    parser.add_argument("--contract", default=NCR_CONTRACT)
+    parser.add_argument("--start-block", type=int, default=START_BLOCK)
+    parser.add_argument("--end-block", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="requests per second allowed by the API key")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--full", action="store_true", help="ignore the stored watermark and refetch everything")
+    args = parser.parse_args()
+    
+    print("=== NCR PolygonScan Transfer Fetcher ===")
+    conn = store.connect()
+    client = ExplorerClient(rate=args.rate)
+    
+    start = time.time()
+    total = sync_transfers(conn, args.contract, client, args.start_block, args.end_block, args.full, args.workers)
+    print(f"\nFetched {total:,} unique transfers with {client.requests_made} API calls in {time.time() - start:.1f}s")
+    store.describe(conn)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
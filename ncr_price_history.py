@@ -0,0 +1,199 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import requests
+
+import ncr_event_store as store
+from ncr_rate_limiter import RateLimiter
+from ncr_valuation import PRICE_HISTORY
+
+COINGECKO_URL = "https://api.coingecko.com/api/v3"
+COIN_ID = "neos-credits"
+PRICE_SINCE = "2021-10-01"
+PRICE_TILL = "2022-10-31"
+
+# market_chart/range picks its granularity from the span requested: up to 90
+# days gives hourly points, anything longer daily. 5-minute points only come
+# back for ranges within a day of now, so historical windows cannot get them.
+# name -> (seconds per point, longest window in days that still returns it)
+RESOLUTIONS = {"hourly": (3600, 90), "daily": (86400, 365)}
+WINDOW_OVERLAP = 3600            # windows overlap so no boundary point is lost
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 0.5        # public API allows about 30 calls a minute
+MAX_RETRIES = 5
+COLUMNS = ["timestamp", "price", "market_cap", "volume"]
+
+def _unix(day):
+    return int(datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp())
+
+def price_windows(start, end, resolution="hourly"):
+    """Split [start, end] (unix seconds) into overlapping windows short enough for the resolution"""
+    span = RESOLUTIONS[resolution][1] * 86400 - WINDOW_OVERLAP
+    windows = []
+    while start < end:
+        stop = min(start + span + WINDOW_OVERLAP, end)
+        windows.append((start, stop))
+        start += span
+    return windows
+
+def fetch_window(coin_id, start, end, url=COINGECKO_URL, session=None, limiter=None, api_key=None):
+    """One market_chart/range call as a (timestamp ms, price, market_cap, volume) frame"""
+    headers = {}
+    api_key = api_key or os.environ.get("COINGECKO_API_KEY")
+    if api_key:
+        headers["x-cg-demo-api-key"] = api_key
+    params = {"vs_currency": "usd", "from": start, "to": end}
+    
+    for attempt in range(MAX_RETRIES):
+        if limiter:
+            limiter.acquire()
+        try:
+            response = (session or requests).get(f"{url}/coins/{coin_id}/market_chart/range", params=params,
+                                                 headers=headers, timeout=60)
+        except requests.RequestException as e:
+            print(f"CoinGecko request failed ({e}), retrying...")
+            time.sleep(2 ** attempt)
+            continue
+        
+        if response.status_code == 429 or response.status_code >= 500:
+            backoff = float(response.headers.get("Retry-After", 2 ** attempt))
+            if limiter:
+                limiter.penalize(backoff)
+            time.sleep(backoff)
+            continue
+        response.raise_for_status()
+        
+        data = response.json()
+        series = {}
+        for key, column in (("prices", "price"), ("market_caps", "market_cap"), ("total_volumes", "volume")):
+            points = np.asarray(data.get(key) or [], dtype=np.float64).reshape(-1, 2)
+            series[column] = pd.Series(points[:, 1], index=points[:, 0].astype(np.int64))
+        df = pd.DataFrame(series).rename_axis("timestamp").reset_index()
+        return df.reindex(columns=COLUMNS)
+    
+    raise RuntimeError(f"CoinGecko request failed after {MAX_RETRIES} attempts")
+
+def merge_points(frames, step):
+    """Concatenate window results and keep the latest point per step-sized bucket, on the bucket's grid time"""
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable")
+    df["timestamp"] = df["timestamp"] // (step * 1000) * (step * 1000)
+    return df.drop_duplicates("timestamp", keep="last").reset_index(drop=True)
+
+def fill_gaps(df, step):
+    """Reindex onto the full step grid and forward-fill; filled marks rows that had no point of their own"""
+    if df.empty:
+        return df.assign(filled=pd.Series(dtype=bool))
+    grid = np.arange(df["timestamp"].iloc[0], df["timestamp"].iloc[-1] + 1, step * 1000, dtype=np.int64)
+    df = df.set_index("timestamp").reindex(grid).rename_axis("timestamp")
+    df["filled"] = df["price"].isna()
+    df[COLUMNS[1:]] = df[COLUMNS[1:]].ffill()
+    return df.reset_index()
+
+def gap_runs(df):
+    """Consecutive filled rows as (first timestamp ms, rows) pairs, longest first"""
+    if df.empty or not df["filled"].any():
+        return []
+    filled = df["filled"].to_numpy()
+    edges = np.flatnonzero(np.diff(np.r_[0, filled.astype(np.int8), 0]))
+    starts, stops = edges[::2], edges[1::2]
+    runs = sorted(zip(df["timestamp"].to_numpy()[starts].tolist(), (stops - starts).tolist()), key=lambda r: -r[1])
+    return runs
+
+def fetch_price_history(coin_id=COIN_ID, start=None, end=None, resolution="hourly", url=COINGECKO_URL,
+                        max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, api_key=None):
+    """Fetch all windows of a range concurrently under one rate limit; returns (points, failed windows)"""
+    start = _unix(PRICE_SINCE) if start is None else start
+    end = _unix(PRICE_TILL) if end is None else end
+    windows = price_windows(start, end, resolution)
+    limiter = RateLimiter(rate, burst=max_workers)
+    session = requests.Session()
+    failed = []
+    
+    def fetch(window):
+        try:
+            return fetch_window(coin_id, *window, url=url, session=session, limiter=limiter, api_key=api_key)
+        except Exception as e:
+            print(f"Window {datetime.fromtimestamp(window[0], timezone.utc):%Y-%m-%d}.."
+                  f"{datetime.fromtimestamp(window[1], timezone.utc):%Y-%m-%d} failed: {e}")
+            failed.append(window)
+            return pd.DataFrame(columns=COLUMNS)
+    
+    print(f"Fetching {len(windows)} {resolution} windows for {coin_id} with {max_workers} workers at {rate} req/s")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = list(pool.map(fetch, windows))
+    return merge_points(frames, RESOLUTIONS[resolution][0]), sorted(failed)
+
+def sync_price_history(coin_id=COIN_ID, since=PRICE_SINCE, till=PRICE_TILL, resolution="hourly", path=PRICE_HISTORY,
+                       conn=None, save=True, full=False, **options):
+    """Bring the price history file up to date and return it
+    
+    Resumes after the coingecko watermark unless full=True, merges with the
+    points already on disk and saves timestamp (ms), price, market_cap,
+    volume, filled and date columns. The watermark only advances through the
+    windows before the first failed one. With save=False nothing is read
+    from or written to disk.
+    """
+    start, end = _unix(since), _unix(till)
+    step = RESOLUTIONS[resolution][0]
+    conn = conn or (store.connect() if save else None)
+    watermark = None if full or not save else store.get_watermark(conn, "coingecko", coin_id, "price")
+    existing = None
+    if watermark is not None and os.path.exists(path):
+        existing = pd.read_csv(path)
+        start = max(start, watermark - WINDOW_OVERLAP)
+        if watermark >= end:
+            print(f"Price history already synced through {datetime.fromtimestamp(watermark, timezone.utc)}")
+            return existing
+    
+    points, failed = fetch_price_history(coin_id, start, end, resolution, **options)
+    fetched = len(points)
+    if existing is not None:
+        # Keep only the observed rows of the old file so its gap flags are recomputed
+        kept = existing[~existing["filled"]] if "filled" in existing.columns else existing
+        points = merge_points([kept.reindex(columns=COLUMNS), points], step)
+    if points.empty:
+        print("No price data found")
+        return existing
+    
+    df = fill_gaps(points, step)
+    df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
+    runs = gap_runs(df)
+    print(f"{fetched:,} points fetched, {len(df):,} {resolution} rows, {int(df['filled'].sum()):,} forward-filled"
+          + (f" (longest gap {runs[0][1]} rows from {pd.to_datetime(runs[0][0], unit='ms')})" if runs else ""))
+    if save:
+        df.to_csv(path, index=False)
+        through = min(failed)[0] if failed else end + 1
+        synced = df.loc[df["timestamp"] // 1000 < through, "timestamp"]
+        if len(synced):
+            store.set_watermark(conn, "coingecko", coin_id, "price", int(synced.max() // 1000), unit="timestamp")
+        print(f"Saved {len(df):,} price records to {path}")
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch high-resolution NCR price, market cap and volume history from CoinGecko")
+    parser.add_argument("--coin", default=COIN_ID)
+    parser.add_argument("--since", default=PRICE_SINCE)
+    parser.add_argument("--till", default=PRICE_TILL)
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="hourly")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="requests per second")
+    parser.add_argument("--url", default=COINGECKO_URL, help="API base URL (point at a mock server for offline runs)")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and refetch the whole range")
+    args = parser.parse_args()
+    
+    print("=== NCR Price History ===")
+    started = time.time()
+    df = sync_price_history(args.coin, args.since, args.till, args.resolution, full=args.full, url=args.url,
+                            max_workers=args.workers, rate=args.rate)
+    if df is not None:
+        print(f"Done in {time.time() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
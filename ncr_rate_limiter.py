@@ -0,0 +1,30 @@
+import threading
+import time
+
+class RateLimiter:
+    """Thread-safe token bucket shared by concurrent workers hitting one provider"""
+    
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+    
+    def penalize(self, seconds):
+        """Stop handing out tokens for a while, e.g. after an HTTP 429"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
\ No newline at end of file
@@ -0,0 +1,179 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_interning import AddressInterner
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, PRICE_HISTORY, asof_lookup, load_price_history, read_transfers, split_amounts
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+REALIZED_CAP_CSV = 'ncr_realized_cap.csv'
+INITIAL_CAPACITY = 1 << 16
+DUST = 1e-9                      # balances below this many tokens count as empty
+
+class RealizedCapEngine:
+    """Realized capitalization from a block-ordered transfer stream
+    
+    Every holder carries a balance and the aggregate USD value of its coins
+    at the price they last moved (average cost). A transfer moves the
+    sender's pro-rata share of that value out, revalues the coins at the
+    current price for the receiver, and books the difference as realized
+    profit or loss. State lives in arrays indexed by interned address ID, so
+    each transfer is O(1).
+    """
+    
+    def __init__(self, interner=None, capacity=INITIAL_CAPACITY):
+        self.interner = interner if interner is not None else AddressInterner()
+        self.balance = np.zeros(capacity)
+        self.realized = np.zeros(capacity)
+        self.realized_cap = 0.0
+        self.supply = 0.0
+        self.zero_id = self.interner.intern(ZERO_ADDRESS)
+    
+    def _ensure(self, size):
+        if size <= len(self.balance):
+            return
+        capacity = max(size, 2 * len(self.balance))
+        self.balance = np.concatenate([self.balance, np.zeros(capacity - len(self.balance))])
+        self.realized = np.concatenate([self.realized, np.zeros(capacity - len(self.realized))])
+    
+    def apply(self, senders, receivers, amounts, prices):
+        """Apply transfers in order; returns per-transfer (realized_cap, supply, profit, loss) arrays
+        
+        amounts are token units and prices USD per token at each transfer.
+        """
+        n = len(amounts)
+        self._ensure(len(self.interner))
+        balance, realized, zero = self.balance, self.realized, self.zero_id
+        cap_after = np.empty(n)
+        supply_after = np.empty(n)
+        profit = np.zeros(n)
+        loss = np.zeros(n)
+        cap, supply = self.realized_cap, self.supply
+        
+        for i, (sender, receiver, amount, price) in enumerate(zip(senders.tolist(), receivers.tolist(),
+                                                                  amounts.tolist(), prices.tolist())):
+            value = amount * price
+            if sender == zero:
+                supply += amount
+            else:
+                held = balance[sender]
+                share = 1.0 if amount >= held else amount / held
+                cost = realized[sender] * share
+                realized[sender] -= cost
+                balance[sender] = held - amount if held - amount > DUST else 0.0
+                if balance[sender] == 0.0:
+                    realized[sender] = 0.0
+                cap -= cost
+                # Spending realizes the gap between current value and the cost basis moved out
+                if value >= cost:
+                    profit[i] = value - cost
+                else:
+                    loss[i] = cost - value
+            if receiver == zero:
+                supply -= amount
+            else:
+                balance[receiver] += amount
+                realized[receiver] += value
+                cap += value
+            cap_after[i] = cap
+            supply_after[i] = supply
+        
+        self.realized_cap, self.supply = cap, supply
+        return cap_after, supply_after, profit, loss
+    
+    def holder_frame(self):
+        """Current balance, realized value and cost basis per holder"""
+        n = len(self.interner)
+        held = self.balance[:n] > 0
+        ids = np.flatnonzero(held)
+        return pd.DataFrame({
+            'address': self.interner.lookup(ids),
+            'balance': self.balance[ids],
+            'realized_value': self.realized[ids],
+            'cost_basis': self.realized[ids] / self.balance[ids]
+        }).sort_values('realized_value', ascending=False, ignore_index=True)
+
+def realized_cap_series(conn, prices, token=NCR_CONTRACT, chain="polygon", decimals=NCR_DECIMALS, engine=None, chunks=None):
+    """Stream stored transfers through the engine and return daily realized metrics
+    
+    Columns: realized_cap, supply, price, market_cap, mvrv, realized_profit,
+    realized_loss and net_realized_pnl, one row per calendar day from the
+    first transfer to the last price or transfer, with gaps carried forward.
+    chunks replaces the store read with already loaded transfer chunks.
+    """
+    engine = engine or RealizedCapEngine()
+    price_times = prices['timestamp'].to_numpy()
+    price_values = prices['price'].to_numpy()
+    days = []
+    
+    for chunk in read_transfers(conn, token, chain) if chunks is None else chunks:
+        if chunk.empty:
+            continue
+        whole, frac = split_amounts(chunk['value'].to_numpy(), decimals)
+        amounts = whole.astype(np.float64) + frac.astype(np.float64) / 10 ** decimals
+        # Coins that move before the first price are carried at zero cost
+        price = np.nan_to_num(asof_lookup(price_times, price_values, chunk['timestamp'].to_numpy()))
+        senders = engine.interner.intern_many(chunk['from_address'].to_numpy())
+        receivers = engine.interner.intern_many(chunk['to_address'].to_numpy())
+        cap, supply, profit, loss = engine.apply(senders, receivers, amounts, price)
+        days.append(pd.DataFrame({
+            'date': pd.to_datetime(chunk['timestamp'].to_numpy(), unit='s').normalize(),
+            'realized_cap': cap, 'supply': supply, 'realized_profit': profit, 'realized_loss': loss
+        }).groupby('date').agg(realized_cap=('realized_cap', 'last'), supply=('supply', 'last'),
+                               realized_profit=('realized_profit', 'sum'), realized_loss=('realized_loss', 'sum')))
+    
+    if not days:
+        return pd.DataFrame(columns=['realized_cap', 'supply', 'price', 'market_cap', 'mvrv',
+                                     'realized_profit', 'realized_loss', 'net_realized_pnl'])
+    
+    # A day can straddle two chunks; fold those rows back together
+    daily = pd.concat(days).groupby(level=0).agg({'realized_cap': 'last', 'supply': 'last',
+                                                  'realized_profit': 'sum', 'realized_loss': 'sum'})
+    close = pd.Series(price_values, index=pd.to_datetime(price_times, unit='s').normalize()).groupby(level=0).last()
+    calendar = pd.date_range(daily.index.min(), max(daily.index.max(), close.index.max()), freq='D', name='date')
+    daily = daily.reindex(calendar)
+    daily[['realized_cap', 'supply']] = daily[['realized_cap', 'supply']].ffill()
+    daily[['realized_profit', 'realized_loss']] = daily[['realized_profit', 'realized_loss']].fillna(0.0)
+    daily['price'] = close.reindex(calendar).ffill()
+    daily['market_cap'] = daily['supply'] * daily['price']
+    daily['mvrv'] = daily['market_cap'] / daily['realized_cap'].where(daily['realized_cap'] > 0)
+    daily['net_realized_pnl'] = daily['realized_profit'] - daily['realized_loss']
+    return daily
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily realized cap, MVRV and realized P/L from stored NCR transfers")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--chain", default="polygon")
+    parser.add_argument("--decimals", type=int, default=NCR_DECIMALS)
+    args = parser.parse_args()
+    
+    print("=== NCR Realized Capitalization ===")
+    if not os.path.exists(PRICE_HISTORY):
+        print(f"No price history at {PRICE_HISTORY}; run ncr_analysis.py first")
+        return
+    
+    conn = store.connect()
+    engine = RealizedCapEngine()
+    daily = realized_cap_series(conn, load_price_history(), args.token, args.chain, args.decimals, engine)
+    if daily.empty:
+        print("No stored transfers; run ncr_polygonscan_fetcher.py or ncr_watch.py first")
+        return
+    
+    daily.to_csv(REALIZED_CAP_CSV)
+    peak = daily['realized_cap'].idxmax()
+    latest = daily.iloc[-1]
+    print(f"Days: {len(daily):,} ({daily.index[0]:%Y-%m-%d} to {daily.index[-1]:%Y-%m-%d})")
+    print(f"Peak realized cap: ${daily['realized_cap'].max():,.2f} on {peak:%Y-%m-%d}")
+    print(f"Latest realized cap: ${latest['realized_cap']:,.2f}, market cap ${latest['market_cap']:,.2f}, MVRV {latest['mvrv']:.2f}")
+    print(f"Total realized profit ${daily['realized_profit'].sum():,.2f}, loss ${daily['realized_loss'].sum():,.2f}")
+    
+    holders = engine.holder_frame()
+    print(f"\nLargest holders by realized value ({len(holders):,} holders):")
+    for _, row in holders.head(10).iterrows():
+        print(f"- {row['address']}: {row['balance']:,.2f} NCR at ${row['cost_basis']:.6f} = ${row['realized_value']:,.2f}")
+    print(f"\nSaved {REALIZED_CAP_CSV}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,270 @@
+import requests
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from web3.providers.base import BaseProvider
+
+POLYGON_RPC = "https://polygon-rpc.com"
+POLYGON_RPC_URLS = [
+    POLYGON_RPC,
+    "https://polygon-bor-rpc.publicnode.com",
+    "https://1rpc.io/matic"
+]
+
+# Providers reject eth_getLogs ranges that match too many logs; these fragments identify that case
+LOG_LIMIT_ERRORS = ("query returned more than", "limit exceeded", "too many", "response size", "block range")
+
+class RpcError(Exception):
+    """JSON-RPC error returned by a node"""
+    
+    def __init__(self, method, error):
+        self.method = method
+        self.code = error.get('code') if isinstance(error, dict) else None
+        self.message = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+        super().__init__(f"{method}: {self.message}")
+
+# Methods that read historical state; below the archive depth only archive nodes can answer them
+STATE_METHODS = {
+    "eth_call": 1, "eth_getBalance": 1, "eth_getCode": 1, "eth_getTransactionCount": 1,
+    "eth_getStorageAt": 2, "eth_getProof": 2
+}
+ARCHIVE_DEPTH = 128              # full nodes keep roughly this many recent states
+MISSING_STATE_ERRORS = ("missing trie node", "header not found", "state not available", "pruned")
+
+# Endpoint health settings
+WINDOW = 100                     # rolling window of calls per endpoint
+UNHEALTHY_ERROR_RATE = 0.5
+COOLDOWN = 30.0                  # seconds an endpoint sits out after repeated failures
+FAILURES_BEFORE_COOLDOWN = 3
+MIN_HEDGE_DELAY = 0.05
+MAX_HEDGE_DELAY = 3.0
+MAX_HEAD_LAG = 10                # blocks an endpoint may trail the best head
+
+_request_ids = itertools.count(1)
+_session = requests.Session()
+
+def rpc_call(method, params=None, url=POLYGON_RPC, session=None, timeout=30):
+    """Send a single JSON-RPC request and return its result
+    
+    url may also be an RpcPool, in which case the pool picks the endpoint.
+    """
+    if isinstance(url, RpcPool):
+        return url.call(method, params)
+    payload = {"jsonrpc": "2.0", "id": next(_request_ids), "method": method, "params": params or []}
+    response = (session or _session).post(url, json=payload, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    if data.get('error'):
+        raise RpcError(method, data['error'])
+    return data.get('result')
+
+def get_block_number(url=POLYGON_RPC, session=None):
+    """Return the latest block number"""
+    return int(rpc_call("eth_blockNumber", [], url, session), 16)
+
+def get_block(number, url=POLYGON_RPC, session=None):
+    """Return a block header (without transactions) by number"""
+    return rpc_call("eth_getBlockByNumber", [hex(number), False], url, session)
+
+def eth_call(to, data, block="latest", url=POLYGON_RPC, session=None):
+    """Execute a read-only contract call"""
+    tag = hex(block) if isinstance(block, int) else block
+    return rpc_call("eth_call", [{"to": to, "data": data}, tag], url, session)
+
+def get_logs(addresses, topics, from_block, to_block, url=POLYGON_RPC, session=None):
+    """Fetch logs for one or more contract addresses, bisecting the range when the node caps results"""
+    params = [{
+        "address": addresses,
+        "topics": topics,
+        "fromBlock": hex(from_block),
+        "toBlock": hex(to_block)
+    }]
+    try:
+        return rpc_call("eth_getLogs", params, url, session)
+    except RpcError as e:
+        if from_block >= to_block or not any(fragment in e.message.lower() for fragment in LOG_LIMIT_ERRORS):
+            raise
+    middle = (from_block + to_block) // 2
+    return (get_logs(addresses, topics, from_block, middle, url, session) +
+            get_logs(addresses, topics, middle + 1, to_block, url, session))
+
+class RpcEndpoint:
+    """One node URL with rolling latency and error statistics"""
+    
+    def __init__(self, url, archive=False):
+        self.url = url
+        self.archive = archive
+        self.session = requests.Session()
+        self.latencies = deque(maxlen=WINDOW)
+        self.outcomes = deque(maxlen=WINDOW)
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.head = None
+        self._lock = threading.Lock()
+    
+    def record(self, latency, ok):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+                    self.down_until = time.monotonic() + COOLDOWN
+    
+    def error_rate(self):
+        return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+    
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def healthy(self):
+        return time.monotonic() >= self.down_until and self.error_rate() < UNHEALTHY_ERROR_RATE
+    
+    def score(self):
+        """Lower is better: median latency inflated by the recent error rate"""
+        median = self.percentile(0.5)
+        return (median if median is not None else 0.5) * (1 + 4 * self.error_rate())
+
+class RpcPool:
+    """Route JSON-RPC calls across several endpoints
+
+    Each call goes to the fastest healthy endpoint that can serve it. If it has
+    not answered within that endpoint's p95 latency a duplicate is fired at
+    the next best one and the first good answer wins. Historical state reads
+    are only sent to endpoints marked as archive nodes.
+    """
+    
+    def __init__(self, endpoints=POLYGON_RPC_URLS, hedge=True, timeout=30, max_workers=16):
+        self.endpoints = [e if isinstance(e, RpcEndpoint) else
+                          RpcEndpoint(e['url'], e.get('archive', False)) if isinstance(e, dict) else RpcEndpoint(e)
+                          for e in endpoints]
+        self.hedge = hedge
+        self.timeout = timeout
+        self.head = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+    
+    def _needs_archive(self, method, params):
+        position = STATE_METHODS.get(method)
+        if position is None or not params or len(params) <= position:
+            return False
+        tag = params[position]
+        if not isinstance(tag, str) or not tag.startswith("0x"):
+            return False
+        if self.head is None:
+            # Learn the head lazily; if nobody answers, let any endpoint try (missing-state errors still fail over)
+            try:
+                self.head = int(self.call("eth_blockNumber"), 16)
+            except Exception:
+                return False
+        return int(tag, 16) < self.head - ARCHIVE_DEPTH
+    
+    def ranked(self, method=None, params=None):
+        """Eligible endpoints, best first; unhealthy ones only as a last resort"""
+        candidates = self.endpoints
+        if method and self._needs_archive(method, params):
+            candidates = [e for e in candidates if e.archive]
+            if not candidates:
+                raise RpcError(method, {"message": "no archive endpoint configured for historical state"})
+        healthy = sorted((e for e in candidates if e.healthy()), key=lambda e: e.score())
+        return healthy + [e for e in candidates if e not in healthy]
+    
+    def best_endpoint(self):
+        return self.ranked()[0]
+    
+    def _send(self, endpoint, method, params):
+        started = time.monotonic()
+        try:
+            result = rpc_call(method, params, endpoint.url, endpoint.session, self.timeout)
+        except RpcError as e:
+            # A node-level JSON-RPC error is an answer, not an outage, unless the node lacks the state
+            if any(fragment in e.message.lower() for fragment in MISSING_STATE_ERRORS):
+                endpoint.archive = False
+                endpoint.record(time.monotonic() - started, False)
+            else:
+                endpoint.record(time.monotonic() - started, True)
+            raise
+        except Exception:
+            endpoint.record(time.monotonic() - started, False)
+            raise
+        endpoint.record(time.monotonic() - started, True)
+        return result
+    
+    def call(self, method, params=None):
+        """Send a call with hedging and failover; returns the result of the first success"""
+        params = params or []
+        candidates = self.ranked(method, params)
+        last_error = None
+        
+        index = 0
+        while index < len(candidates):
+            primary = candidates[index]
+            futures = {self._executor.submit(self._send, primary, method, params): primary}
+            index += 1
+            
+            p95 = primary.percentile(0.95)
+            delay = min(max(p95 if p95 is not None else MAX_HEDGE_DELAY, MIN_HEDGE_DELAY), MAX_HEDGE_DELAY)
+            done, _ = wait(futures, timeout=delay)
+            if not done and self.hedge and index < len(candidates):
+                futures[self._executor.submit(self._send, candidates[index], method, params)] = candidates[index]
+                index += 1
+            
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    futures.pop(future)
+                    try:
+                        return future.result()
+                    except RpcError as e:
+                        if not any(fragment in e.message.lower() for fragment in MISSING_STATE_ERRORS):
+                            raise
+                        last_error = e
+                    except Exception as e:
+                        last_error = e
+        raise last_error or RpcError(method, {"message": "no endpoints available"})
+    
+    def health_check(self):
+        """Probe every endpoint with eth_blockNumber and sideline any that lag the best head"""
+        def probe(endpoint):
+            try:
+                endpoint.head = int(self._send(endpoint, "eth_blockNumber", []), 16)
+            except Exception:
+                endpoint.head = None
+        
+        list(self._executor.map(probe, self.endpoints))
+        heads = [e.head for e in self.endpoints if e.head is not None]
+        self.head = max(heads) if heads else self.head
+        for endpoint in self.endpoints:
+            if endpoint.head is not None and self.head - endpoint.head > MAX_HEAD_LAG:
+                endpoint.down_until = time.monotonic() + COOLDOWN
+        return {e.url: {"head": e.head, "p50": e.percentile(0.5), "p95": e.percentile(0.95),
+                        "error_rate": e.error_rate(), "healthy": e.healthy()} for e in self.endpoints}
+
+class RpcPoolProvider(BaseProvider):
+    """web3.py provider that sends every request through an RpcPool"""
+    
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+    
+    def make_request(self, method, params):
+        request_id = next(_request_ids)
+        try:
+            return {"jsonrpc": "2.0", "id": request_id, "result": self.pool.call(method, list(params))}
+        except RpcError as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code or -32000, "message": e.message}}
+    
+    def is_connected(self, show_traceback=False):
+        try:
+            self.pool.call("eth_blockNumber", [])
+            return True
+        except Exception:
+            if show_traceback:
+                raise
+            return False
\ No newline at end of file
@@ -0,0 +1,820 @@
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_polygonscan_fetcher import START_BLOCK
+
+SIM_STORE = "ncr_sim_events.db"
+SIM_CHAIN = "sim"
+TRUTH_FILE = "ncr_sim_truth.json"
+WASH_TRUTH_FILE = "ncr_sim_wash_cycles.csv"
+HOST = "127.0.0.1"
+PORT = 8545
+
+BLOCK_TIME = 2                     # seconds, as on Polygon
+CHUNK_EVENTS = 1_000_000           # logs generated and written per segment at most
+TOTAL_SUPPLY = 1e9
+BASE_PRICE = 0.01                  # quote per token at launch
+LAUNCH_RESERVE_SHARE = 0.2         # share of supply the team seeds the pool with
+SWAP_NOISE = 0.01                  # per-swap log-price deviation from the lifecycle path
+ZIPF = 0.8                         # trader activity skew
+TRADER_DECIMALS = 18
+
+# Share of the log budget per activity; swaps emit Transfer + Sync + Swap
+SWAP_LOG_SHARE = 0.6
+TRANSFER_LOG_SHARE = 0.3
+WASH_LOG_SHARE = 0.1
+
+# (name, share of the timeline, start price, end price, relative activity), after create_market_cap_visualization.
+# A start price below the previous phase's end price is a coordinated dump at the boundary.
+PHASES = [
+    ("launch", 0.08, 1.0, 5.0, 1.0),
+    ("pump", 0.08, 5.0, 50.0, 4.0),
+    ("dump", 0.15, 30.0, 20.0, 2.5),
+    ("decline", 0.30, 20.0, 5.0, 1.0),
+    ("slow_rug", 0.39, 3.0, 0.1, 0.4),
+]
+DUMPERS = 12
+DUMP_SELLS_PER_WALLET = 2
+DUMP_BLOCKS = 30                   # a dump burst lasts about a minute
+# (phase, position within it, share of the team's LP burned)
+TEAM_PULLS = [("dump", 0.02, 0.4), ("slow_rug", 0.5, 0.9)]
+MAX_HOPS_SECONDS = 3 * BLOCK_TIME  # gap between consecutive hops of a wash cycle at most
+WASH_HOP_LOSS = 0.02               # each hop forwards up to 2% less than it received
+
+TRANSFER, SYNC, SWAP, MINT, BURN = range(5)
+KIND_NAMES = ["transfer", "sync", "swap", "mint", "burn"]
+TOPICS = [store.TRANSFER_TOPIC, store.SYNC_TOPIC, store.SWAP_TOPIC, store.MINT_TOPIC, store.BURN_TOPIC]
+TOKEN, PAIR = 0, 1                 # log emitter: the token contract or the pair (its LP token and events)
+ZERO, PAIR_ADDRESS, ROUTER, TEAM = range(4)
+COLUMNS = ("block", "log_index", "tx", "timestamp", "kind", "address", "a", "b", "v0", "v1")
+
+def _random_addresses(rng, n):
+    raw = rng.bytes(20 * n).hex()
+    return ["0x" + raw[40 * i:40 * (i + 1)] for i in range(n)]
+
+def _raw(values):
+    """Token amounts as 18-decimal integer strings (micro-token resolution)"""
+    micro = np.rint(np.asarray(values, dtype=np.float64) * 1e6).astype(np.int64).tolist()
+    return [f"{m}000000000000" if m else "0" for m in micro]
+
+class _Batch:
+    """Transactions and their logs for one segment, assembled column-wise"""
+    
+    def __init__(self):
+        self.times = []
+        self.logs = []
+        self.count = 0
+    
+    def add(self, times, logs):
+        """times: one entry per transaction; logs: (kind, emitter, a, b, v0, v1) per log position, arrays or scalars"""
+        times = np.asarray(times, dtype=np.float64)
+        n = len(times)
+        if not n:
+            return
+        local = np.arange(self.count, self.count + n)
+        for seq, fields in enumerate(logs):
+            self.logs.append((local, np.full(n, seq), *(np.broadcast_to(np.asarray(f), (n,)) for f in fields)))
+        self.times.append(times)
+        self.count += n
+    
+    def build(self, tx_base, start_time, start_block):
+        if not self.count:
+            return {name: np.zeros(0) for name in COLUMNS}
+        times = np.concatenate(self.times)
+        rank = np.empty(len(times), dtype=np.int64)
+        rank[np.argsort(times, kind="stable")] = np.arange(len(times))
+        local, seq, kind, address, a, b, v0, v1 = (np.concatenate(column) for column in zip(*self.logs))
+        order = np.argsort(rank[local] * 8 + seq, kind="stable")
+        local = local[order]
+        timestamp = np.floor(times[local]).astype(np.int64)
+        block = start_block + (timestamp - start_time) // BLOCK_TIME
+        index = np.arange(len(block))
+        first = np.maximum.accumulate(np.where(np.r_[True, block[1:] != block[:-1]], index, 0))
+        return {"block": block, "log_index": index - first, "tx": tx_base + rank[local], "timestamp": timestamp,
+                "kind": kind[order].astype(np.int8), "address": address[order].astype(np.int8),
+                "a": a[order].astype(np.int64), "b": b[order].astype(np.int64),
+                "v0": v0[order].astype(np.float64), "v1": v1[order].astype(np.float64)}
+
+class MarketSimulator:
+    """Synthetic token history with ground truth, generated segment by segment
+    
+    Prices follow the launch/pump/dump/decline/slow-rug lifecycle that
+    create_market_cap_visualization sketches, with per-swap noise. Swaps,
+    Syncs, Mints and Burns come from one constant-product pool whose
+    liquidity changes with provider adds, organic removals and team pulls, so
+    reserves, swap amounts and LP supply stay mutually consistent. Wallet
+    transfers, wash-trading rings and coordinated dump bursts are mixed in,
+    and every role, pull, dump and wash cycle is recorded in self.truth.
+    Senders are sampled rather than balance-checked, so individual balances
+    can go negative.
+    """
+    
+    def __init__(self, events=1_000_000, wallets=10_000, days=395, seed=42, start_block=START_BLOCK,
+                 start_time=int(datetime(2021, 10, 1).timestamp()), chunk_events=CHUNK_EVENTS):
+        self.events = int(events)
+        self.days = days
+        self.seed = seed
+        self.start_block = start_block
+        self.start_time = start_time
+        self.end_time = start_time + days * 86400
+        self.chunk_events = chunk_events
+        self.rng = np.random.default_rng(seed)
+        self._salt = int(self.rng.integers(1 << 62))
+        
+        wallets = max(int(wallets), 200)
+        self.token, pair, router, team = _random_addresses(self.rng, 4)
+        self.addresses = np.array(["0x" + "0" * 40, pair, router, team, *_random_addresses(self.rng, wallets)], dtype=object)
+        self.pair = pair
+        self.router = router
+        
+        # Roles over wallet indices (4 onwards)
+        ids = self.rng.permutation(np.arange(4, 4 + wallets))
+        rings = max(2, wallets // 500)
+        sizes = self.rng.integers(2, 6, rings)
+        providers = max(3, wallets // 1000)
+        whales = max(5, wallets // 100)
+        cut = np.cumsum([DUMPERS, sizes.sum(), providers, whales])
+        self.dumpers = ids[:cut[0]]
+        self.rings = np.split(ids[cut[0]:cut[1]], np.cumsum(sizes)[:-1])
+        self.providers = ids[cut[1]:cut[2]]
+        self.whales = ids[cut[2]:cut[3]]
+        self.retail = ids[cut[3]:]
+        self.traders = np.concatenate([self.whales, self.providers, self.retail])
+        weights = 1.0 / np.arange(1, len(self.traders) + 1) ** ZIPF
+        self.trader_cdf = np.cumsum(weights) / weights.sum()
+        
+        shares = np.array([phase[1] for phase in PHASES])
+        edges = self.start_time + np.r_[0, np.cumsum(shares)] / shares.sum() * days * 86400
+        self.phase_edges = (edges // BLOCK_TIME * BLOCK_TIME).astype(np.int64)
+        self.trading_start = self.start_time + 180
+        self._build_liquidity()
+        self._build_dumps()
+        self.truth = self._truth_header()
+        self.wash_cycles = []
+        self.counts = {name: 0 for name in KIND_NAMES}
+        self.generated = 0
+    
+    # --- Lifecycle path -------------------------------------------------
+    
+    def phase_at(self, t):
+        return np.clip(np.searchsorted(self.phase_edges, t, side="right") - 1, 0, len(PHASES) - 1)
+    
+    def anchor_price(self, t):
+        """Lifecycle price (geometric within each phase) at times t"""
+        t = np.asarray(t, dtype=np.float64)
+        phase = self.phase_at(t)
+        start = np.array([p[2] for p in PHASES])[phase]
+        end = np.array([p[3] for p in PHASES])[phase]
+        position = (t - self.phase_edges[phase]) / (self.phase_edges[phase + 1] - self.phase_edges[phase])
+        return BASE_PRICE * start * (end / start) ** np.clip(position, 0.0, 1.0)
+    
+    def activity(self, t):
+        return np.array([p[4] for p in PHASES])[self.phase_at(t)]
+    
+    def liquidity_at(self, t):
+        index = np.searchsorted(self._liquidity_times, t, side="right") - 1
+        return np.where(index >= 0, self._liquidity_levels[np.maximum(index, 0)], 0.0)
+    
+    def tx_hash(self, tx):
+        return f"0x{self._salt:016x}{int(tx):048x}"
+    
+    # --- Scheduled events -----------------------------------------------
+    
+    def _build_liquidity(self):
+        """Team seed, provider adds and removals, and team pulls, in time order"""
+        rng = self.rng
+        launch_liquidity = TOTAL_SUPPLY * LAUNCH_RESERVE_SHARE * np.sqrt(BASE_PRICE * PHASES[0][2])
+        events = [(self.start_time + 60, TEAM, launch_liquidity, None)]
+        growth_end = self.phase_edges[2]
+        for provider in self.providers:
+            events.append((int(rng.uniform(self.trading_start, growth_end)), int(provider), rng.uniform(0.05, 0.2), None))
+            if rng.random() < 0.5:
+                events.append((int(rng.uniform(self.phase_edges[3], self.phase_edges[4])), int(provider), -rng.uniform(0.5, 1.0), None))
+        for name, position, share in TEAM_PULLS:
+            phase = [p[0] for p in PHASES].index(name)
+            moment = self.phase_edges[phase] + position * (self.phase_edges[phase + 1] - self.phase_edges[phase])
+            events.append((int(moment) + DUMP_BLOCKS * BLOCK_TIME * 2, TEAM, -share, name))
+        events.sort(key=lambda e: e[0])
+        
+        # Resolve relative sizes into LP amounts: adds are a share of the pool, removals a share of the holder's LP
+        level, balances, schedule = 0.0, {}, []
+        for moment, provider, size, pull in events:
+            if provider == TEAM and size > 0:
+                delta = size
+            elif size > 0:
+                delta = level * size
+            else:
+                delta = size * balances.get(provider, 0.0)
+            if delta == 0:
+                continue
+            balances[provider] = balances.get(provider, 0.0) + delta
+            schedule.append({"time": moment, "provider": provider, "delta": delta, "before": level, "team_pull": pull})
+            level += delta
+        self.liquidity = schedule
+        self._liquidity_times = np.array([e["time"] for e in schedule], dtype=np.float64)
+        self._liquidity_levels = np.cumsum([e["delta"] for e in schedule])
+    
+    def _build_dumps(self):
+        """Sell bursts by the dumper group wherever a phase opens below the previous one's close"""
+        self.dumps = []
+        for i in range(1, len(PHASES)):
+            if PHASES[i][2] < PHASES[i - 1][3]:
+                start = int(self.phase_edges[i])
+                sells = len(self.dumpers) * DUMP_SELLS_PER_WALLET
+                times = start + (np.arange(sells) + 0.5) * DUMP_BLOCKS * BLOCK_TIME / sells
+                prices = BASE_PRICE * PHASES[i - 1][3] * (PHASES[i][2] / PHASES[i - 1][3]) ** ((np.arange(sells) + 1) / sells)
+                self.dumps.append({"phase": PHASES[i][0], "times": times, "prices": prices, "price_from": BASE_PRICE * PHASES[i - 1][3],
+                                   "wallets": np.resize(self.rng.permutation(self.dumpers), sells)})
+    
+    def _truth_header(self):
+        block = lambda t: int(self.start_block + (int(t) - self.start_time) // BLOCK_TIME)
+        return {
+            "seed": self.seed, "chain": SIM_CHAIN, "token": self.token, "pair": self.pair, "router": self.router,
+            "start_block": self.start_block, "end_block": block(self.end_time), "start_time": self.start_time,
+            "phases": [{"name": p[0], "start_block": block(self.phase_edges[i]), "end_block": block(self.phase_edges[i + 1]),
+                        "start_price": BASE_PRICE * p[2], "end_price": BASE_PRICE * p[3]} for i, p in enumerate(PHASES)],
+            "wallets": {
+                "team": [self.addresses[TEAM]],
+                "dumpers": self.addresses[self.dumpers].tolist(),
+                "wash_rings": [self.addresses[ring].tolist() for ring in self.rings],
+                "lp_providers": self.addresses[self.providers].tolist(),
+                "whales": self.addresses[self.whales].tolist(),
+            },
+            "liquidity": [{"block": block(e["time"]), "provider": self.addresses[e["provider"]], "lp": abs(e["delta"]),
+                           "kind": "add" if e["delta"] > 0 else "remove", "pool_share": abs(e["delta"]) / e["before"] if e["before"] else 1.0,
+                           "team_pull": e["team_pull"]} for e in self.liquidity],
+            "dumps": [{"phase": d["phase"], "start_block": block(d["times"][0]), "end_block": block(d["times"][-1]),
+                       "price_from": d["price_from"], "price_to": float(d["prices"][-1]),
+                       "wallets": sorted(set(self.addresses[d["wallets"]].tolist()))} for d in self.dumps],
+        }
+    
+    # --- Segment generation ---------------------------------------------
+    
+    def segments(self):
+        """(start, end) times of the segments, aligned to block boundaries"""
+        count = max(self.days, -(-self.events // self.chunk_events))
+        edges = np.linspace(self.start_time, self.end_time, count + 1) // BLOCK_TIME * BLOCK_TIME
+        return list(zip(edges[:-1].astype(np.int64), edges[1:].astype(np.int64)))
+    
+    def _sample_traders(self, n):
+        return self.traders[np.searchsorted(self.trader_cdf, self.rng.random(n))]
+    
+    def _swaps(self, batch, t0, t1, n, carry):
+        """Organic swaps plus any dump burst in [t0, t1); returns the last price"""
+        rng = self.rng
+        times = np.sort(rng.uniform(max(t0, self.trading_start), t1, n)) if t1 > max(t0, self.trading_start) else np.zeros(0)
+        prices = self.anchor_price(times) * np.exp(rng.normal(0.0, SWAP_NOISE, len(times)))
+        traders = self._sample_traders(len(times))
+        for dump in self.dumps:
+            inside = (dump["times"] >= t0) & (dump["times"] < t1)
+            if inside.any():
+                # Organic trading pauses for the burst so its sells run back to back
+                keep = (times < dump["times"][0]) | (times > dump["times"][-1])
+                times = np.concatenate([times[keep], dump["times"][inside]])
+                prices = np.concatenate([prices[keep], dump["prices"][inside]])
+                traders = np.concatenate([traders[keep], dump["wallets"][inside]])
+                order = np.argsort(times, kind="stable")
+                times, prices, traders = times[order], prices[order], traders[order]
+        if not len(times):
+            return carry, times, prices
+        
+        previous = np.r_[carry, prices[:-1]]
+        level = self.liquidity_at(times)
+        d0 = level * (prices ** -0.5 - previous ** -0.5)       # net token inflow into the pair
+        d1 = level * (prices ** 0.5 - previous ** 0.5)
+        sell = d0 > 0
+        batch.add(times, [
+            (TRANSFER, TOKEN, np.where(sell, traders, PAIR_ADDRESS), np.where(sell, PAIR_ADDRESS, traders), np.abs(d0), 0.0),
+            (SYNC, PAIR, ZERO, ZERO, level * prices ** -0.5, level * prices ** 0.5),
+            (SWAP, PAIR, ROUTER, traders, d0, d1),
+        ])
+        return prices[-1], times, prices
+    
+    def _liquidity(self, batch, t0, t1, swap_times, swap_prices, carry):
+        for event in self.liquidity:
+            if not t0 <= event["time"] < t1:
+                continue
+            before = np.searchsorted(swap_times, event["time"]) - 1
+            price = swap_prices[before] if before >= 0 else carry
+            delta, provider = event["delta"], event["provider"]
+            level = event["before"] + delta
+            lp, d0, d1 = abs(delta), abs(delta) / np.sqrt(price), abs(delta) * np.sqrt(price)
+            sync = (SYNC, PAIR, ZERO, ZERO, level / np.sqrt(price), level * np.sqrt(price))
+            if delta > 0:
+                batch.add([event["time"]], [(TRANSFER, TOKEN, provider, PAIR_ADDRESS, d0, 0.0),
+                                            (TRANSFER, PAIR, ZERO, provider, lp, 0.0), sync, (MINT, PAIR, ROUTER, ZERO, d0, d1)])
+            else:
+                batch.add([event["time"]], [(TRANSFER, PAIR, provider, PAIR_ADDRESS, lp, 0.0),
+                                            (TRANSFER, PAIR, PAIR_ADDRESS, ZERO, lp, 0.0),
+                                            (TRANSFER, TOKEN, PAIR_ADDRESS, provider, d0, 0.0), sync,
+                                            (BURN, PAIR, ROUTER, provider, d0, d1)])
+    
+    def _genesis(self, batch):
+        """Supply minted to the team, then allocations to the dumpers, rings and whales"""
+        batch.add([self.start_time], [(TRANSFER, TOKEN, ZERO, TEAM, TOTAL_SUPPLY, 0.0)])
+        recipients = np.concatenate([self.dumpers, *self.rings, self.whales])
+        shares = np.concatenate([np.full(len(self.dumpers), 0.005), np.full(len(recipients) - len(self.dumpers) - len(self.whales), 0.0005),
+                                 np.full(len(self.whales), 0.002)])
+        times = self.start_time + 120 + np.arange(len(recipients)) * 0.01
+        batch.add(times, [(TRANSFER, TOKEN, TEAM, recipients, shares * TOTAL_SUPPLY, 0.0)])
+    
+    def _reserve(self, t, price):
+        """Token-side pool reserve near time t, the scale for transfer and wash amounts"""
+        level = self.liquidity_at(t)
+        return level / np.sqrt(price) if level > 0 else TOTAL_SUPPLY * LAUNCH_RESERVE_SHARE
+    
+    def _transfers(self, batch, t0, t1, n, price):
+        rng = self.rng
+        low = max(t0, self.trading_start)
+        n = n if t1 > low else 0
+        senders = self._sample_traders(n)
+        receivers = self._sample_traders(n)
+        receivers = np.where(receivers == senders, self.retail[rng.integers(len(self.retail), size=n)], receivers)
+        amounts = self._reserve(t1 - 1, price) * 0.002 * rng.lognormal(0.0, 1.0, n)
+        batch.add(rng.uniform(low, t1, n), [(TRANSFER, TOKEN, senders, receivers, amounts, 0.0)])
+    
+    def _wash(self, batch, t0, t1, n, price):
+        rng = self.rng
+        span = 5 * MAX_HOPS_SECONDS
+        low = max(t0, self.trading_start)
+        if n == 0 or t1 - span <= low:
+            return
+        reserve = self._reserve(t1 - 1, price)
+        chosen = rng.integers(len(self.rings), size=n)
+        starts = rng.uniform(low, t1 - span, n)
+        base = reserve * 0.005 * rng.lognormal(0.0, 0.5, n)
+        rotation = rng.integers(0, 5, n)
+        for size in range(2, 6):
+            pick = np.flatnonzero(np.array([len(self.rings[r]) for r in chosen]) == size)
+            if not len(pick):
+                continue
+            members = np.stack([self.rings[r] for r in chosen[pick]])
+            members = members[np.arange(len(pick))[:, None], (np.arange(size)[None, :] + rotation[pick, None]) % size]
+            gaps = rng.uniform(BLOCK_TIME, MAX_HOPS_SECONDS, (len(pick), size))
+            gaps[:, 0] = 0.0
+            times = starts[pick, None] + np.cumsum(gaps, axis=1)
+            amounts = base[pick, None] * np.cumprod(1.0 - rng.uniform(0.0, WASH_HOP_LOSS, (len(pick), size)), axis=1)
+            for hop in range(size):
+                batch.add(times[:, hop], [(TRANSFER, TOKEN, members[:, hop], members[:, (hop + 1) % size], amounts[:, hop], 0.0)])
+            first_block = self.start_block + (np.floor(times[:, 0]).astype(np.int64) - self.start_time) // BLOCK_TIME
+            self.wash_cycles.append(pd.DataFrame({"ring": chosen[pick], "start_block": first_block, "length": size,
+                                                  "amount": amounts[:, 0]}))
+    
+    def simulate(self):
+        """Yield column batches (see COLUMNS) in block order"""
+        segments = self.segments()
+        middles = np.array([(a + b) / 2 for a, b in segments])
+        weights = self.activity(middles) * np.array([b - a for a, b in segments], dtype=np.float64)
+        weights /= weights.sum()
+        swaps = self.rng.multinomial(int(self.events * SWAP_LOG_SHARE / 3), weights)
+        transfers = self.rng.multinomial(int(self.events * TRANSFER_LOG_SHARE), weights)
+        mean_ring = np.mean([len(r) for r in self.rings])
+        washes = self.rng.multinomial(int(self.events * WASH_LOG_SHARE / mean_ring), weights)
+        
+        carry = BASE_PRICE * PHASES[0][2]
+        tx_base = 0
+        for i, (t0, t1) in enumerate(segments):
+            batch = _Batch()
+            if i == 0:
+                self._genesis(batch)
+            start_price = carry
+            carry, swap_times, swap_prices = self._swaps(batch, t0, t1, swaps[i], carry)
+            self._liquidity(batch, t0, t1, swap_times, swap_prices, start_price)
+            self._transfers(batch, t0, t1, transfers[i], start_price)
+            self._wash(batch, t0, t1, washes[i], start_price)
+            columns = batch.build(tx_base, self.start_time, self.start_block)
+            tx_base += batch.count
+            self.generated += len(columns["block"])
+            for kind, count in zip(*np.unique(columns["kind"], return_counts=True)):
+                self.counts[KIND_NAMES[kind]] += int(count)
+            yield columns
+    
+    # --- Outputs ----------------------------------------------------------
+    
+    def store_rows(self, columns, chain=SIM_CHAIN):
+        """(transfer rows, pair event rows) for ncr_event_store's insert helpers"""
+        kind = columns["kind"]
+        hashes = [self.tx_hash(tx) for tx in columns["tx"].tolist()]
+        a = self.addresses[columns["a"]]
+        b = self.addresses[columns["b"]]
+        v0, v1 = _raw(columns["v0"]), _raw(columns["v1"])
+        emitters = np.array([self.token, self.pair], dtype=object)[columns["address"]]
+        transfers, events = [], []
+        for i in range(len(kind)):
+            base = {"chain": chain, "block_number": int(columns["block"][i]), "log_index": int(columns["log_index"][i]),
+                    "tx_hash": hashes[i], "timestamp": int(columns["timestamp"][i])}
+            if kind[i] == TRANSFER:
+                transfers.append({**base, "token": emitters[i], "from_address": a[i], "to_address": b[i],
+                                  "value": v0[i], "source": "sim"})
+            else:
+                name = KIND_NAMES[kind[i]]
+                events.append({**base, "pair": self.pair, "event": name,
+                               "sender": None if name == "sync" else a[i],
+                               "recipient": b[i] if name in ("swap", "burn") else None,
+                               "amount0": v0[i], "amount1": v1[i]})
+        return transfers, events
+    
+    def write_truth(self, path=TRUTH_FILE, wash_path=WASH_TRUTH_FILE):
+        cycles = pd.concat(self.wash_cycles, ignore_index=True) if self.wash_cycles else pd.DataFrame(
+            columns=["ring", "start_block", "length", "amount"])
+        cycles.sort_values("start_block").to_csv(wash_path, index=False)
+        truth = {**self.truth, "logs": self.generated, "counts": self.counts, "wash_cycles": len(cycles)}
+        with open(path, "w") as f:
+            json.dump(truth, f, indent=2)
+
+def write_store(sim, conn, chain=SIM_CHAIN):
+    """Generate the whole history into an event store; returns logs written"""
+    started = time.time()
+    for columns in sim.simulate():
+        transfers, events = sim.store_rows(columns, chain)
+        with conn:
+            store.insert_transfers(conn, transfers)
+            store.insert_pair_events(conn, events)
+        if len(columns["block"]):
+            print(f"Block {int(columns['block'][-1]):,}: {sim.generated:,} logs "
+                  f"({sim.generated / max(time.time() - started, 1e-9):,.0f}/s)")
+    store.set_watermark(conn, "sim", sim.token, "logs", sim.truth["end_block"], chain)
+    return sim.generated
+
+class SimulatedNode:
+    """In-memory JSON-RPC stand-in serving a simulated history
+    
+    Blocks up to self.head are visible; evm_mine (or mine_interval) reveals
+    more and anvil_reorg replaces the newest blocks with empty ones under new
+    hashes. eth_getLogs filters by address and topic0 and rejects ranges with
+    more than max_logs results the way public nodes do, so callers' range
+    bisection gets exercised too.
+    """
+    
+    def __init__(self, sim, head=None, max_logs=10_000):
+        parts = list(sim.simulate())
+        self.sim = sim
+        self.columns = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+        self.first_block = sim.start_block
+        self.last_block = sim.truth["end_block"]
+        self.head = self.last_block if head is None else head
+        self.max_logs = max_logs
+        self.lock = threading.Lock()
+        self.filters = {}
+        self.forks = []
+        self._words = {}
+    
+    def block_hash(self, number):
+        # Every reorg at or below a block gives it a new hash
+        epoch = sum(1 for fork in self.forks if number > fork)
+        return f"0x{epoch:08x}{number:056x}" if epoch else f"0x{number:064x}"
+    
+    def block(self, number):
+        if number > self.head or number < self.first_block:
+            return None
+        parent = self.block_hash(number - 1) if number > self.first_block else "0x" + "0" * 64
+        return {"number": hex(number), "hash": self.block_hash(number), "parentHash": parent,
+                "timestamp": hex(self.sim.start_time + (number - self.first_block) * BLOCK_TIME), "transactions": []}
+    
+    def _block_tag(self, tag):
+        if tag in (None, "latest", "safe", "finalized", "pending"):
+            return self.head
+        return self.first_block if tag == "earliest" else int(tag, 16)
+    
+    def _word(self, value):
+        raw = int(np.rint(abs(value) * 1e6)) * 10 ** 12
+        return f"{raw:064x}"
+    
+    def _topic(self, index):
+        return "0x" + "0" * 24 + self.sim.addresses[index][2:]
+    
+    def _log(self, i):
+        c = self.columns
+        kind, v0, v1 = int(c["kind"][i]), float(c["v0"][i]), float(c["v1"][i])
+        topics = [TOPICS[kind]]
+        if kind == TRANSFER:
+            topics += [self._topic(c["a"][i]), self._topic(c["b"][i])]
+            data = self._word(v0)
+        elif kind == SYNC:
+            data = self._word(v0) + self._word(v1)
+        elif kind == SWAP:
+            topics += [self._topic(c["a"][i]), self._topic(c["b"][i])]
+            # amount0In, amount1In, amount0Out, amount1Out from net inflows
+            data = "".join(self._word(max(v, 0.0)) for v in (v0, v1)) + "".join(self._word(max(-v, 0.0)) for v in (v0, v1))
+        elif kind == MINT:
+            topics += [self._topic(c["a"][i])]
+            data = self._word(v0) + self._word(v1)
+        else:
+            topics += [self._topic(c["a"][i]), self._topic(c["b"][i])]
+            data = self._word(v0) + self._word(v1)
+        block = int(c["block"][i])
+        return {"address": self.sim.token if c["address"][i] == TOKEN else self.sim.pair, "topics": topics,
+                "data": "0x" + data, "blockNumber": hex(block), "blockHash": self.block_hash(block),
+                "transactionHash": self.sim.tx_hash(c["tx"][i]), "transactionIndex": "0x0",
+                "logIndex": hex(int(c["log_index"][i])), "removed": False}
+    
+    def get_logs(self, query):
+        from_block = self._block_tag(query.get("fromBlock"))
+        to_block = min(self._block_tag(query.get("toBlock")), self.head)
+        blocks = self.columns["block"]
+        lo, hi = np.searchsorted(blocks, from_block), np.searchsorted(blocks, to_block, side="right")
+        mask = np.ones(hi - lo, dtype=bool)
+        addresses = query.get("address")
+        if addresses:
+            addresses = {a.lower() for a in ([addresses] if isinstance(addresses, str) else addresses)}
+            wanted = [code for code, address in ((TOKEN, self.sim.token), (PAIR, self.sim.pair)) if address in addresses]
+            mask &= np.isin(self.columns["address"][lo:hi], wanted)
+        topics = query.get("topics") or []
+        if topics and topics[0]:
+            topic0 = [topics[0]] if isinstance(topics[0], str) else topics[0]
+            mask &= np.isin(self.columns["kind"][lo:hi], [TOPICS.index(t.lower()) for t in topic0 if t.lower() in TOPICS])
+        selected = np.flatnonzero(mask) + lo
+        if len(selected) > self.max_logs:
+            raise ValueError(f"query returned more than {self.max_logs} results")
+        return [self._log(i) for i in selected]
+    
+    def eth_call(self, call):
+        to, data = call.get("to", "").lower(), call.get("data", "")[:10]
+        if to == self.sim.token and data == "0x313ce567":
+            return "0x" + f"{TRADER_DECIMALS:064x}"
+        if to == self.sim.token and data == "0x18160ddd":
+            return "0x" + self._word(TOTAL_SUPPLY)
+        if to == self.sim.pair and data == "0x0dfe1681":
+            return "0x" + "0" * 24 + self.sim.token[2:]
+        raise ValueError("execution reverted")
+    
+    def mine(self, blocks=1):
+        with self.lock:
+            self.head = min(self.head + blocks, self.last_block)
+            return self.head
+    
+    def reorg(self, depth):
+        """Orphan the newest depth blocks: their logs disappear and they get new hashes"""
+        with self.lock:
+            fork = max(self.head - depth, self.first_block)
+            blocks = self.columns["block"]
+            keep = (blocks <= fork) | (blocks > self.head)
+            dropped = int((~keep).sum())
+            self.columns = {name: column[keep] for name, column in self.columns.items()}
+            self.forks.append(fork)
+            return dropped
+    
+    def handle(self, method, params):
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_chainId":
+            return hex(31337)
+        if method == "eth_getBlockByNumber":
+            return self.block(self._block_tag(params[0]))
+        if method == "eth_getLogs":
+            return self.get_logs(params[0])
+        if method == "eth_call":
+            return self.eth_call(params[0])
+        if method == "eth_getCode":
+            return "0x60806040" if params[0].lower() in (self.sim.token, self.sim.pair) else "0x"
+        if method == "anvil_reorg":
+            return self.reorg(int(params[0]))
+        if method in ("evm_mine", "anvil_mine"):
+            return hex(self.mine(int(params[0], 16) if params and isinstance(params[0], str) else (params or [1])[0]))
+        if method == "eth_newBlockFilter":
+            with self.lock:
+                filter_id = hex(len(self.filters) + 1)
+                self.filters[filter_id] = self.head
+            return filter_id
+        if method == "eth_getFilterChanges":
+            with self.lock:
+                seen = self.filters.get(params[0])
+                if seen is None:
+                    raise ValueError("filter not found")
+                self.filters[params[0]] = self.head
+            return [f"0x{n:064x}" for n in range(seen + 1, self.head + 1)]
+        raise NotImplementedError(f"the method {method} does not exist/is not available")
+
+class _RpcHandler(BaseHTTPRequestHandler):
+    node = None
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _answer(self, call):
+        response = {"jsonrpc": "2.0", "id": call.get("id")}
+        try:
+            response["result"] = self.node.handle(call.get("method"), call.get("params") or [])
+        except NotImplementedError as e:
+            response["error"] = {"code": -32601, "message": str(e)}
+        except Exception as e:
+            response["error"] = {"code": -32000, "message": str(e)}
+        return response
+    
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            payload = {}
+        body = json.dumps([self._answer(c) for c in payload] if isinstance(payload, list) else self._answer(payload)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def rpc_server(node, host=HOST, port=PORT):
+    """HTTP JSON-RPC server for a SimulatedNode (port 0 picks a free one)"""
+    handler = type("SimRpcHandler", (_RpcHandler,), {"node": node})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(node, host=HOST, port=PORT, mine_interval=None):
+    """Serve a SimulatedNode over HTTP JSON-RPC until interrupted"""
+    server = rpc_server(node, host, port)
+    print(f"Simulated node on http://{host}:{port} (blocks {node.first_block:,}-{node.last_block:,}, head {node.head:,})")
+    if mine_interval:
+        def miner():
+            while node.head < node.last_block:
+                time.sleep(mine_interval)
+                node.mine()
+        threading.Thread(target=miner, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped simulated node")
+    finally:
+        server.server_close()
+
+def evaluate(conn, truth, wash_path=WASH_TRUTH_FILE, chain=SIM_CHAIN):
+    """Run the detectors over a simulated store and score them against the ground truth"""
+    from ncr_interning import AddressInterner
+    from ncr_lp_ledger import replay_pair
+    from ncr_valuation import read_transfers
+    from ncr_wash_trading import detect_cycles
+    from ncr_watch import LIQUIDITY_PULL_SHARE
+    
+    results = {}
+    interner = AddressInterner()
+    started = time.time()
+    cycles, _, _ = detect_cycles(read_transfers(conn, truth["token"], chain), interner, interner.intern_many([truth["pair"]]))
+    ring_of = {address: i for i, ring in enumerate(truth["wallets"]["wash_rings"]) for address in ring}
+    true_cycles = pd.read_csv(wash_path)
+    keys = set(zip(true_cycles["ring"], true_cycles["start_block"]))
+    hits = set()
+    correct = 0
+    for path, blocks in zip(cycles["path"], cycles["blocks"]):
+        rings = {ring_of.get(address) for address in path.split("->")}
+        if len(rings) == 1 and None not in rings:
+            correct += 1
+            hits.add((rings.pop(), min(int(b) for b in blocks.split(","))))
+    results["wash"] = {"detected": len(cycles), "true": len(true_cycles), "precision": correct / len(cycles) if len(cycles) else None,
+                       "recall": len(hits & keys) / len(keys) if keys else None, "seconds": round(time.time() - started, 2)}
+    
+    started = time.time()
+    ledger = replay_pair(conn, truth["pair"], chain=chain)
+    pulls = [e for e in truth["liquidity"] if e["kind"] == "remove" and e["pool_share"] >= LIQUIDITY_PULL_SHARE]
+    matched = [d for d in ledger.drops if any(d["peak_block"] <= p["block"] <= d["block_number"] for p in pulls)]
+    found = [p for p in pulls if any(d["peak_block"] <= p["block"] <= d["block_number"] for d in ledger.drops)]
+    team = truth["wallets"]["team"][0]
+    blamed = [b for b in ledger.burns if b["drop"] is not None]
+    results["liquidity_pulls"] = {
+        "detected": len(ledger.drops), "true": len(pulls),
+        "precision": len(matched) / len(ledger.drops) if ledger.drops else None,
+        "recall": len(found) / len(pulls) if pulls else None,
+        "burner_precision": sum(b["wallet"] == team for b in blamed) / len(blamed) if blamed else None,
+        "seconds": round(time.time() - started, 2)}
+    return results
+
+def benchmark(conn, truth, chain=SIM_CHAIN):
+    """Time the stored-history engines on a simulated store"""
+    from ncr_concentration import balance_updates, concentration_series
+    from ncr_cost_basis import run_cost_basis
+    from ncr_interning import AddressInterner
+    from ncr_ledger import load_ledger
+    from ncr_out_of_core import peak_rss_mb
+    from ncr_realized_cap import realized_cap_series
+    from ncr_valuation import price_series_from_reserves, read_transfers
+    
+    token, pair = truth["token"], truth["pair"]
+    prices = price_series_from_reserves(conn, pair, chain=chain)[["timestamp", "price"]]
+    transfers = conn.execute("SELECT COUNT(*) FROM transfers WHERE chain = ? AND token = ?", (chain, token)).fetchone()[0]
+    runs = {
+        "ledger": lambda: load_ledger(conn, token, chain),
+        "concentration": lambda: concentration_series(*balance_updates(read_transfers(conn, token, chain), AddressInterner()), every="day"),
+        "realized_cap": lambda: realized_cap_series(conn, prices, token, chain),
+        "cost_basis": lambda: run_cost_basis(conn, prices, token, [pair], chain)[0].close(),
+    }
+    results = {}
+    for name, run in runs.items():
+        started = time.time()
+        run()
+        seconds = time.time() - started
+        results[name] = {"seconds": round(seconds, 2), "transfers_per_second": round(transfers / seconds) if seconds else None,
+                         "peak_rss_mb": round(peak_rss_mb(), 1)}
+        print(f"- {name}: {seconds:.1f}s ({transfers / max(seconds, 1e-9):,.0f} transfers/s), peak RSS {peak_rss_mb():,.0f} MB")
+    return results
+
+def reorg_check(events=20_000, wallets=300, days=1, seed=7, confirmations=12, depth=8, workdir=None):
+    """Restart a watcher against a served node, force a reorg and compare it with a clean sync
+    
+    The first watcher follows the node up to a block with token transfers
+    and stops. A second one bootstraps from the same store (final blocks
+    from the snapshot, the unconfirmed tail replayed), then the node orphans
+    the newest depth blocks and mines past them. Its balances, supply and
+    reserves must match a fresh watcher that syncs the post-reorg chain
+    from scratch. Returns {check: passed}.
+    """
+    import tempfile
+    from ncr_watch import Watcher
+    
+    sim = MarketSimulator(events, wallets, days, seed)
+    node = SimulatedNode(sim, max_logs=1_000_000)
+    transfers = node.columns["block"][(node.columns["kind"] == TRANSFER) & (node.columns["address"] == TOKEN)]
+    node.head = int(transfers[len(transfers) // 2])
+    server = rpc_server(node, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{HOST}:{server.server_address[1]}"
+    
+    def watcher(conn, alerts):
+        return Watcher(sim.token, [sim.pair], url, conn=conn, chain=SIM_CHAIN, confirmations=confirmations,
+                       poll_interval=0, alerts_file=alerts)
+    
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        try:
+            conn = store.connect(f"{tmp}/restarted.db")
+            first = watcher(conn, f"{tmp}/alerts.jsonl")
+            first._load_token_info()
+            first.head = node.first_block - 1
+            first.poll_once()
+            
+            restarted = watcher(conn, f"{tmp}/alerts.jsonl")
+            restarted.bootstrap()
+            orphaned = node.reorg(depth)
+            node.mine(depth * 2)
+            restarted.poll_once()
+            
+            clean = watcher(store.connect(f"{tmp}/clean.db"), f"{tmp}/alerts.jsonl")
+            clean._load_token_info()
+            clean.head = node.first_block - 1
+            clean.poll_once()
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    print(f"Reorg of {depth} blocks at {node.forks[-1] + depth:,} orphaned {orphaned} logs after a restart")
+    balances = lambda w: {a: b for a, b in w.ledger.balances.items() if b}
+    return {"orphaned_logs": orphaned > 0, "head": restarted.head == clean.head,
+            "balances": balances(restarted) == balances(clean),
+            "total_supply": restarted.ledger.total_supply == clean.ledger.total_supply,
+            "reserves": restarted.reserves == clean.reserves}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic NCR-style chain histories with ground truth")
+    parser.add_argument("mode", choices=["store", "serve", "evaluate", "reorg"], help="write to an event store, serve over JSON-RPC, "
+                        "score detectors on a previously written store, or check the watcher across a restart and reorg")
+    parser.add_argument("--events", type=int, default=1_000_000, help="approximate number of logs")
+    parser.add_argument("--wallets", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=395)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default=SIM_STORE)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--head", type=int, help="serve: last visible block (default: everything mined)")
+    parser.add_argument("--mine-interval", type=float, help="serve: reveal one block every this many seconds")
+    parser.add_argument("--bench", action="store_true", help="evaluate: also time the stored-history engines")
+    args = parser.parse_args()
+    
+    print("=== NCR Market Simulator ===")
+    if args.mode == "evaluate":
+        with open(TRUTH_FILE) as f:
+            truth = json.load(f)
+        conn = store.connect(args.db)
+        results = evaluate(conn, truth)
+        for name, scores in results.items():
+            print(f"{name}: " + ", ".join(f"{k} {v:.3f}" if isinstance(v, float) else f"{k} {v}" for k, v in scores.items()))
+        if args.bench:
+            results["benchmark"] = benchmark(conn, truth)
+        with open("ncr_sim_evaluation.json", "w") as f:
+            json.dump(results, f, indent=2)
+        print("Saved ncr_sim_evaluation.json")
+        return
+    if args.mode == "reorg":
+        checks = reorg_check(seed=args.seed)
+        print(", ".join(f"{name} {'ok' if ok else 'MISMATCH'}" for name, ok in checks.items()))
+        if not all(checks.values()):
+            raise SystemExit(1)
+        return
+    
+    sim = MarketSimulator(args.events, args.wallets, args.days, args.seed)
+    print(f"Token {sim.token}, pair {sim.pair}, {len(sim.addresses) - 4:,} wallets, {len(sim.rings)} wash rings")
+    if args.mode == "store":
+        started = time.time()
+        written = write_store(sim, store.connect(args.db))
+        print(f"Wrote {written:,} logs to {args.db} in {time.time() - started:.1f}s: "
+              + ", ".join(f"{count:,} {name}" for name, count in sim.counts.items()))
+        sim.write_truth()
+        print(f"Saved {TRUTH_FILE} and {WASH_TRUTH_FILE}")
+    else:
+        node = SimulatedNode(sim, head=args.head)
+        sim.write_truth()
+        print(f"Generated {sim.generated:,} logs; ground truth in {TRUTH_FILE}")
+        serve(node, port=args.port, mine_interval=args.mine_interval)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
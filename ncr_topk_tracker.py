@@ -0,0 +1,247 @@
+import argparse
+import heapq
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+import ncr_kernels as kernels
+from ncr_interning import AddressInterner
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, split_amounts
+
+# Default ranking depth used by the data collection template ("Top 20 wallet holdings over time")
+TOP_K = 20
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+class TopKTracker:
+    """Maintain the top-K holders incrementally as individual balances change
+    
+    Two lazy heaps are kept: a min-heap over the current top-K members and a
+    max-heap over everyone else. An entry is only trusted if it still matches
+    the live balance and membership, so updates are O(log n) with no re-sort.
+    """
+    
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.balances = {}
+        self.top = set()
+        self._top_heap = []
+        self._rest_heap = []
+    
+    @classmethod
+    def from_state(cls, k, balances, top):
+        """Tracker resumed from positive balances and the current top-K members"""
+        tracker = cls(k)
+        tracker.balances = dict(balances)
+        tracker.top = set(top)
+        tracker._top_heap = [(tracker.balances[a], a) for a in tracker.top]
+        tracker._rest_heap = [(-b, a) for a, b in tracker.balances.items() if a not in tracker.top]
+        heapq.heapify(tracker._top_heap)
+        heapq.heapify(tracker._rest_heap)
+        return tracker
+    
+    def _top_min(self):
+        while self._top_heap:
+            balance, address = self._top_heap[0]
+            if address in self.top and self.balances.get(address) == balance:
+                return balance, address
+            heapq.heappop(self._top_heap)
+        return None
+    
+    def _rest_max(self):
+        while self._rest_heap:
+            neg_balance, address = self._rest_heap[0]
+            if address not in self.top and self.balances.get(address) == -neg_balance:
+                return -neg_balance, address
+            heapq.heappop(self._rest_heap)
+        return None
+    
+    def _enter(self, address, events):
+        balance = self.balances[address]
+        self.top.add(address)
+        heapq.heappush(self._top_heap, (balance, address))
+        events.append({'event': 'enter', 'address': address, 'balance': balance})
+    
+    def _exit(self, address, events):
+        balance = self.balances.get(address, 0)
+        self.top.discard(address)
+        if balance > 0:
+            heapq.heappush(self._rest_heap, (-balance, address))
+        events.append({'event': 'exit', 'address': address, 'balance': balance})
+    
+    def _compact(self):
+        # Stale heap entries accumulate on every update; rebuild once they dominate
+        if len(self._rest_heap) > 2 * len(self.balances) + 1024:
+            self._rest_heap = [(-b, a) for a, b in self.balances.items() if a not in self.top]
+            heapq.heapify(self._rest_heap)
+        if len(self._top_heap) > 4 * self.k + 1024:
+            self._top_heap = [(self.balances[a], a) for a in self.top]
+            heapq.heapify(self._top_heap)
+    
+    def update(self, address, balance):
+        """Set an address balance and return any top-K entry/exit events it caused"""
+        events = []
+        
+        if balance > 0:
+            self.balances[address] = balance
+        else:
+            self.balances.pop(address, None)
+        
+        if address in self.top:
+            if balance <= 0:
+                self._exit(address, events)
+            else:
+                heapq.heappush(self._top_heap, (balance, address))
+        elif balance > 0:
+            heapq.heappush(self._rest_heap, (-balance, address))
+        
+        # Fill any free slot from the best outsider
+        while len(self.top) < self.k:
+            candidate = self._rest_max()
+            if candidate is None:
+                break
+            self._enter(candidate[1], events)
+        
+        # Swap while the best outsider strictly beats the weakest member
+        while True:
+            weakest = self._top_min()
+            candidate = self._rest_max()
+            if weakest is None or candidate is None or candidate[0] <= weakest[0]:
+                break
+            self._exit(weakest[1], events)
+            self._enter(candidate[1], events)
+        
+        self._compact()
+        return events
+    
+    def snapshot(self):
+        """Return the current ranking as a list of (rank, address, balance)"""
+        ranked = sorted(((self.balances[a], a) for a in self.top), reverse=True)
+        return [(rank, address, balance) for rank, (balance, address) in enumerate(ranked, start=1)]
+
+def _replay_columns(transfers, k, interval):
+    # Compiled path: intern and split the events into columns, replay them in
+    # one kernel call and turn the result back into the reference's records
+    interner = AddressInterner()
+    zero = interner.intern(ZERO_ADDRESS)
+    columns = {"block": [], "from": [], "to": [], "whole": [], "frac": []}
+    batch = []
+    
+    def flush():
+        blocks = np.fromiter((int(t['block_number']) for t in batch), dtype=np.int64, count=len(batch))
+        whole, frac = split_amounts(np.array([str(t['value']) for t in batch], dtype=object), kernels.RAW_DECIMALS)
+        columns["block"].append(blocks)
+        columns["from"].append(interner.intern_many([t['from'] for t in batch]))
+        columns["to"].append(interner.intern_many([t['to'] for t in batch]))
+        columns["whole"].append(whole.astype(np.int64))
+        columns["frac"].append(frac)
+        batch.clear()
+    
+    for transfer in transfers:
+        batch.append(transfer)
+        if len(batch) == 1_000_000:
+            flush()
+    if batch:
+        flush()
+    if not columns["block"]:
+        return [], [], TopKTracker(k)
+    
+    columns = {name: np.concatenate(parts) for name, parts in columns.items()}
+    addresses = interner.lookup(np.arange(len(interner)))
+    rank = np.empty(len(addresses), dtype=np.int64)
+    rank[np.argsort(addresses)] = np.arange(len(addresses))
+    buckets = columns["block"] if interval is None else columns["block"] // interval
+    events, snapshots, whole, frac, members = kernels.topk_replay(
+        columns["from"], columns["to"], columns["whole"], columns["frac"], columns["block"], buckets, rank, zero, k)
+    
+    scale = 10 ** kernels.RAW_DECIMALS
+    amount = lambda w, f: w * scale + f
+    events = [{'block_number': block, 'event': 'enter' if kind else 'exit', 'address': addresses[i], 'balance': amount(w, f)}
+              for block, kind, i, w, f in zip(*(row.tolist() for row in events))]
+    snapshots = [{'block_number': block, 'rank': rank_, 'address': addresses[i], 'balance': amount(w, f)}
+                 for block, rank_, i, w, f in zip(*(row.tolist() for row in snapshots))]
+    held = np.flatnonzero((whole > 0) | ((whole == 0) & (frac > 0)))
+    balances = {addresses[i]: amount(w, f) for i, w, f in zip(held.tolist(), whole[held].tolist(), frac[held].tolist())}
+    return snapshots, events, TopKTracker.from_state(k, balances, addresses[members].tolist())
+
+def replay_transfers(transfers, k=TOP_K, interval=None, jit=None):
+    """Replay Transfer events in block order and collect top-K snapshots and entry/exit events
+    
+    transfers: iterable of dicts with block_number, from, to and value (raw integer units)
+    interval: emit a snapshot per N-block interval; None emits one at every block with activity
+    jit: use the compiled kernel (default: when Numba is installed)
+    """
+    if kernels.resolve(jit):
+        return _replay_columns(transfers, k, interval)
+    tracker = TopKTracker(k)
+    snapshots = []
+    events = []
+    current_block = None
+    
+    def emit(block):
+        for rank, address, balance in tracker.snapshot():
+            snapshots.append({'block_number': block, 'rank': rank, 'address': address, 'balance': balance})
+    
+    def bucket(block):
+        return block if interval is None else block // interval
+    
+    for transfer in transfers:
+        block = int(transfer['block_number'])
+        
+        # Snapshot the state as of the last block of each finished interval
+        if current_block is not None and bucket(block) != bucket(current_block):
+            emit(current_block)
+        current_block = block
+        
+        value = int(transfer['value'])
+        sender = transfer['from'].lower()
+        receiver = transfer['to'].lower()
+        
+        if sender != ZERO_ADDRESS:
+            balance = tracker.balances.get(sender, 0) - value
+            for event in tracker.update(sender, balance):
+                events.append({'block_number': block, **event})
+        if receiver != ZERO_ADDRESS:
+            balance = tracker.balances.get(receiver, 0) + value
+            for event in tracker.update(receiver, balance):
+                events.append({'block_number': block, **event})
+    
+    if current_block is not None:
+        emit(current_block)
+    
+    return snapshots, events, tracker
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored NCR transfers and track the top holders over time")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--top", type=int, default=TOP_K)
+    parser.add_argument("--interval", type=int, default=None, help="snapshot every N blocks instead of every active block")
+    args = parser.parse_args()
+    
+    print("=== NCR Top Holder Tracker ===")
+    conn = store.connect()
+    seen = {'transfers': 0, 'blocks': set()}
+    
+    def counted(transfers):
+        for transfer in transfers:
+            seen['transfers'] += 1
+            seen['blocks'].add(transfer['block_number'])
+            yield transfer
+    
+    snapshots, events, tracker = replay_transfers(counted(store.iter_transfers(conn, args.token)),
+                                                  k=args.top, interval=args.interval)
+    if not seen['transfers']:
+        print("No stored transfers; run ncr_polygonscan_fetcher.py or ncr_watch.py first")
+        return
+    
+    pd.DataFrame(snapshots).to_csv('ncr_top20_snapshots.csv', index=False)
+    pd.DataFrame(events).to_csv('ncr_top20_events.csv', index=False)
+    
+    print(f"Replayed {seen['transfers']:,} transfers across {len(seen['blocks']):,} blocks")
+    print(f"Recorded {len(events)} top-{args.top} entry/exit events")
+    print("\nCurrent top holders:")
+    for rank, address, balance in tracker.snapshot():
+        print(f"{rank:>2}. {address}  {balance / 10**NCR_DECIMALS:,.2f} NCR")
+    print("\nSaved ncr_top20_snapshots.csv and ncr_top20_events.csv")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
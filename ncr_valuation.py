@@ -0,0 +1,210 @@
+import os
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+import ncr_log_decoder as u256
+
+NCR_CONTRACT = "0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b"
+NCR_DECIMALS = 18
+PRICE_HISTORY = 'ncr_price_history.csv'
+
+# "Large transfers (>$10,000) during decline"
+LARGE_TRANSFER_USD = 10000
+DECLINE_START = "2021-12-01"     # first major sell-off on the timeline
+MAX_PRICE_AGE = 2 * 86400        # ignore prices staler than this (seconds)
+POLYGON_BLOCK_TIME = 2.0
+WHOLE_DIGITS = 19                # whole-token part must fit in uint64
+READ_CHUNK = 5_000_000
+
+def split_amounts(values, decimals=NCR_DECIMALS):
+    """Split raw uint256 decimal strings into exact (whole tokens, fractional raw units)
+    
+    Works on the fixed-width byte representation of the whole column: the
+    strings are right-aligned once and read as a digit matrix, so there is no
+    per-row Python and no float rounding before the split. Decoded (n, 4)
+    uint256 limb arrays from ncr_log_decoder are split by exact long division.
+    """
+    values = np.asarray(values)
+    if values.ndim == 2 and values.dtype == np.uint64:
+        return u256.split(values, decimals)
+    if decimals > 18:
+        raise ValueError("decimals above 18 do not fit the int64 fractional part")
+    if not len(values):
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    width = WHOLE_DIGITS + decimals
+    raw = np.asarray(values).astype(np.bytes_)
+    padded = np.char.rjust(raw, width, fillchar=b'0')
+    if padded.dtype.itemsize > width:
+        raise ValueError(f"amounts above 10^{WHOLE_DIGITS} whole tokens are not supported")
+    digits = padded.view(np.uint8).reshape(-1, width) - ord('0')
+    
+    whole_powers = np.array([10 ** i for i in range(WHOLE_DIGITS - 1, -1, -1)], dtype=np.uint64)
+    whole = digits[:, :WHOLE_DIGITS].astype(np.uint64) @ whole_powers
+    if decimals:
+        frac_powers = np.array([10 ** i for i in range(decimals - 1, -1, -1)], dtype=np.int64)
+        frac = digits[:, WHOLE_DIGITS:].astype(np.int64) @ frac_powers
+    else:
+        frac = np.zeros(len(digits), dtype=np.int64)
+    return whole, frac
+
+def token_amounts(values, decimals=NCR_DECIMALS):
+    """Decimal-scaled token amounts as float64, computed from the exact split"""
+    whole, frac = split_amounts(values, decimals)
+    return whole.astype(np.float64) + frac.astype(np.float64) / 10 ** decimals
+
+def load_price_history(path=PRICE_HISTORY):
+    """CoinGecko price series saved by get_historical_price_data, as (timestamp s, price)"""
+    df = pd.read_csv(path)
+    df['timestamp'] = (df['timestamp'] // 1000).astype(np.int64)
+    return df[['timestamp', 'price']].sort_values('timestamp').reset_index(drop=True)
+
+def price_series_from_reserves(conn, pair, token_side=0, token_decimals=NCR_DECIMALS, quote_decimals=18,
+                               quote_prices=None, chain="polygon"):
+    """Spot price per Sync event from pair reserves
+    
+    quote_prices: optional (timestamp, price) frame for a non-stable quote
+    asset; without it the quote side is assumed to be worth $1.
+    """
+    df = pd.read_sql_query("""
+        SELECT block_number, log_index, timestamp, amount0, amount1 FROM pair_events
+        WHERE chain = ? AND pair = ? AND event = 'sync' ORDER BY block_number, log_index
+    """, conn, params=(chain, pair.lower()))
+    if df.empty:
+        return pd.DataFrame(columns=['block_number', 'timestamp', 'price'])
+    
+    token_reserve = df[f'amount{token_side}'].to_numpy(dtype=str).astype(np.float64) / 10 ** token_decimals
+    quote_reserve = df[f'amount{1 - token_side}'].to_numpy(dtype=str).astype(np.float64) / 10 ** quote_decimals
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price = np.where(token_reserve > 0, quote_reserve / token_reserve, np.nan)
+    
+    df['timestamp'] = fill_timestamps(conn, df['block_number'].to_numpy(), df['timestamp'].to_numpy(dtype=float), chain)
+    if quote_prices is not None:
+        price = price * asof_lookup(quote_prices['timestamp'].to_numpy(), quote_prices['price'].to_numpy(),
+                                    df['timestamp'].to_numpy(), MAX_PRICE_AGE)
+    # Keep the last Sync per block: it is the post-trade state for that block
+    out = pd.DataFrame({'block_number': df['block_number'], 'timestamp': df['timestamp'], 'price': price})
+    return out.drop_duplicates('block_number', keep='last').reset_index(drop=True)
+
+def known_timestamps(conn, chain="polygon"):
+    """(blocks, timestamps) int64 arrays for every block with a recorded timestamp, in block order"""
+    known = pd.read_sql_query("""
+        SELECT block_number, MIN(timestamp) AS timestamp FROM (
+            SELECT block_number, timestamp FROM blocks WHERE chain = :chain
+            UNION ALL SELECT block_number, timestamp FROM transfers WHERE chain = :chain AND timestamp IS NOT NULL
+            UNION ALL SELECT block_number, timestamp FROM pair_events WHERE chain = :chain AND timestamp IS NOT NULL
+        ) GROUP BY block_number ORDER BY block_number
+    """, conn, params={"chain": chain})
+    return known['block_number'].to_numpy(dtype=np.int64), known['timestamp'].to_numpy(dtype=np.int64)
+
+def fill_timestamps(conn, blocks, timestamps=None, chain="polygon", known=None):
+    """Fill missing timestamps by interpolating between blocks whose timestamps are known
+    
+    known: (blocks, timestamps) from known_timestamps(), so repeated calls
+    share one load; it is read from the store when omitted. Returns int64,
+    or float64 with NaN left in place when the store knows no timestamp at all.
+    """
+    blocks = np.asarray(blocks, dtype=np.int64)
+    result = np.full(len(blocks), np.nan) if timestamps is None else np.asarray(timestamps, dtype=float).copy()
+    missing = np.isnan(result)
+    if not missing.any():
+        return result.astype(np.int64)
+    
+    known_blocks, known_times = known if known is not None else known_timestamps(conn, chain)
+    if not len(known_blocks):
+        return result
+    
+    known_blocks = known_blocks.astype(float)
+    known_times = known_times.astype(float)
+    estimate = np.interp(blocks[missing], known_blocks, known_times)
+    # np.interp clamps at the ends; extrapolate with the nominal block time instead
+    before = blocks[missing] < known_blocks[0]
+    after = blocks[missing] > known_blocks[-1]
+    estimate[before] = known_times[0] - (known_blocks[0] - blocks[missing][before]) * POLYGON_BLOCK_TIME
+    estimate[after] = known_times[-1] + (blocks[missing][after] - known_blocks[-1]) * POLYGON_BLOCK_TIME
+    result[missing] = estimate
+    return result.astype(np.int64)
+
+def asof_lookup(price_keys, prices, keys, max_age=None):
+    """Backward as-of join: the latest price at or before each key (NaN if none or too stale)"""
+    price_keys = np.asarray(price_keys)
+    prices = np.asarray(prices, dtype=np.float64)
+    keys = np.asarray(keys)
+    index = np.searchsorted(price_keys, keys, side='right') - 1
+    valid = index >= 0
+    if keys.dtype.kind == 'f':
+        valid &= ~np.isnan(keys)
+    result = np.full(len(keys), np.nan)
+    result[valid] = prices[index[valid]]
+    if max_age is not None:
+        stale = valid & (keys - price_keys[np.maximum(index, 0)] > max_age)
+        result[stale] = np.nan
+    return result
+
+def value_transfers(transfers, prices, decimals=NCR_DECIMALS, on='timestamp', max_age=MAX_PRICE_AGE):
+    """Attach amount, price_usd and usd_value columns to a transfers frame
+    
+    prices must be sorted by the join key ('timestamp' in seconds or 'block_number').
+    """
+    whole, frac = split_amounts(transfers['value'].to_numpy(), decimals)
+    price = asof_lookup(prices[on].to_numpy(), prices['price'].to_numpy(), transfers[on].to_numpy(),
+                        max_age if on == 'timestamp' else None)
+    transfers['amount'] = whole.astype(np.float64) + frac.astype(np.float64) / 10 ** decimals
+    transfers['price_usd'] = price
+    transfers['usd_value'] = whole.astype(np.float64) * price + frac.astype(np.float64) * (price / 10 ** decimals)
+    return transfers
+
+def read_transfers(conn, token=NCR_CONTRACT, chain="polygon", chunksize=READ_CHUNK):
+    """Yield stored transfers in block order as DataFrame chunks with timestamps filled
+    
+    The known block timestamps are loaded once, on the first chunk that
+    needs them.
+    """
+    query = """
+        SELECT block_number, log_index, tx_hash, timestamp, from_address, to_address, value
+        FROM transfers WHERE chain = ? AND token = ? ORDER BY block_number, log_index
+    """
+    known = None
+    for chunk in pd.read_sql_query(query, conn, params=(chain, token.lower()), chunksize=chunksize):
+        timestamps = chunk['timestamp'].to_numpy(dtype=float)
+        if known is None and np.isnan(timestamps).any():
+            known = known_timestamps(conn, chain)
+        chunk['timestamp'] = fill_timestamps(conn, chunk['block_number'].to_numpy(), timestamps, chain, known)
+        yield chunk
+
+def main():
+    print("=== NCR Transfer Valuation ===")
+    
+    if not os.path.exists(PRICE_HISTORY):
+        print(f"No price history at {PRICE_HISTORY}; run ncr_analysis.py first")
+        return
+    
+    conn = store.connect()
+    prices = load_price_history()
+    decline_start = int(pd.Timestamp(DECLINE_START).timestamp())
+    
+    total = 0
+    total_usd = 0.0
+    large = []
+    for chunk in read_transfers(conn):
+        value_transfers(chunk, prices)
+        total += len(chunk)
+        total_usd += np.nansum(chunk['usd_value'].to_numpy())
+        large.append(chunk[(chunk['usd_value'] > LARGE_TRANSFER_USD) & (chunk['timestamp'] >= decline_start)])
+    
+    if not total:
+        print("No stored transfers to value")
+        return
+    
+    large = pd.concat(large, ignore_index=True)
+    large['date'] = pd.to_datetime(large['timestamp'], unit='s')
+    large.to_csv('ncr_large_transfers.csv', index=False)
+    
+    print(f"Valued {total:,} transfers totalling ${total_usd:,.2f}")
+    print(f"Large transfers (>${LARGE_TRANSFER_USD:,}) since {DECLINE_START}: {len(large):,}")
+    for _, row in large.nlargest(10, 'usd_value').iterrows():
+        print(f"- {row['date']:%Y-%m-%d} {row['from_address']} -> {row['to_address']}: ${row['usd_value']:,.2f}")
+    print("\nSaved ncr_large_transfers.csv")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
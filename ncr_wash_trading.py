@@ -0,0 +1,324 @@
+import argparse
+import json
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import ncr_event_store as store
+import ncr_kernels as kernels
+from ncr_interning import AddressInterner
+from ncr_valuation import NCR_CONTRACT, NCR_DECIMALS, read_transfers, token_amounts
+from ncr_watch import ALERTS_FILE, load_pairs
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Cycle search bounds
+WINDOW = 3600                # every edge of a cycle must fall within this many seconds of its first edge
+MIN_LENGTH = 2
+MAX_LENGTH = 5
+AMOUNT_TOLERANCE = 0.10      # each hop within 10% of the first hop's amount (DEX fees, slippage)
+MAX_CYCLES_PER_EDGE = 50
+MAX_STEPS_PER_EDGE = 20000   # DFS expansions per start edge before giving up on it
+
+# Memory: edges are held in flat arrays; the budget bounds how many are resident at once
+MEMORY_BUDGET_MB = 512
+BYTES_PER_EDGE = 160         # arrays, CSR permutations and the pandas chunk being read
+
+# Days where cycles account for more than this share of DEX volume are raised as red flags
+WASH_SHARE_FLAG = 0.05
+
+class TemporalGraph:
+    """Time-sorted CSR adjacency over a window of edges
+    
+    Edges are numbered by seq (their position in block order), so time never
+    decreases with seq. Out-edges of each node are stored contiguously and in
+    seq order, which turns "edges leaving v after seq s and before the window
+    closes" into two binary searches.
+    """
+    
+    def __init__(self, seq, src, dst, timestamp, amount):
+        self.seq = seq
+        self.src = src
+        self.dst = dst
+        self.time = timestamp
+        self.amount = amount
+        nodes = int(max(src.max(), dst.max())) + 1 if len(src) else 0
+        self.out_order, self.out_ptr = self._csr(src, nodes)
+        self.in_order, self.in_ptr = self._csr(dst, nodes)
+        self.out_seq = seq[self.out_order]
+        self.in_seq = seq[self.in_order]
+    
+    @staticmethod
+    def _csr(keys, nodes):
+        # Stable sort keeps seq order inside each node's segment
+        order = np.argsort(keys, kind="stable")
+        ptr = np.zeros(nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=nodes), out=ptr[1:])
+        return order, ptr
+    
+    def _segment(self, order, ptr, seqs, node, after_seq, until_seq):
+        if node >= len(ptr) - 1:
+            return order[0:0]
+        lo, hi = ptr[node], ptr[node + 1]
+        segment = seqs[lo:hi]
+        start = lo + np.searchsorted(segment, after_seq, side="right")
+        stop = lo + np.searchsorted(segment, until_seq, side="right")
+        return order[start:stop]
+    
+    def out_edges(self, node, after_seq, until_seq):
+        """Positions of edges leaving node with after_seq < seq <= until_seq"""
+        return self._segment(self.out_order, self.out_ptr, self.out_seq, node, after_seq, until_seq)
+    
+    def in_edges(self, node, after_seq, until_seq):
+        return self._segment(self.in_order, self.in_ptr, self.in_seq, node, after_seq, until_seq)
+    
+    def candidate_starts(self, positions, window):
+        """Vectorized pre-filter: the start's source must be re-entered and its target left again within the window"""
+        seq = self.seq[positions]
+        limit = self.seq[np.searchsorted(self.time, self.time[positions] + window, side="right") - 1]
+        keep = np.ones(len(positions), dtype=bool)
+        for node_of, order, ptr, seqs in ((self.src, self.in_order, self.in_ptr, self.in_seq),
+                                          (self.dst, self.out_order, self.out_ptr, self.out_seq)):
+            nodes = node_of[positions].astype(np.int64)
+            # Segments are contiguous and seq-sorted, so (node, seq) sorts as one flat key
+            stride = np.int64(self.seq.max() + 2)
+            flat = (np.repeat(np.arange(len(ptr) - 1, dtype=np.int64), np.diff(ptr)) * stride) + seqs
+            lo = np.searchsorted(flat, nodes * stride + seq, side="right")
+            hi = np.searchsorted(flat, nodes * stride + limit, side="right")
+            keep &= hi > lo
+        return positions[keep]
+
+def _distances_to(graph, target, after_seq, until_seq, low, high, max_hops):
+    """Hops from each node back to target over in-window, amount-compatible edges (a pruning bound)"""
+    distance = {target: 0}
+    queue = deque([target])
+    while queue:
+        node = queue.popleft()
+        hops = distance[node] + 1
+        if hops > max_hops:
+            continue
+        for position in graph.in_edges(node, after_seq, until_seq):
+            if not low <= graph.amount[position] <= high:
+                continue
+            previous = int(graph.src[position])
+            if previous not in distance:
+                distance[previous] = hops
+                queue.append(previous)
+    return distance
+
+def cycles_from(graph, start, window=WINDOW, max_length=MAX_LENGTH, tolerance=AMOUNT_TOLERANCE,
+                max_cycles=MAX_CYCLES_PER_EDGE, max_steps=MAX_STEPS_PER_EDGE):
+    """All time-respecting cycles whose earliest edge is `start`, as lists of edge positions
+    
+    Bounded Johnson-style DFS: nodes already on the path are blocked, and a
+    branch is cut when even the shortest way back to the origin would exceed
+    max_length.
+    """
+    origin = int(graph.src[start])
+    first = int(graph.dst[start])
+    amount = graph.amount[start]
+    low, high = amount * (1 - tolerance), amount * (1 + tolerance)
+    start_seq = graph.seq[start]
+    until_seq = graph.seq[np.searchsorted(graph.time, graph.time[start] + window, side="right") - 1]
+    
+    distance = _distances_to(graph, origin, start_seq, until_seq, low, high, max_length - 1)
+    if first not in distance:
+        return []
+    
+    found = []
+    steps = 0
+    path = [start]
+    on_path = {origin, first}
+    stack = [(first, start_seq, iter(graph.out_edges(first, start_seq, until_seq)))]
+    while stack:
+        node, last_seq, edges = stack[-1]
+        position = next(edges, None)
+        if position is None:
+            stack.pop()
+            path.pop()
+            on_path.discard(node)
+            continue
+        steps += 1
+        if steps > max_steps or len(found) >= max_cycles:
+            break
+        if not low <= graph.amount[position] <= high:
+            continue
+        nxt = int(graph.dst[position])
+        length = len(path) + 1
+        if nxt == origin:
+            found.append(path + [position])
+            continue
+        if nxt in on_path or length + distance.get(nxt, max_length) > max_length:
+            continue
+        path.append(position)
+        on_path.add(nxt)
+        stack.append((nxt, graph.seq[position], iter(graph.out_edges(nxt, graph.seq[position], until_seq))))
+    return [cycle for cycle in found if len(cycle) >= MIN_LENGTH]
+
+def detect_cycles(chunks, interner, pair_ids=(), window=WINDOW, max_length=MAX_LENGTH, tolerance=AMOUNT_TOLERANCE,
+                  decimals=NCR_DECIMALS, jit=None):
+    """Stream transfer chunks (block order) and return (cycles frame, DEX volume, wash DEX volume)
+    
+    Only edges that can still belong to an unfinished cycle stay resident: once
+    the data read reaches time t, every start edge older than t - window has
+    been searched and everything before the oldest pending start is dropped.
+    With the compiled kernel all ready start edges are searched in one call.
+    """
+    use_jit = kernels.resolve(jit)
+    pair_ids = np.asarray(sorted(pair_ids), dtype=np.int64)
+    columns = ("seq", "src", "dst", "time", "amount", "block", "log_index")
+    buffer = {name: np.zeros(0, dtype=np.float64 if name == "amount" else np.int64) for name in columns}
+    next_seq = 0
+    searched_to = -1
+    dex_volume = 0.0
+    cycle_edges = {}
+    cycles = []
+    
+    def search(until_time, final=False):
+        nonlocal searched_to
+        if not len(buffer["seq"]):
+            return
+        graph = TemporalGraph(buffer["seq"], buffer["src"], buffer["dst"], buffer["time"], buffer["amount"])
+        ready = buffer["seq"] > searched_to
+        if not final:
+            ready &= buffer["time"] < until_time
+        positions = np.flatnonzero(ready)
+        if not len(positions):
+            return
+        starts = graph.candidate_starts(positions, window)
+        if use_jit:
+            flat, lengths = kernels.find_cycles(graph.seq, graph.src, graph.dst, graph.time, graph.amount, graph.out_order,
+                                                graph.out_ptr, graph.out_seq, graph.in_order, graph.in_ptr, graph.in_seq,
+                                                starts, window, max_length, tolerance, MAX_CYCLES_PER_EDGE, MAX_STEPS_PER_EDGE)
+            found = np.split(flat, np.cumsum(lengths)[:-1]) if len(lengths) else []
+        else:
+            found = (cycle for start in starts for cycle in cycles_from(graph, start, window, max_length, tolerance))
+        for cycle in found:
+            record = [(int(buffer["seq"][p]), int(buffer["src"][p]), int(buffer["dst"][p]), int(buffer["time"][p]),
+                       float(buffer["amount"][p]), int(buffer["block"][p]), int(buffer["log_index"][p])) for p in cycle]
+            cycles.append(record)
+            for edge in record:
+                cycle_edges[edge[0]] = edge
+        searched_to = int(buffer["seq"][positions[-1]])
+    
+    for chunk in chunks:
+        chunk = chunk[(chunk['from_address'] != ZERO_ADDRESS) & (chunk['to_address'] != ZERO_ADDRESS)]
+        if chunk.empty:
+            continue
+        src = interner.intern_many(chunk['from_address'].to_numpy())
+        dst = interner.intern_many(chunk['to_address'].to_numpy())
+        amount = token_amounts(chunk['value'].to_numpy(), decimals)
+        dex = np.isin(src, pair_ids) | np.isin(dst, pair_ids)
+        dex_volume += float(amount[dex].sum())
+        
+        incoming = {
+            "seq": np.arange(next_seq, next_seq + len(chunk), dtype=np.int64),
+            "src": src, "dst": dst,
+            # Filled timestamps can wobble slightly; the searches need them non-decreasing in seq
+            "time": np.maximum.accumulate(np.maximum(chunk['timestamp'].to_numpy(dtype=np.int64),
+                                                     buffer["time"][-1] if len(buffer["time"]) else 0)),
+            "amount": amount,
+            "block": chunk['block_number'].to_numpy(dtype=np.int64),
+            "log_index": chunk['log_index'].to_numpy(dtype=np.int64)
+        }
+        next_seq += len(chunk)
+        buffer = {name: np.concatenate([buffer[name], incoming[name]]) for name in columns}
+        
+        search(buffer["time"][-1] - window)
+        keep = buffer["seq"] > searched_to
+        if keep.any():
+            first = np.argmax(keep)
+            buffer = {name: values[first:] for name, values in buffer.items()}
+        else:
+            buffer = {name: values[:0] for name, values in buffer.items()}
+    search(None, final=True)
+    
+    pair_set = set(pair_ids.tolist())
+    wash_dex_volume = sum(edge[4] for edge in cycle_edges.values() if edge[1] in pair_set or edge[2] in pair_set)
+    rows = []
+    addresses = interner.addresses
+    for record in cycles:
+        nodes = [record[0][1]] + [edge[2] for edge in record]
+        rows.append({
+            "start_time": record[0][3],
+            "duration": record[-1][3] - record[0][3],
+            "length": len(record),
+            "amount": record[0][4],
+            "path": "->".join(addresses[node] for node in nodes),
+            "blocks": ",".join(str(edge[5]) for edge in record),
+            "log_indexes": ",".join(str(edge[6]) for edge in record),
+            "touches_pair": any(edge[1] in pair_set or edge[2] in pair_set for edge in record),
+            "dex_amount": sum(edge[4] for edge in record if edge[1] in pair_set or edge[2] in pair_set)
+        })
+    frame = pd.DataFrame(rows, columns=["start_time", "duration", "length", "amount", "path", "blocks",
+                                        "log_indexes", "touches_pair", "dex_amount"])
+    return frame, dex_volume, wash_dex_volume
+
+def daily_wash_share(conn, cycles, token=NCR_CONTRACT, pairs=(), chain="polygon", decimals=NCR_DECIMALS):
+    """Per-day DEX volume and the part of it that sits on detected cycles"""
+    pairs = [p.lower() for p in pairs]
+    if not pairs:
+        return pd.DataFrame(columns=["day", "dex_volume", "wash_volume", "share"])
+    placeholders = ",".join("?" * len(pairs))
+    volume = pd.read_sql_query(f"""
+        SELECT timestamp, value FROM transfers WHERE chain = ? AND token = ?
+          AND (from_address IN ({placeholders}) OR to_address IN ({placeholders})) AND timestamp IS NOT NULL
+    """, conn, params=[chain, token.lower(), *pairs, *pairs])
+    volume['day'] = pd.to_datetime(volume['timestamp'], unit='s').dt.strftime('%Y-%m-%d')
+    volume['amount'] = token_amounts(volume['value'].to_numpy(), decimals)
+    daily = volume.groupby('day')['amount'].sum().rename('dex_volume').to_frame()
+    wash = cycles[cycles['touches_pair']].assign(day=pd.to_datetime(cycles['start_time'], unit='s').dt.strftime('%Y-%m-%d'))
+    daily['wash_volume'] = wash.groupby('day')['dex_amount'].sum()
+    daily = daily.fillna(0.0).reset_index()
+    daily['share'] = np.where(daily['dex_volume'] > 0, daily['wash_volume'] / daily['dex_volume'], 0.0)
+    return daily
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect circular (wash) transfers in the NCR transfer graph")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--window", type=int, default=WINDOW, help="seconds a cycle may span")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--tolerance", type=float, default=AMOUNT_TOLERANCE)
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET_MB)
+    args = parser.parse_args()
+    
+    print("=== NCR Wash Trading Detector ===")
+    conn = store.connect()
+    interner = AddressInterner()
+    pairs = load_pairs()
+    pair_ids = interner.intern_many(pairs) if pairs else []
+    chunk_size = max(10_000, args.memory_mb * 2 ** 20 // BYTES_PER_EDGE // 2)
+    
+    start = time.time()
+    cycles, dex_volume, wash_volume = detect_cycles(read_transfers(conn, args.token, chunksize=chunk_size), interner,
+                                                    pair_ids, args.window, args.max_length, args.tolerance)
+    print(f"Found {len(cycles):,} cycles of length {MIN_LENGTH}-{args.max_length} within {args.window}s "
+          f"in {time.time() - start:.1f}s")
+    if len(cycles):
+        for length, count in cycles['length'].value_counts().sort_index().items():
+            print(f"- length {length}: {count:,}")
+    share = wash_volume / dex_volume if dex_volume else 0.0
+    print(f"DEX volume: {dex_volume:,.2f} NCR; on cycles: {wash_volume:,.2f} NCR ({share:.2%})")
+    
+    cycles['date'] = pd.to_datetime(cycles['start_time'], unit='s')
+    cycles.to_csv('ncr_wash_cycles.csv', index=False)
+    daily = daily_wash_share(conn, cycles, args.token, pairs)
+    flagged = daily[daily['share'] > WASH_SHARE_FLAG]
+    if len(flagged):
+        first_blocks = cycles[cycles['touches_pair']].assign(
+            day=cycles['date'].dt.strftime('%Y-%m-%d')).groupby('day')['blocks'].first()
+        with open(ALERTS_FILE, 'a') as f:
+            for _, row in flagged.iterrows():
+                f.write(json.dumps({
+                    "time": datetime.now().isoformat(timespec='seconds'), "type": "wash_trading",
+                    "block": int(first_blocks.get(row['day'], "0").split(",")[0]),
+                    "message": f"{row['share']:.1%} of DEX volume on {row['day']} moved in circular transfers",
+                    "share": row['share']
+                }) + "\n")
+        print(f"Days with more than {WASH_SHARE_FLAG:.0%} wash volume: {len(flagged)} (appended to {ALERTS_FILE})")
+    print("\nSaved ncr_wash_cycles.csv")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+import pandas as pd
+
+import ncr_event_store as store
+from ncr_ledger import BalanceLedger, load_ledger
+from ncr_rpc import POLYGON_RPC, RpcError, rpc_call, get_block_number, get_block, get_logs, eth_call
+from ncr_topk_tracker import TopKTracker
+
+NCR_CONTRACT = "0x0cbc9b02b8628ae08688b5cc8134dc09e36c443b"
+
+# Watch loop settings
+POLL_INTERVAL = 2.0          # Polygon produces a block roughly every 2 seconds
+CONFIRMATIONS = 64           # blocks deeper than this are treated as final
+MAX_BLOCK_RANGE = 2000       # largest eth_getLogs window while catching up
+
+# Alert thresholds
+LIQUIDITY_PULL_SHARE = 0.20  # a single Burn removing >20% of the pool
+WHALE_DUMP_SUPPLY_SHARE = 0.005
+WHALE_DUMP_RESERVE_SHARE = 0.10
+CONCENTRATION_TOP = 10
+CONCENTRATION_LIMIT = 0.50   # "Top 10 wallets holding >50% of supply"
+
+ALERTS_FILE = "ncr_alerts.jsonl"
+WATCH_TOPICS = [[store.TRANSFER_TOPIC, store.SYNC_TOPIC, store.SWAP_TOPIC, store.MINT_TOPIC, store.BURN_TOPIC]]
+
+def load_pairs(path='ncr_trading_pairs.csv', chain='polygon'):
+    """Read pair addresses saved by analyze_dexscreener_pairs"""
+    if not os.path.exists(path):
+        return []
+    df = pd.read_csv(path)
+    if 'chain' in df.columns:
+        df = df[df['chain'] == chain]
+    return [address.lower() for address in df['pair_address'].dropna()]
+
+class Watcher:
+    """Follow the chain head and keep balances, pool reserves and red flags current"""
+    
+    def __init__(self, token=NCR_CONTRACT, pairs=(), url=POLYGON_RPC, conn=None, chain='polygon',
+                 confirmations=CONFIRMATIONS, poll_interval=POLL_INTERVAL, alert_handler=None, alerts_file=ALERTS_FILE):
+        self.token = token.lower()
+        self.pairs = [p.lower() for p in pairs]
+        self.url = url
+        self.conn = conn or store.connect()
+        self.chain = chain
+        self.confirmations = confirmations
+        self.poll_interval = poll_interval
+        self.alert_handler = alert_handler
+        self.alerts_file = alerts_file
+        
+        self.top = TopKTracker(CONCENTRATION_TOP)
+        self.ledger = BalanceLedger(on_change=self.top.update)
+        self.reserves = {}
+        self.token_side = {}
+        self.red_flags = {"concentration": False, "liquidity_pull": False, "whale_dump": False}
+        self.head = None
+        self.decimals = 18
+        self.total_supply = None
+    
+    def alert(self, kind, block, message, **details):
+        """Record an alert, print it and hand it to the optional callback"""
+        record = {"time": datetime.now().isoformat(timespec='seconds'), "type": kind, "block": block,
+                  "message": message, **details}
+        print(f"[ALERT] {record['time']} block {block}: {message}")
+        with open(self.alerts_file, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        if self.alert_handler:
+            self.alert_handler(record)
+    
+    def _load_token_info(self):
+        try:
+            self.decimals = int(eth_call(self.token, "0x313ce567", url=self.url), 16)
+            self.total_supply = int(eth_call(self.token, "0x18160ddd", url=self.url), 16)
+        except (RpcError, ValueError) as e:
+            print(f"Could not read token info, using defaults: {e}")
+        for pair in self.pairs:
+            try:
+                token0 = "0x" + eth_call(pair, "0x0dfe1681", url=self.url)[-40:]
+                self.token_side[pair] = 0 if token0.lower() == self.token else 1
+            except (RpcError, ValueError) as e:
+                print(f"Could not read token0 for pair {pair}: {e}")
+                self.token_side[pair] = 0
+    
+    def bootstrap(self):
+        """Rebuild state from the event store so only new blocks need to be fetched
+        
+        Balances resume from the stored ledger snapshot and only the transfers
+        after it are replayed; the snapshot is then advanced to the last final
+        block. Blocks above it are journaled so a reorg after a restart can
+        still be undone.
+        """
+        self._load_token_info()
+        
+        stored_head = store.get_watermark(self.conn, "rpc", self.token, "logs", self.chain)
+        if stored_head is None:
+            stored_head = store.latest_block(self.conn, self.chain)
+        final = stored_head - self.confirmations if stored_head is not None else None
+        self.ledger, replayed = load_ledger(self.conn, self.token, self.chain, final, on_change=self.top.update)
+        self.reserves.update(store.latest_reserves(self.conn, self.pairs, self.chain))
+        
+        self.head = stored_head if stored_head is not None else get_block_number(self.url) - 1
+        print(f"Bootstrapped {replayed:,} transfers after the ledger snapshot; watching from block {self.head + 1:,}")
+    
+    def _find_fork(self):
+        """Walk back from the local head to the newest block the node still agrees with"""
+        lowest = max(self.head - self.confirmations, 0)
+        for number in range(self.head, lowest - 1, -1):
+            known = store.get_block_hash(self.conn, self.chain, number)
+            if known is None:
+                return number
+            block = get_block(number, self.url)
+            if block and block['hash'].lower() == known:
+                return number
+        return lowest
+    
+    def rollback(self, block_number):
+        """Discard state and stored events above block_number"""
+        print(f"Reorg detected: rolling back from block {self.head:,} to {block_number:,}")
+        store.rollback_to(self.conn, self.chain, block_number)
+        self.ledger.rollback_to(block_number)
+        # The store now holds exactly the surviving events, including any replayed at bootstrap
+        self.reserves = store.latest_reserves(self.conn, self.pairs, self.chain)
+        self.head = block_number
+    
+    def _apply_transfer(self, transfer):
+        self.ledger.apply_transfer(transfer)
+        receiver = transfer['to'].lower()
+        if receiver not in self.reserves and receiver not in self.pairs:
+            return
+        
+        value = int(transfer['value'])
+        supply = self.total_supply or self.ledger.total_supply
+        reserve = self.reserves.get(receiver, (0, 0))[self.token_side.get(receiver, 0)]
+        if (supply and value >= WHALE_DUMP_SUPPLY_SHARE * supply) or (reserve and value >= WHALE_DUMP_RESERVE_SHARE * reserve):
+            self.red_flags["whale_dump"] = True
+            self.alert("whale_dump", transfer['block_number'],
+                       f"{transfer['from']} sent {value / 10**self.decimals:,.2f} tokens into pair {receiver}",
+                       address=transfer['from'], pair=receiver, value=str(value), tx_hash=transfer['tx_hash'])
+    
+    def _apply_pair_event(self, event):
+        pair = event['pair']
+        amount0 = int(event['amount0'])
+        amount1 = int(event['amount1'])
+        
+        if event['event'] == 'sync':
+            self.reserves[pair] = (amount0, amount1)
+        elif event['event'] == 'burn':
+            # Sync precedes Burn in UniswapV2, so reserves already exclude the withdrawn amounts
+            side = self.token_side.get(pair, 0)
+            withdrawn = (amount0, amount1)[side]
+            remaining = self.reserves.get(pair, (0, 0))[side]
+            share = withdrawn / (withdrawn + remaining) if withdrawn + remaining else 0
+            if share >= LIQUIDITY_PULL_SHARE:
+                self.red_flags["liquidity_pull"] = True
+                self.alert("liquidity_pull", event['block_number'],
+                           f"{share:.0%} of pool {pair} withdrawn by {event['sender']} to {event['recipient']}",
+                           pair=pair, share=share, recipient=event['recipient'], tx_hash=event['tx_hash'])
+    
+    def _check_concentration(self, block):
+        supply = self.total_supply or self.ledger.total_supply
+        if not supply:
+            return
+        share = sum(balance for _, _, balance in self.top.snapshot()) / supply
+        concentrated = share > CONCENTRATION_LIMIT
+        if concentrated and not self.red_flags["concentration"]:
+            self.alert("concentration", block, f"Top {CONCENTRATION_TOP} wallets now hold {share:.1%} of supply", share=share)
+        self.red_flags["concentration"] = concentrated
+    
+    def ingest(self, from_block, to_block, latest):
+        """Fetch and apply logs for a block range"""
+        timestamps = {}
+        for number in range(max(from_block, latest - self.confirmations + 1), to_block + 1):
+            block = get_block(number, self.url)
+            store.record_block(self.conn, self.chain, block)
+            timestamps[number] = int(block['timestamp'], 16)
+        
+        logs = get_logs([self.token, *self.pairs], WATCH_TOPICS, from_block, to_block, self.url)
+        transfers, pair_events = store.insert_logs(self.conn, logs, self.chain, timestamps)
+        
+        events = [("transfer", t) for t in transfers if t['token'] == self.token]
+        events += [("pair_event", e) for e in pair_events]
+        events.sort(key=lambda item: (item[1]['block_number'], item[1]['log_index']))
+        for kind, row in events:
+            if kind == "transfer":
+                self._apply_transfer({**row, 'from': row['from_address'], 'to': row['to_address']})
+            else:
+                self._apply_pair_event(row)
+        
+        self._check_concentration(to_block)
+        self.head = to_block
+        store.set_watermark(self.conn, "rpc", self.token, "logs", to_block, self.chain)
+        return len(events)
+    
+    def poll_once(self):
+        """Process everything between the local head and the node head; returns events applied"""
+        latest = get_block_number(self.url)
+        
+        known = store.get_block_hash(self.conn, self.chain, self.head)
+        if known is not None:
+            block = get_block(self.head, self.url)
+            if block is None or block['hash'].lower() != known:
+                self.rollback(self._find_fork())
+        
+        applied = 0
+        while self.head < latest:
+            to_block = min(self.head + MAX_BLOCK_RANGE, latest)
+            applied += self.ingest(self.head + 1, to_block, latest)
+        
+        final = latest - self.confirmations
+        self.ledger.confirm(final)
+        store.prune_blocks(self.conn, self.chain, final)
+        return applied
+    
+    def run(self, once=False):
+        """Follow new blocks until interrupted
+        
+        Uses an eth_newBlockFilter subscription when the node supports one and
+        falls back to polling eth_blockNumber otherwise.
+        """
+        if self.head is None:
+            self.bootstrap()
+        
+        filter_id = None
+        try:
+            filter_id = rpc_call("eth_newBlockFilter", [], self.url)
+            print("Subscribed to new blocks via eth_newBlockFilter")
+        except Exception as e:
+            print(f"Block filters unavailable ({e}); polling every {self.poll_interval}s")
+        
+        while True:
+            try:
+                if filter_id is None or rpc_call("eth_getFilterChanges", [filter_id], self.url):
+                    applied = self.poll_once()
+                    if applied:
+                        print(f"Block {self.head:,}: applied {applied} events, {self.ledger.holders():,} holders")
+            except RpcError as e:
+                print(f"RPC error: {e}")
+                if filter_id is not None and "filter" in e.message.lower():
+                    filter_id = None
+            except Exception as e:
+                print(f"Watch error: {e}")
+            
+            if once:
+                return
+            time.sleep(self.poll_interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch NCR activity and raise alerts as blocks arrive")
+    parser.add_argument("--rpc", default=POLYGON_RPC, help="JSON-RPC endpoint (a local dev chain such as anvil works)")
+    parser.add_argument("--token", default=NCR_CONTRACT)
+    parser.add_argument("--pair", action="append", default=[], help="pair address to monitor (repeatable)")
+    parser.add_argument("--chain", default="polygon")
+    parser.add_argument("--confirmations", type=int, default=CONFIRMATIONS)
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="process available blocks and exit")
+    args = parser.parse_args()
+    
+    print("=== NCR Live Watch ===")
+    pairs = args.pair or load_pairs(chain=args.chain)
+    print(f"Token: {args.token}")
+    print(f"Pairs: {', '.join(pairs) if pairs else 'none'}")
+    
+    watcher = Watcher(args.token, pairs, args.rpc, chain=args.chain,
+                      confirmations=args.confirmations, poll_interval=args.interval)
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    print(f"Red flags: {watcher.red_flags}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file